@@ -0,0 +1,210 @@
+# Controle de admissão do /registrar: balde de fichas por IP e fila gravada em lotes por uma thread
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LimiteTaxa:
+    """Balde de fichas por chave (o IP do participante).
+
+    Cada chave começa com `rajada` fichas e ganha `taxa` fichas por segundo,
+    até o máximo de `rajada`; cada requisição gasta uma.
+    """
+
+    # Baldes cheios há mais que isso (segundos) são descartados
+    EXPIRAR_APOS = 600
+
+    def __init__(self, taxa, rajada):
+        self.taxa = taxa
+        self.rajada = rajada
+        self._baldes = {}
+        self._lock = threading.Lock()
+        self._ultima_limpeza = time.monotonic()
+
+    def permitir(self, chave):
+        """Retorna 0 se a requisição pode passar, ou quantos segundos esperar."""
+        agora = time.monotonic()
+        with self._lock:
+            fichas, atualizado = self._baldes.get(chave, (self.rajada, agora))
+            fichas = min(self.rajada, fichas + (agora - atualizado) * self.taxa)
+            if fichas >= 1:
+                self._baldes[chave] = (fichas - 1, agora)
+                espera = 0
+            else:
+                self._baldes[chave] = (fichas, agora)
+                espera = (1 - fichas) / self.taxa
+            if agora - self._ultima_limpeza > self.EXPIRAR_APOS:
+                self._limpar(agora)
+        return espera
+
+    def _limpar(self, agora):
+        self._ultima_limpeza = agora
+        for chave, (fichas, atualizado) in list(self._baldes.items()):
+            if fichas + (agora - atualizado) * self.taxa >= self.rajada:
+                del self._baldes[chave]
+
+
+class FilaCheia(Exception):
+    """A fila de gravação atingiu o limite; o participante deve tentar de novo."""
+
+
+class FilaInscricoes:
+    """Fila limitada de inscrições gravadas em lote por uma thread.
+
+    `gravar(lote)` recebe uma lista de inscrições (dicts com 'id'), roda na
+    thread da fila e retorna os ids gravados. A thread é criada por processo,
+    depois do fork do gunicorn, como a de FilaRender.
+
+    Com `diario`, cada inscrição é escrita num arquivo dessa pasta antes de
+    entrar na fila e só é apagada depois de gravada; arquivos parados há mais
+    de `recuperar_apos` segundos (lote que falhou, worker que caiu) voltam
+    para a fila de algum worker.
+    """
+
+    def __init__(self, gravar, tamanho_maximo=1000, lote=100, espera=0.05, diario=None, recuperar_apos=60):
+        self.gravar = gravar
+        self.tamanho_maximo = tamanho_maximo
+        self.lote = lote
+        self.espera = espera
+        self.diario = diario
+        self.recuperar_apos = recuperar_apos
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pendentes = set()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._fila = queue.Queue(self.tamanho_maximo)
+            self._pendentes = set()
+            if self.diario:
+                os.makedirs(self.diario, exist_ok=True)
+            threading.Thread(target=self._gravar_lotes, name='fila-inscricoes', daemon=True).start()
+            # Ao encerrar o worker, dá tempo para o último lote ser gravado
+            atexit.register(self.aguardar, 10)
+
+    def pendente(self, ingresso_id):
+        return ingresso_id in self._pendentes
+
+    def tamanho(self):
+        return len(self._pendentes)
+
+    def enfileirar(self, inscricao):
+        """Põe a inscrição na fila e retorna a posição dela; levanta FilaCheia."""
+        self._iniciar()
+        with self._lock:
+            if self._fila.full():
+                raise FilaCheia()
+            self._pendentes.add(inscricao['id'])
+        try:
+            self._escrever_diario(inscricao)
+            self._fila.put_nowait(inscricao)
+        except queue.Full:
+            # Fica no diário; outro worker a recupera quando houver espaço
+            pass
+        except Exception:
+            with self._lock:
+                self._pendentes.discard(inscricao['id'])
+            raise
+        return self._fila.qsize()
+
+    def _arquivo_diario(self, ingresso_id):
+        return os.path.join(self.diario, f"{ingresso_id}.json")
+
+    def _escrever_diario(self, inscricao):
+        if not self.diario:
+            return
+        arquivo = self._arquivo_diario(inscricao['id'])
+        temporario = f"{arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(inscricao, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, arquivo)
+
+    def _apagar_diario(self, ids):
+        if not self.diario:
+            return
+        for ingresso_id in ids:
+            try:
+                os.remove(self._arquivo_diario(ingresso_id))
+            except FileNotFoundError:
+                pass
+
+    def recuperar(self):
+        """Põe de volta na fila as inscrições paradas no diário; retorna quantas."""
+        if not self.diario:
+            return 0
+        self._iniciar()
+        recuperadas = 0
+        limite = time.time() - self.recuperar_apos
+        for arquivo in glob.glob(os.path.join(self.diario, '*.json')):
+            try:
+                if os.path.getmtime(arquivo) > limite:
+                    continue
+                # O mtime novo funciona como reserva: os outros workers deixam o arquivo em paz
+                os.utime(arquivo)
+                with open(arquivo, encoding='utf-8') as f:
+                    inscricao = json.load(f)
+            except (OSError, ValueError):
+                logger.exception("Inscrição ilegível no diário: %s", arquivo)
+                continue
+            with self._lock:
+                if inscricao['id'] in self._pendentes:
+                    continue
+                self._pendentes.add(inscricao['id'])
+            try:
+                self._fila.put_nowait(inscricao)
+            except queue.Full:
+                with self._lock:
+                    self._pendentes.discard(inscricao['id'])
+                break
+            recuperadas += 1
+        if recuperadas:
+            logger.warning("%d inscrição(ões) recuperada(s) do diário", recuperadas)
+        return recuperadas
+
+    def aguardar(self, timeout=None):
+        """Espera a fila esvaziar (usado nos benchmarks e ao encerrar)."""
+        limite = time.monotonic() + timeout if timeout else None
+        while self._pendentes and (limite is None or time.monotonic() < limite):
+            time.sleep(0.01)
+        return not self._pendentes
+
+    def _gravar_lotes(self):
+        recuperado_em = 0
+        while True:
+            if time.monotonic() - recuperado_em >= self.recuperar_apos:
+                recuperado_em = time.monotonic()
+                self.recuperar()
+            try:
+                lote = [self._fila.get(timeout=self.recuperar_apos)]
+            except queue.Empty:
+                continue
+            # Junta o que chegar durante a espera, até o tamanho do lote
+            prazo = time.monotonic() + self.espera
+            while len(lote) < self.lote:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                self._apagar_diario(self.gravar(lote))
+            except Exception:
+                logger.exception("Falha ao gravar um lote de %d inscrição(ões); ficam no diário: %s",
+                                 len(lote), ', '.join(i['id'] for i in lote))
+            finally:
+                with self._lock:
+                    self._pendentes.difference_update(i['id'] for i in lote)
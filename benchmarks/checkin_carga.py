@@ -0,0 +1,85 @@
+# Teste de carga do check-in: leitores de QR Code em paralelo, com latência p50/p95/p99
+# Uso: python benchmarks/checkin_carga.py [--leituras 1000] [--leitores 4] [--memoria]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentil(valores, p):
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--leituras', type=int, default=1000)
+    parser.add_argument('--leitores', type=int, default=4)
+    parser.add_argument('--repetidas', type=float, default=0.05, help='fração de leituras repetidas')
+    parser.add_argument('--memoria', action='store_true', help='usa o modo só em memória (EVENTO_MEMORIA=1)')
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='checkin_carga_')
+    os.chdir(pasta)
+    if args.memoria:
+        os.environ.pop('DATABASE_URL', None)
+        os.environ['EVENTO_MEMORIA'] = '1'
+    else:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'carga.db')}"
+    os.environ['CHECKIN_TOKEN'] = 'carga'
+    sys.path.insert(0, RAIZ)
+    import evento
+    from checkin import payload_qr
+    evento.inicializar_banco()
+
+    ids = [str(uuid.uuid4()) for _ in range(args.leituras)]
+    with evento.app.app_context():
+        evento.repositorio.adicionar([{
+            'id': i, 'nome_completo': f"Participante {n}", 'telefone': '71999990000', 'email': f"p{n}@example.com",
+            'tipo_ingresso': 'Individual', 'comprovante_pix': 'carga.png', 'validado': True} for n, i in enumerate(ids)])
+        evento.repositorio.confirmar()
+
+    leituras = [payload_qr(i, evento.app.secret_key) for i in ids]
+    leituras += random.sample(leituras, int(len(leituras) * args.repetidas))
+    random.shuffle(leituras)
+
+    latencias = []
+    status = {}
+    lock = threading.Lock()
+    cliente = evento.app.test_client()
+    cliente.post('/checkin', json={'qr': 'aquecimento'}, headers={'X-Checkin-Token': 'carga'})
+
+    def leitor(fatia):
+        c = evento.app.test_client()
+        for qr in fatia:
+            inicio = time.perf_counter()
+            resposta = c.post('/checkin', json={'qr': qr, 'dispositivo': threading.current_thread().name},
+                              headers={'X-Checkin-Token': 'carga'})
+            duracao = time.perf_counter() - inicio
+            with lock:
+                latencias.append(duracao)
+                status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=leitor, args=(leituras[n::args.leitores],), name=f"leitor-{n}") for n in range(args.leitores)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    print(f"modo: {'memória' if args.memoria else 'SQLite'}   leituras: {len(latencias)}   leitores: {args.leitores}")
+    print(f"respostas: {dict(sorted(status.items()))}  (200 = admitido, 409 = leitura repetida)")
+    print(f"latência p50 {percentil(latencias, 50) * 1000:.2f} ms   p95 {percentil(latencias, 95) * 1000:.2f} ms   "
+          f"p99 {percentil(latencias, 99) * 1000:.2f} ms   máx {latencias[-1] * 1000:.2f} ms")
+    print(f"vazão: {len(latencias) / total:.0f} leituras/s (meta: 1000 pessoas em 20 min = {1000 / 1200:.2f}/s)")
+
+
+if __name__ == '__main__':
+    main()
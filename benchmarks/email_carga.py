@@ -0,0 +1,124 @@
+# Carga do envio dos ingressos por e-mail contra um servidor SMTP de teste (requer aiosmtpd)
+# Uso: python benchmarks/email_carga.py [--inscricoes 500] [--workers 4] [--recusar 0.1]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Contador:
+    """Handler do aiosmtpd que conta as mensagens e as conexões."""
+
+    def __init__(self, recusar, semente):
+        self.recusar = recusar
+        self.rng = random.Random(semente)
+        self.lock = threading.Lock()
+        self.mensagens = 0
+        self.recusadas = 0
+        self.conexoes = 0
+        self.ja_recusados = set()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self.lock:
+            self.conexoes += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        destino = envelope.rcpt_tos[0]
+        with self.lock:
+            if destino not in self.ja_recusados and self.rng.random() < self.recusar:
+                self.ja_recusados.add(destino)
+                self.recusadas += 1
+                return '451 Tente novamente mais tarde'
+            self.mensagens += 1
+        return '250 OK'
+
+
+def _semear(evento, quantidade):
+    base = datetime(2026, 1, 1)
+    with evento.app.app_context():
+        ids = evento.repositorio.adicionar([{
+            'id': str(uuid.uuid4()),
+            'nome_completo': f"Participante {n:05d}",
+            'nome_secundario': None,
+            'telefone': f"71 9{n:08d}",
+            'email': f"p{n}@example.com",
+            'tipo_ingresso': 'Individual',
+            'comprovante_pix': 'pix.png',
+            'validado': False,
+            'criado_em': base + timedelta(seconds=n),
+        } for n in range(quantidade)])
+        evento.repositorio.confirmar()
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--inscricoes', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4, help='threads de envio (EMAIL_WORKERS)')
+    parser.add_argument('--recusar', type=float, default=0.0, help='fração recusada com 451 na primeira vez')
+    parser.add_argument('--porta', type=int, default=8025)
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("Este benchmark precisa do aiosmtpd: pip install aiosmtpd")
+
+    contador = Contador(args.recusar, semente=1)
+    servidor = Controller(contador, hostname='127.0.0.1', port=args.porta)
+    servidor.start()
+
+    pasta = tempfile.mkdtemp(prefix='email_carga_')
+    os.chdir(pasta)
+    os.environ.pop('DATABASE_URL', None)
+    os.environ.pop('EVENTO_MEMORIA', None)
+    os.environ['SQLITE_PATH'] = os.path.join(pasta, 'dados', 'evento.db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(pasta, 'arquivos_enviados')
+    os.environ.update(SMTP_HOST='127.0.0.1', SMTP_PORT=str(args.porta), SMTP_SEGURANCA='nenhuma',
+                      EMAIL_WORKERS=str(args.workers), EMAIL_ESPERA_BASE='0.5')
+    sys.path.insert(0, RAIZ)
+    import evento
+    evento.inicializar_banco()
+
+    ids = _semear(evento, args.inscricoes)
+    cliente = evento.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['logged_in'] = True
+
+    inicio = time.perf_counter()
+    cliente.post('/admin/validar_lote', data={'ingresso_ids': ids})
+    validacao = time.perf_counter() - inicio
+
+    # Espera todos os envios saírem da fila (enviados ou com falha definitiva)
+    finais = (evento.envio_email.ENVIADO, evento.envio_email.FALHOU)
+    while time.perf_counter() - inicio < args.timeout:
+        with evento.app.app_context():
+            status = evento.status_email_varios(ids)
+        if len(status) == len(ids) and all(s['status'] in finais for s in status.values()):
+            break
+        time.sleep(0.2)
+    total = time.perf_counter() - inicio
+    servidor.stop()
+
+    enviados = sum(s['status'] == evento.envio_email.ENVIADO for s in status.values())
+    tentativas = sum(s['tentativas'] for s in status.values())
+    print(f"{args.inscricoes} ingressos, {args.workers} thread(s) de envio")
+    print(f"validação do lote: {validacao * 1000:.0f} ms")
+    print(f"entrega: {total:.1f} s ({enviados / total:.1f} msg/s), {enviados} enviado(s), "
+          f"{len(ids) - enviados} com falha")
+    print(f"tentativas: {tentativas} ({contador.recusadas} recusa(s) temporária(s) do servidor)")
+    print(f"conexões SMTP: {contador.conexoes} ({contador.mensagens / max(contador.conexoes, 1):.1f} msg/conexão)")
+
+
+if __name__ == '__main__':
+    main()
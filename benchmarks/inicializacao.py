@@ -0,0 +1,145 @@
+# Tempo de subida do app num interpretador novo e, com --gunicorn, com e sem --preload
+# Uso: python benchmarks/inicializacao.py [--repeticoes 5] [--gunicorn 4]
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESADOS = ('reportlab', 'qrcode', 'PIL')
+
+
+def medir():
+    """Roda num processo novo; imprime as medições em JSON."""
+    sys.path.insert(0, RAIZ)
+    inicio = time.perf_counter()
+    import evento
+    importacao = time.perf_counter() - inicio
+    carregados = [m for m in PESADOS if m in sys.modules]
+
+    cliente = evento.app.test_client()
+    inicio = time.perf_counter()
+    status = cliente.get('/').status_code
+    primeira = time.perf_counter() - inicio
+
+    with evento.app.app_context():
+        ingresso_id = evento.repositorio.adicionar([{
+            'nome_completo': 'Participante', 'telefone': '71999990000', 'email': 'p@example.com',
+            'tipo_ingresso': 'Individual', 'comprovante_pix': 'pix.png', 'validado': True}])[0]
+        evento.repositorio.confirmar()
+    inicio = time.perf_counter()
+    status_qr = cliente.get(f'/qr_code/{ingresso_id}').status_code
+    qr = time.perf_counter() - inicio
+
+    print(json.dumps({'importacao_ms': importacao * 1000, 'primeira_requisicao_ms': primeira * 1000,
+                      'primeiro_qr_ms': qr * 1000, 'status': [status, status_qr], 'pesados_no_import': carregados}))
+
+
+def _ambiente(pasta):
+    ambiente = dict(os.environ, PYTHONPATH=RAIZ, SQLITE_PATH=os.path.join(pasta, 'dados', 'evento.db'),
+                    UPLOAD_FOLDER=os.path.join(pasta, 'arquivos_enviados'))
+    ambiente.pop('DATABASE_URL', None)
+    ambiente.pop('EVENTO_MEMORIA', None)
+    return ambiente
+
+
+def _pss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for linha in f:
+                if linha.startswith('Pss:'):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _filhos(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def medir_gunicorn(pasta, workers, preload):
+    porta = _porta_livre()
+    ambiente = dict(_ambiente(pasta), GUNICORN_PRELOAD='1' if preload else '0', WEB_CONCURRENCY=str(workers))
+    inicio = time.perf_counter()
+    processo = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(RAIZ, 'gunicorn.conf.py'),
+                                 '--bind', f'127.0.0.1:{porta}', 'evento:app'],
+                                cwd=pasta, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        primeira = None
+        while time.perf_counter() - inicio < 60:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{porta}/', timeout=5) as resposta:
+                    if resposta.status == 200:
+                        primeira = time.perf_counter() - inicio
+                        break
+            except OSError:
+                time.sleep(0.02)
+        # Uma requisição por worker (aproximadamente) antes de medir a memória
+        for _ in range(workers * 4):
+            urllib.request.urlopen(f'http://127.0.0.1:{porta}/', timeout=5).read()
+        time.sleep(1)
+        pss = _pss_kb(processo.pid) + sum(_pss_kb(p) for p in _filhos(processo.pid))
+    finally:
+        processo.terminate()
+        processo.wait(10)
+    return {'primeira_resposta_ms': primeira and primeira * 1000, 'pss_total_mb': round(pss / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--gunicorn', type=int, metavar='WORKERS', help='mede também o gunicorn com N workers')
+    parser.add_argument('--medir', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.medir:
+        medir()
+        return
+
+    pasta = tempfile.mkdtemp(prefix='inicializacao_')
+    ambiente = _ambiente(pasta)
+    # O banco é criado uma vez, como na fase "release" do deploy
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'evento', 'inicializar-banco'],
+                   cwd=pasta, env=ambiente, check=True, stdout=subprocess.DEVNULL)
+
+    medicoes = []
+    for _ in range(args.repeticoes):
+        saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir'], cwd=pasta, env=ambiente,
+                               capture_output=True, text=True, check=True).stdout
+        medicoes.append(json.loads(saida.strip().splitlines()[-1]))
+
+    print(f"{args.repeticoes} processo(s) novo(s), mediana:")
+    for campo in ('importacao_ms', 'primeira_requisicao_ms', 'primeiro_qr_ms'):
+        print(f"  {campo}: {statistics.median(m[campo] for m in medicoes):.0f}")
+    print(f"  status: {medicoes[-1]['status']}")
+    print(f"  bibliotecas pesadas carregadas no import: {', '.join(medicoes[-1]['pesados_no_import']) or 'nenhuma'}")
+
+    if args.gunicorn:
+        if importlib.util.find_spec('gunicorn') is None:
+            sys.exit("--gunicorn precisa do gunicorn instalado: pip install gunicorn")
+        for preload in (False, True):
+            resultado = medir_gunicorn(pasta, args.gunicorn, preload)
+            print(f"gunicorn {args.gunicorn} worker(s){' --preload' if preload else ''}: "
+                  f"primeira resposta em {resultado['primeira_resposta_ms']:.0f} ms, "
+                  f"PSS total {resultado['pss_total_mb']} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Gravações concorrentes de vários processos no SQLite local, conferidas depois por um processo novo
+# Uso: python benchmarks/registrar_sqlite.py [--processos 4] [--inscricoes 200]
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _importar_app(pasta):
+    os.chdir(pasta)
+    os.environ.pop('DATABASE_URL', None)
+    os.environ.pop('EVENTO_MEMORIA', None)
+    os.environ['SQLITE_PATH'] = os.path.join(pasta, 'dados', 'evento.db')
+    sys.path.insert(0, RAIZ)
+    import evento
+    evento.inicializar_banco()
+    return evento
+
+
+def _imagem(n):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 40), (n % 256, n // 256 % 256, 7)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def worker(pasta, numero, quantidade, fila):
+    evento = _importar_app(pasta)
+    cliente = evento.app.test_client()
+    latencias, erros = [], 0
+    for n in range(quantidade):
+        inicio = time.perf_counter()
+        # Um IP por participante, como no evento real, para não cair no limite por IP
+        resposta = cliente.post('/registrar', content_type='multipart/form-data',
+                                environ_base={'REMOTE_ADDR': f"10.{numero}.{n // 250}.{n % 250}"}, data={
+            'nome': f"Worker {numero} #{n}", 'telefone': '71999990000', 'email': f"w{numero}.{n}@example.com",
+            'tipo_ingresso': 'Individual', 'comprovante_pix': (io.BytesIO(_imagem(numero * quantidade + n)), 'pix.png'),
+        })
+        latencias.append(time.perf_counter() - inicio)
+        erros += resposta.status_code != 302
+    # As inscrições são gravadas em lote por uma thread; espera o último lote
+    evento.fila_inscricoes.aguardar(30)
+    fila.put((latencias, erros))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processos', type=int, default=4)
+    parser.add_argument('--inscricoes', type=int, default=200, help='inscrições por processo')
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='registrar_sqlite_')
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    inicio = time.perf_counter()
+    processos = [contexto.Process(target=worker, args=(pasta, n, args.inscricoes, fila)) for n in range(args.processos)]
+    for p in processos:
+        p.start()
+    resultados = [fila.get() for _ in processos]
+    for p in processos:
+        p.join()
+    total = time.perf_counter() - inicio
+
+    latencias = sorted(l for r, _ in resultados for l in r)
+    erros = sum(e for _, e in resultados)
+    evento = _importar_app(pasta)
+    with evento.app.app_context():
+        gravadas = evento.Inscricao.query.count()
+    esperadas = args.processos * args.inscricoes
+    print(f"processos: {args.processos}   inscrições: {esperadas}   erros: {erros}   gravadas (processo novo): {gravadas}")
+    print(f"latência p50 {latencias[len(latencias) // 2] * 1000:.1f} ms   p99 {latencias[int(len(latencias) * 0.99)] * 1000:.1f} ms   "
+          f"vazão {esperadas / total:.0f} inscrições/s (inclui a partida dos processos)")
+    sys.exit(0 if gravadas == esperadas and not erros else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Geração do PDF do ingresso: caminho antigo contra o contexto de renderização compartilhado
+# Uso: python benchmarks/render_ingresso.py [quantidade]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
+
+from ingresso_pdf import gerar_ingresso, obter_contexto_render
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'estatico', 'imagens', 'logo_casa_firme.png')
+
+EVENTO = {
+    'titulo': "Conferência de Discipulado",
+    'subtitulo': "Discipulado e Legado - Formando a Próxima Geração",
+    'data': "13 e 14 de Setembro",
+    'horario': "Sábado: 18h / Domingo: 08h",
+    'local': "Real Classic Bahia - Hotel e Convenções\nOrla da Pituba - Rua Fernando Menezes de Góes, 165 - Salvador",
+}
+
+INSCRITO = {
+    'nome_completo': "Maria da Silva",
+    'nome_secundario': "João da Silva",
+    'telefone': "(71) 99999-0000",
+    'email': "maria@example.com",
+    'tipo_ingresso': "Casadinha",
+}
+
+
+def _header_legado(canvas_obj, doc):
+    # Cópia do cabeçalho original: abre e decodifica a logo a cada página
+    canvas_obj.saveState()
+    logo_pil_image = Image.open(LOGO_PATH)
+    logo_img_reader = ImageReader(logo_pil_image)
+    timbre_width = 1.5 * inch
+    timbre_height = (timbre_width * logo_pil_image.height) / logo_pil_image.width
+    canvas_obj.drawImage(logo_img_reader, 50, A4[1] - 70, width=timbre_width, height=timbre_height)
+    watermark_width = 4 * inch
+    watermark_height = (watermark_width * logo_pil_image.height) / logo_pil_image.width
+    canvas_obj.setFillAlpha(0.15)
+    canvas_obj.drawImage(logo_img_reader, (A4[0] - watermark_width) / 2, (A4[1] - watermark_height) / 2,
+                         width=watermark_width, height=watermark_height, mask='auto')
+    canvas_obj.setFillAlpha(1.0)
+    canvas_obj.setFont('Helvetica-Bold', 12)
+    canvas_obj.drawCentredString(A4[0]/2, 30, "PAGO")
+    canvas_obj.restoreState()
+
+
+def gerar_ingresso_legado(ingresso_id, pasta):
+    # Cópia da renderização original de validar_ingresso
+    qr_code_path = os.path.join(pasta, f"qr_{ingresso_id}.png")
+    qrcode.make(f"ingresso_id:{ingresso_id}").save(qr_code_path)
+    doc = SimpleDocTemplate(os.path.join(pasta, f"ingresso_{ingresso_id}.pdf"), pagesize=A4,
+                            rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=36)
+    styles = getSampleStyleSheet()
+    titulo_style = ParagraphStyle(name='Titulo', parent=styles['Normal'], fontSize=20, alignment=1, spaceAfter=12)
+    subtitulo_style = ParagraphStyle(name='Subtitulo', parent=styles['Normal'], fontSize=12, alignment=1, spaceAfter=24)
+    table_style = TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+    info = [["Nome Completo:", INSCRITO['nome_completo']], ["Nome Secundário:", INSCRITO['nome_secundario']],
+            ["Telefone:", INSCRITO['telefone']], ["Email:", INSCRITO['email']],
+            ["Tipo de Ingresso:", INSCRITO['tipo_ingresso']], ["", ""]]
+    t = Table(info, colWidths=[2.5*inch, 4*inch])
+    t.setStyle(table_style)
+    detalhes = Table([["Data:", EVENTO['data']], ["Horário:", EVENTO['horario']], ["Local:", EVENTO['local']]],
+                     colWidths=[2.5*inch, 4*inch])
+    detalhes.setStyle(table_style)
+    story = [Paragraph(EVENTO['titulo'], titulo_style), Paragraph(EVENTO['subtitulo'], subtitulo_style),
+             t, Spacer(1, 0.3*inch), detalhes, Spacer(1, 0.3*inch),
+             RLImage(qr_code_path, width=2.5*inch, height=2.5*inch),
+             Paragraph("Apresente este QR Code na entrada do evento para validação.", styles['Italic'])]
+    doc.build(story, onFirstPage=_header_legado, onLaterPages=_header_legado)
+
+
+def medir(nome, funcao, quantidade):
+    funcao(0)  # aquecimento
+    tempos = []
+    for i in range(1, quantidade + 1):
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    media = sum(tempos) / len(tempos)
+    print(f"{nome:<22} média {media * 1000:8.1f} ms   p50 {tempos[len(tempos) // 2] * 1000:8.1f} ms   "
+          f"máx {tempos[-1] * 1000:8.1f} ms")
+    return media
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as pasta:
+        antes = medir("antes (por ingresso)", lambda i: gerar_ingresso_legado(f"legado-{i}", pasta), quantidade)
+        obter_contexto_render(EVENTO, LOGO_PATH)
+        depois = medir("contexto compartilhado", lambda i: gerar_ingresso(f"novo-{i}", INSCRITO, EVENTO, pasta, LOGO_PATH), quantidade)
+        tamanho_antes = os.path.getsize(os.path.join(pasta, "ingresso_legado-1.pdf"))
+        tamanho_depois = os.path.getsize(os.path.join(pasta, "ingresso_novo-1.pdf"))
+    print(f"ganho: {antes / depois:.1f}x   tamanho do PDF: {tamanho_antes // 1024} KB -> {tamanho_depois // 1024} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Cargas em lote nas duas implementações do repositório (o contrato fica em tests/test_repositorio.py)
+# Uso: python benchmarks/repositorio.py [--inscricoes 20000] [--json]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _inscricao(n, base=datetime(2026, 1, 1)):
+    return {
+        'nome_completo': f"Participante {n:06d}",
+        'nome_secundario': f"Acompanhante {n:06d}" if n % 2 else None,
+        'telefone': f"71 9{n:08d}",
+        'email': f"p{n}@example.com",
+        'tipo_ingresso': 'Casadinha' if n % 2 else 'Individual',
+        'comprovante_pix': f"pix/{n % 97:02d}.png",
+        'criado_em': base + timedelta(seconds=n),
+    }
+
+
+def _filtros(**kw):
+    return {'status': None, 'tipo': None, 'busca': None, 'ordem': 'recentes', **kw}
+
+
+def medir(repo, quantidade):
+    resultados = {}
+
+    def marcar(nome, operacoes, inicio):
+        duracao = time.perf_counter() - inicio
+        resultados[nome] = {'operacoes': operacoes, 'segundos': round(duracao, 4), 'por_segundo': round(operacoes / duracao)}
+
+    inicio = time.perf_counter()
+    ids = []
+    for lote in range(0, quantidade, 500):
+        ids += repo.adicionar([_inscricao(n) for n in range(lote, min(lote + 500, quantidade))])
+        repo.confirmar()
+    marcar('adicionar (lotes de 500)', quantidade, inicio)
+
+    inicio = time.perf_counter()
+    for lote in range(0, quantidade, 100):
+        repo.obter(ids[lote:lote + 100])
+    marcar('obter (lotes de 100)', quantidade, inicio)
+
+    inicio = time.perf_counter()
+    paginas = 0
+    apos = None
+    while True:
+        _, apos = repo.listar(_filtros(tipo='Casadinha'), apos, 50)
+        paginas += 1
+        if apos is None:
+            break
+    marcar('listar (páginas de 50, filtro por tipo)', paginas, inicio)
+
+    inicio = time.perf_counter()
+    for n in range(200):
+        repo.contar(_filtros(busca=f"participante {n:06d}"))
+    marcar('contar (busca por nome)', 200, inicio)
+
+    inicio = time.perf_counter()
+    for lote in range(0, quantidade, 200):
+        repo.validar(ids[lote:lote + 200])
+        repo.confirmar()
+    marcar('validar (lotes de 200)', quantidade, inicio)
+
+    inicio = time.perf_counter()
+    total = sum(len(l) for l in repo.iterar_lotes(_filtros(), 1000))
+    marcar('iterar_lotes (exportação)', total, inicio)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--inscricoes', type=int, default=20000)
+    parser.add_argument('--json', action='store_true', help='saída em JSON')
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='repositorio_')
+    os.chdir(pasta)
+    os.environ.pop('DATABASE_URL', None)
+    os.environ.pop('EVENTO_MEMORIA', None)
+    os.environ['SQLITE_PATH'] = os.path.join(pasta, 'dados', 'evento.db')
+    sys.path.insert(0, RAIZ)
+    import evento
+    from repositorio import RepositorioMemoria
+    evento.inicializar_banco()
+
+    relatorio = {}
+    with evento.app.app_context():
+        for nome, criar in (('sql', lambda: evento.repositorio), ('memoria', RepositorioMemoria)):
+            relatorio[nome] = medir(criar(), args.inscricoes)
+
+    if args.json:
+        print(json.dumps({'inscricoes': args.inscricoes, 'resultados': relatorio}, indent=2, ensure_ascii=False))
+        return
+    print(f"inscrições: {args.inscricoes}")
+    print(f"{'carga':44} {'sql/s':>10} {'memória/s':>10}")
+    for carga in relatorio['sql']:
+        print(f"{carga:44} {relatorio['sql'][carga]['por_segundo']:>10} {relatorio['memoria'][carga]['por_segundo']:>10}")
+
+
+if __name__ == '__main__':
+    main()
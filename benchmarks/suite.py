@@ -0,0 +1,350 @@
+# Suíte de carga do app inteiro por banco e tamanho de base; o JSON gerado compara duas versões.
+# O banco indicado em --postgres é apagado e recriado: use um banco de teste.
+#   python benchmarks/suite.py [--tamanhos 1000,10000] [--postgres URL] [--saida arquivo.json]
+#   python benchmarks/suite.py --comparar antes.json depois.json
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Peso de cada rota na mistura de tráfego
+MISTURA = {
+    'pagina_inicial': 40,
+    'registrar': 30,
+    'admin': 20,
+    'validar_ingresso': 10,
+    'qr_code': 20,
+    'ingresso': 20,
+}
+# Ingressos servidos por /qr_code e /ingresso, com o PDF já no cache
+INGRESSOS_PRONTOS = 20
+CONSULTAS_ADMIN = ['', '?status=pendente', '?status=validado', '?tipo=Casadinha', '?ordem=nome', '?q=participante 0001']
+
+
+def percentil(valores, p):
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def resumo(latencias):
+    latencias = sorted(latencias)
+    if not latencias:
+        return {'requisicoes': 0}
+    return {
+        'requisicoes': len(latencias),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+        'max_ms': round(latencias[-1] * 1000, 2),
+    }
+
+
+def rss_pico_mb():
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _png():
+    from PIL import Image
+    saida = io.BytesIO()
+    Image.new('RGB', (64, 64), (30, 120, 60)).save(saida, 'PNG')
+    return saida.getvalue()
+
+
+# --- Um cenário (banco + tamanho), num processo próprio ---
+
+def _semear(evento, tamanho, rng):
+    """Cadastra `tamanho` inscrições, metade validada; retorna (pendentes, prontos)."""
+    base = datetime(2026, 1, 1)
+    ids = []
+    with evento.app.app_context():
+        for inicio in range(0, tamanho, 5000):
+            lote = [{
+                'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                'nome_completo': f"Participante {n:06d}",
+                'nome_secundario': f"Acompanhante {n:06d}" if n % 2 else None,
+                'telefone': f"71 9{n:08d}",
+                'email': f"p{n}@example.com",
+                'tipo_ingresso': 'Casadinha' if n % 2 else 'Individual',
+                'comprovante_pix': f"pix/{n % 97:02d}.png",
+                'validado': n % 2 == 0,
+                'criado_em': base + timedelta(seconds=n),
+            } for n in range(inicio, min(inicio + 5000, tamanho))]
+            ids += evento.repositorio.adicionar(lote)
+            evento.repositorio.confirmar()
+
+        validados = ids[0::2]
+        prontos = validados[:INGRESSOS_PRONTOS]
+        inscritos = evento.repositorio.obter(prontos)
+        for ingresso_id in prontos:
+            # Já no cache de PDFs, como depois da geração feita na validação
+            evento.cache_ingressos.gerar(*evento.trabalho_ingresso(ingresso_id, inscritos[ingresso_id])[2:])
+    pendentes = ids[1::2]
+    rng.shuffle(pendentes)
+    return pendentes, prontos
+
+
+def rodar_cenario(backend, tamanho, requisicoes, threads, semente):
+    pasta = tempfile.mkdtemp(prefix='suite_')
+    os.chdir(pasta)
+    os.environ.pop('EVENTO_MEMORIA', None)
+    if backend == 'memoria':
+        os.environ.pop('DATABASE_URL', None)
+        os.environ['EVENTO_MEMORIA'] = '1'
+    elif backend == 'sqlite':
+        os.environ.pop('DATABASE_URL', None)
+        os.environ['SQLITE_PATH'] = os.path.join(pasta, 'dados', 'evento.db')
+    # postgres: DATABASE_URL já vem do processo principal
+    os.environ.setdefault('RENDER_WORKERS', '1')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(pasta, 'arquivos_enviados')
+    sys.path.insert(0, RAIZ)
+
+    inicio = time.perf_counter()
+    import evento
+    importacao = time.perf_counter() - inicio
+    if backend == 'postgres':
+        with evento.app.app_context():
+            evento.db.drop_all()
+    evento.inicializar_banco()
+    os.makedirs(evento.app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    rng = random.Random(semente)
+    inicio = time.perf_counter()
+    pendentes, prontos = _semear(evento, tamanho, rng)
+    semeadura = time.perf_counter() - inicio
+
+    comprovante = _png()
+    rotas = list(MISTURA)
+    pesos = [MISTURA[r] for r in rotas]
+    latencias = {r: [] for r in rotas}
+    status = {r: {} for r in rotas}
+    lock = threading.Lock()
+    contador = iter(range(10 ** 9))
+
+    def requisicao(cliente, rota, rng_thread):
+        if rota == 'pagina_inicial':
+            return cliente.get('/', headers={'Accept-Encoding': 'br, gzip'})
+        if rota == 'registrar':
+            n = next(contador)
+            return cliente.post('/registrar', content_type='multipart/form-data',
+                                environ_base={'REMOTE_ADDR': f"10.{n // 62500 % 250}.{n // 250 % 250}.{n % 250}"}, data={
+                                    'nome': f"Carga {n}", 'telefone': '71999990000', 'email': f"carga{n}@example.com",
+                                    'tipo_ingresso': 'Individual', 'chave_envio': str(uuid.uuid4()),
+                                    'comprovante_pix': (io.BytesIO(comprovante), 'comprovante.png')})
+        if rota == 'admin':
+            return cliente.get('/admin' + rng_thread.choice(CONSULTAS_ADMIN))
+        if rota == 'validar_ingresso':
+            with lock:
+                ingresso_id = pendentes.pop() if pendentes else None
+            if ingresso_id is None:
+                return cliente.get('/admin')
+            return cliente.get(f'/validar_ingresso/{ingresso_id}')
+        if rota == 'qr_code':
+            return cliente.get(f'/qr_code/{rng_thread.choice(prontos)}')
+        return cliente.get(f'/ingresso/ingresso_{rng_thread.choice(prontos)}.pdf')
+
+    def usuario(numero, quantidade):
+        rng_thread = random.Random(semente + numero)
+        cliente = evento.app.test_client()
+        cliente.post('/login', data={'username': 'Leandro', 'password': '123456'})
+        for _ in range(quantidade):
+            rota = rng_thread.choices(rotas, pesos)[0]
+            comeco = time.perf_counter()
+            resposta = requisicao(cliente, rota, rng_thread)
+            duracao = time.perf_counter() - comeco
+            with lock:
+                latencias[rota].append(duracao)
+                status[rota][resposta.status_code] = status[rota].get(resposta.status_code, 0) + 1
+
+    # Aquecimento: primeiro acesso de cada rota (índices, templates, pool de renderização)
+    usuario(-1, 2 * len(rotas))
+    for rota in rotas:
+        latencias[rota].clear()
+        status[rota].clear()
+
+    inicio = time.perf_counter()
+    grupo = [threading.Thread(target=usuario, args=(n, requisicoes // threads)) for n in range(threads)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    evento.fila_inscricoes.aguardar(60)
+
+    todas = [l for r in rotas for l in latencias[r]]
+    return {
+        'backend': backend,
+        'inscricoes': tamanho,
+        'threads': threads,
+        'importacao_s': round(importacao, 3),
+        'semeadura_s': round(semeadura, 3),
+        'duracao_s': round(duracao, 3),
+        'vazao_rps': round(len(todas) / duracao, 1),
+        'geral': resumo(todas),
+        'rotas': {r: {**resumo(latencias[r]), 'status': {str(k): v for k, v in sorted(status[r].items())}} for r in rotas},
+        'rss_pico_mb': rss_pico_mb(),
+    }
+
+
+# --- Micro-benchmarks ---
+
+def _medir(funcao, quantidade):
+    funcao(-1)  # aquecimento
+    tempos = []
+    for i in range(quantidade):
+        comeco = time.perf_counter()
+        funcao(i)
+        tempos.append(time.perf_counter() - comeco)
+    tempos.sort()
+    return {
+        'operacoes': quantidade,
+        'media_ms': round(sum(tempos) / len(tempos) * 1000, 2),
+        'p50_ms': round(percentil(tempos, 50) * 1000, 2),
+        'p95_ms': round(percentil(tempos, 95) * 1000, 2),
+        'p99_ms': round(percentil(tempos, 99) * 1000, 2),
+    }
+
+
+def micro_benchmarks(quantidade):
+    sys.path.insert(0, RAIZ)
+    import qrcode
+    from checkin import payload_qr
+    from ingresso_pdf import gerar_ingresso, obter_contexto_render
+
+    logo = os.path.join(RAIZ, 'estatico', 'imagens', 'logo_casa_firme.png')
+    evento = {'titulo': "Conferência de Discipulado", 'subtitulo': "Discipulado e Legado",
+              'data': "13 e 14 de Setembro", 'horario': "Sábado: 18h / Domingo: 08h", 'local': "Salvador"}
+    inscrito = {'nome_completo': "Maria da Silva", 'nome_secundario': "João da Silva", 'telefone': "(71) 99999-0000",
+                'email': "maria@example.com", 'tipo_ingresso': "Casadinha"}
+
+    def qr(i):
+        qrcode.make(payload_qr(f"{i:036d}", 'chave')).save(io.BytesIO(), format='PNG')
+
+    with tempfile.TemporaryDirectory() as pasta:
+        obter_contexto_render(evento, logo)
+
+        def pdf(i):
+            gerar_ingresso(f"micro-{i}", {**inscrito, 'qr': payload_qr(f"{i:036d}", 'chave')}, evento, pasta, logo)
+
+        resultados = {'qr_code_png': _medir(qr, quantidade * 5), 'pdf_ingresso': _medir(pdf, quantidade)}
+        resultados['pdf_ingresso']['tamanho_kb'] = round(os.path.getsize(os.path.join(pasta, 'ingresso_micro-0.pdf')) / 1024, 1)
+    return resultados
+
+
+# --- Comparação de dois resultados ---
+
+def comparar(antes, depois):
+    with open(antes) as f:
+        a = json.load(f)
+    with open(depois) as f:
+        b = json.load(f)
+    print(f"{a.get('commit')} -> {b.get('commit')}")
+    cenarios_a = {(c['backend'], c['inscricoes']): c for c in a['cenarios']}
+    for c in b['cenarios']:
+        anterior = cenarios_a.get((c['backend'], c['inscricoes']))
+        if not anterior:
+            continue
+        print(f"\n{c['backend']} / {c['inscricoes']} inscrições: vazão {anterior['vazao_rps']} -> {c['vazao_rps']} req/s, "
+              f"RSS {anterior['rss_pico_mb']} -> {c['rss_pico_mb']} MB")
+        for rota, dados in c['rotas'].items():
+            velho = anterior['rotas'].get(rota, {})
+            if 'p95_ms' in dados and 'p95_ms' in velho:
+                print(f"  {rota:18} p50 {velho['p50_ms']:>8} -> {dados['p50_ms']:<8} p95 {velho['p95_ms']:>8} -> {dados['p95_ms']:<8} "
+                      f"p99 {velho['p99_ms']:>8} -> {dados['p99_ms']}")
+    for nome, dados in b.get('micro', {}).items():
+        velho = a.get('micro', {}).get(nome)
+        if velho:
+            print(f"\nmicro {nome}: média {velho['media_ms']} -> {dados['media_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tamanhos', default='1000,10000', help='inscrições cadastradas, separadas por vírgula (ex.: 1000,10000,100000)')
+    parser.add_argument('--backends', default='sqlite,memoria', help='sqlite, memoria e/ou postgres')
+    parser.add_argument('--postgres', default=os.environ.get('SUITE_POSTGRES_URL'),
+                        help='URL de um PostgreSQL de teste (será apagado); inclui o backend postgres')
+    parser.add_argument('--requisicoes', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--micro', type=int, default=20, help='PDFs gerados no micro-benchmark (0 desliga)')
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--saida', help='arquivo JSON (padrão: benchmark_<commit>.json)')
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'))
+    parser.add_argument('--cenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+    if args.cenario:
+        backend, tamanho = args.cenario.split(':')
+        print(json.dumps(rodar_cenario(backend, int(tamanho), args.requisicoes, args.threads, args.semente)))
+        return
+
+    backends = [b for b in args.backends.split(',') if b]
+    if args.postgres and 'postgres' not in backends:
+        backends.append('postgres')
+    commit = commit_atual()
+    relatorio = {
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'requisicoes': args.requisicoes,
+        'mistura': MISTURA,
+        'cenarios': [],
+    }
+    for backend in backends:
+        if backend == 'postgres' and not args.postgres:
+            print("postgres: sem --postgres/SUITE_POSTGRES_URL, cenário ignorado", file=sys.stderr)
+            continue
+        for tamanho in [int(t) for t in args.tamanhos.split(',') if t]:
+            # Um processo por cenário: o app é configurado na importação e o RSS é medido isolado
+            ambiente = {**os.environ, 'PYTHONPATH': RAIZ}
+            if backend == 'postgres':
+                ambiente['DATABASE_URL'] = args.postgres
+            processo = subprocess.run([sys.executable, os.path.abspath(__file__), '--cenario', f"{backend}:{tamanho}",
+                                       '--requisicoes', str(args.requisicoes), '--threads', str(args.threads),
+                                       '--semente', str(args.semente)],
+                                      env=ambiente, capture_output=True, text=True)
+            if processo.returncode != 0:
+                print(processo.stderr, file=sys.stderr)
+                raise SystemExit(f"cenário {backend}:{tamanho} falhou")
+            cenario = json.loads(processo.stdout.strip().splitlines()[-1])
+            relatorio['cenarios'].append(cenario)
+            geral = cenario['geral']
+            print(f"{backend:8} {tamanho:>7} inscrições   {cenario['vazao_rps']:>7} req/s   p50 {geral['p50_ms']} ms   "
+                  f"p95 {geral['p95_ms']} ms   p99 {geral['p99_ms']} ms   RSS {cenario['rss_pico_mb']} MB")
+    if args.micro:
+        relatorio['micro'] = micro_benchmarks(args.micro)
+        for nome, dados in relatorio['micro'].items():
+            print(f"micro {nome:12} média {dados['media_ms']} ms   p95 {dados['p95_ms']} ms")
+
+    saida = args.saida or f"benchmark_{commit or 'sem_commit'}.json"
+    with open(saida, 'w') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"resultado em {saida}")
+
+
+if __name__ == '__main__':
+    main()
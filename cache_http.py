@@ -0,0 +1,115 @@
+# Cache HTTP: hash do conteúdo dos arquivos (URLs e ETags) e compressão gzip/brotli
+import gzip
+import hashlib
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele as respostas usam só gzip
+    brotli = None
+
+# Tipos que valem a pena comprimir; imagens e PDFs já são comprimidos
+TIPOS_COMPRIMIVEIS = ('text/html', 'text/css', 'text/plain', 'text/csv', 'application/javascript', 'application/json', 'image/svg+xml')
+EXTENSOES_PRE_COMPRIMIDAS = ('.css', '.js', '.html', '.svg', '.txt', '.json')
+TAMANHO_MINIMO_COMPRESSAO = 512
+
+_hashes = {}
+_lock = threading.Lock()
+
+
+def hash_arquivo(caminho):
+    """SHA-256 (hex) do conteúdo do arquivo, ou None se ele não existir.
+
+    O resultado fica em cache por processo e só é recalculado quando o
+    mtime, o tamanho ou o inode do arquivo mudam.
+    """
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    assinatura = (info.st_mtime_ns, info.st_size, info.st_ino)
+    em_cache = _hashes.get(caminho)
+    if em_cache and em_cache[0] == assinatura:
+        return em_cache[1]
+    digest = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(bloco)
+    with _lock:
+        _hashes[caminho] = (assinatura, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def escolher_codificacao(accept_encodings):
+    # `accept_encodings` é request.accept_encodings do Werkzeug
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def comprimir(dados, codificacao, maximo=False):
+    # Respostas dinâmicas usam níveis rápidos; os arquivos pré-comprimidos usam o máximo
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=11 if maximo else 5)
+    return gzip.compress(dados, compresslevel=9 if maximo else 6, mtime=0)
+
+
+class CachePagina:
+    """Última versão renderizada de uma página, com as variantes gzip/brotli
+    já comprimidas e a ETag calculada.
+
+    A `chave` identifica tudo o que muda o HTML; uma chave diferente
+    substitui a versão guardada. O cache é por processo.
+    """
+
+    def __init__(self):
+        # (chave, etag, {codificação ou None: corpo})
+        self._atual = None
+
+    def obter(self, chave):
+        atual = self._atual
+        return atual if atual is not None and atual[0] == chave else None
+
+    def guardar(self, chave, html):
+        corpo = html.encode('utf-8')
+        corpos = {None: corpo}
+        if len(corpo) >= TAMANHO_MINIMO_COMPRESSAO:
+            # Comprimido uma vez por versão: vale usar o nível máximo
+            corpos['gzip'] = comprimir(corpo, 'gzip', maximo=True)
+            if brotli is not None:
+                corpos['br'] = comprimir(corpo, 'br', maximo=True)
+        self._atual = (chave, hashlib.sha256(corpo).hexdigest()[:32], corpos)
+        return self._atual
+
+    def invalidar(self):
+        self._atual = None
+
+
+def pre_comprimir_pasta(pasta):
+    """Grava arquivo.gz e arquivo.br ao lado de cada arquivo de texto da pasta.
+
+    Retorna a quantidade de variantes gravadas; arquivos cujas variantes já
+    estão mais novas que o original são mantidos.
+    """
+    gravados = 0
+    codificacoes = {'gzip': '.gz'}
+    if brotli is not None:
+        codificacoes['br'] = '.br'
+    for raiz, _, arquivos in os.walk(pasta):
+        for arquivo in arquivos:
+            if not arquivo.endswith(EXTENSOES_PRE_COMPRIMIDAS):
+                continue
+            origem = os.path.join(raiz, arquivo)
+            with open(origem, 'rb') as f:
+                dados = f.read()
+            for codificacao, sufixo in codificacoes.items():
+                destino = origem + sufixo
+                if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(origem):
+                    continue
+                with open(destino, 'wb') as f:
+                    f.write(comprimir(dados, codificacao, maximo=True))
+                gravados += 1
+    return gravados
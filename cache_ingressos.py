@@ -0,0 +1,121 @@
+# Cache em disco dos PDFs dos ingressos, com o hash do conteúdo no nome; passando do orçamento, sai o menos acessado
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Mude quando o layout do ingresso mudar, para os PDFs antigos saírem do cache
+VERSAO_LAYOUT = 1
+# Acessos a um PDF tocado há menos que isso (segundos) não atualizam o mtime
+INTERVALO_TOQUE = 60
+# Cada processo confere o tamanho da pasta no máximo a cada tanto tempo
+# (segundos), ou antes disso se a sua estimativa passar do orçamento
+INTERVALO_LIMPEZA = 60
+# A limpeza remove até a pasta ficar nesta fração do orçamento
+FRACAO_APOS_LIMPEZA = 0.9
+
+
+def chave_ingresso(ingresso_id, inscrito, evento, logo_path):
+    """Hash de tudo o que aparece no PDF: campos do inscrito (com o conteúdo
+    do QR Code), dados do evento, a logo e a versão do layout."""
+    try:
+        logo = os.stat(logo_path).st_mtime_ns
+    except OSError:
+        logo = None
+    conteudo = json.dumps([VERSAO_LAYOUT, ingresso_id, inscrito, evento, logo], sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+class CacheIngressos:
+
+    def __init__(self, pasta, limite_bytes):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        self._lock = threading.Lock()
+        self._estimativa = 0
+        self._ultima_limpeza = 0.0
+
+    def relativo(self, chave):
+        return f"{chave[:2]}/{chave}.pdf"
+
+    def caminho(self, chave):
+        return os.path.join(self.pasta, self.relativo(chave))
+
+    def obter(self, chave):
+        """Caminho relativo do PDF em cache, ou None; marca o acesso para o LRU."""
+        caminho = self.caminho(chave)
+        try:
+            if time.time() - os.stat(caminho).st_mtime > INTERVALO_TOQUE:
+                os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        return self.relativo(chave)
+
+    def remover(self, chave):
+        try:
+            os.remove(self.caminho(chave))
+        except FileNotFoundError:
+            pass
+
+    def gerar(self, chave, ingresso_id, inscrito, evento, logo_path):
+        # ReportLab só é carregado por quem gera PDFs (os processos do pool)
+        from ingresso_pdf import gerar_ingresso
+        destino = self.caminho(chave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        gerar_ingresso(ingresso_id, inscrito, evento, os.path.dirname(destino), logo_path,
+                       nome=os.path.basename(destino))
+        with self._lock:
+            self._estimativa += os.path.getsize(destino)
+            limpar = (self._estimativa > self.limite_bytes
+                      or time.monotonic() - self._ultima_limpeza > INTERVALO_LIMPEZA)
+        if limpar:
+            self.liberar_espaco()
+        return self.relativo(chave)
+
+    def liberar_espaco(self):
+        """Remove os PDFs menos usados até a pasta caber no orçamento."""
+        arquivos = []
+        total = 0
+        for raiz, _, nomes in os.walk(self.pasta):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                arquivos.append((info.st_mtime, info.st_size, caminho))
+                total += info.st_size
+        if total > self.limite_bytes:
+            alvo = self.limite_bytes * FRACAO_APOS_LIMPEZA
+            removidos = 0
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= alvo:
+                    break
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+                total -= tamanho
+                removidos += 1
+            logger.info("Cache de ingressos: %d PDF(s) removido(s) para caber no orçamento", removidos)
+        with self._lock:
+            self._estimativa = total
+            self._ultima_limpeza = time.monotonic()
+
+
+# Um cache por processo do pool, criado no primeiro trabalho
+_caches = {}
+
+
+def renderizar_ingresso(pasta, limite_bytes, chave, ingresso_id, inscrito, evento, logo_path):
+    """Trabalho do pool de renderização: gera o PDF no cache e retorna o
+    caminho relativo."""
+    cache = _caches.get((pasta, limite_bytes))
+    if cache is None:
+        cache = _caches[(pasta, limite_bytes)] = CacheIngressos(pasta, limite_bytes)
+    return cache.gerar(chave, ingresso_id, inscrito, evento, logo_path)
@@ -0,0 +1,154 @@
+# Catálogo das imagens da galeria e dos banners, em JSON; recarregado só quando o arquivo muda
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+
+from midia import indexar_derivados
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (desenvolvimento local)
+    fcntl = None
+
+
+class CatalogoMidia:
+
+    def __init__(self, caminho, pastas, pastas_derivados):
+        """`pastas` mapeia o tipo ('galeria', 'banners') para a pasta das
+        imagens e `pastas_derivados` para a pasta das versões redimensionadas."""
+        self.caminho = caminho
+        self.pastas = pastas
+        self.pastas_derivados = pastas_derivados
+        self._lock = threading.Lock()
+        self._assinatura = None
+        self._itens = []
+
+    # --- Leitura ---
+
+    def _recarregar(self):
+        # Confere só o stat do arquivo; relê o JSON quando outro processo o alterou
+        try:
+            info = os.stat(self.caminho)
+        except FileNotFoundError:
+            self.reconstruir()
+            info = os.stat(self.caminho)
+        # O inode muda a cada gravação (os.replace), mesmo dentro do mesmo tick de mtime
+        assinatura = (info.st_mtime_ns, info.st_size, info.st_ino)
+        if assinatura != self._assinatura:
+            with self._lock:
+                with open(self.caminho, 'r', encoding='utf-8') as f:
+                    self._itens = json.load(f)['itens']
+                self._assinatura = assinatura
+        return self._itens
+
+    def versao(self):
+        """Muda a cada alteração do catálogo, feita por qualquer processo."""
+        self._recarregar()
+        return self._assinatura
+
+    def itens(self, tipo):
+        return sorted((i for i in self._recarregar() if i['tipo'] == tipo), key=lambda i: (i['ordem'], i['enviado_em']))
+
+    def item(self, tipo, arquivo):
+        for i in self._recarregar():
+            if i['tipo'] == tipo and i['arquivo'] == arquivo:
+                return i
+        return None
+
+    def banner_atual(self):
+        # O banner mais recente pela data de envio, não pela ordem alfabética do nome
+        banners = [i for i in self._recarregar() if i['tipo'] == 'banners']
+        return max(banners, key=lambda i: (i['enviado_em'], i['ordem'])) if banners else None
+
+    # --- Escrita ---
+
+    @contextmanager
+    def _editar(self):
+        # Trava o catálogo entre processos, entrega a lista atual e grava o resultado
+        with open(self.caminho + '.lock', 'w') as trava:
+            if fcntl:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                itens = self._ler_disco()
+                yield itens
+                self._gravar(itens)
+            finally:
+                if fcntl:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _ler_disco(self):
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                return json.load(f)['itens']
+        except FileNotFoundError:
+            return []
+
+    def _gravar(self, itens):
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'itens': itens}, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, self.caminho)
+
+    def _novo_item(self, tipo, arquivo, ordem, enviado_em=None):
+        from PIL import Image
+        caminho = os.path.join(self.pastas[tipo], arquivo)
+        largura = altura = None
+        try:
+            # Image.open só lê o cabeçalho; a imagem não é decodificada
+            with Image.open(caminho) as imagem:
+                largura, altura = imagem.size
+        except OSError:
+            pass
+        return {
+            'tipo': tipo,
+            'arquivo': arquivo,
+            'enviado_em': (enviado_em or datetime.utcnow()).isoformat(),
+            'largura': largura,
+            'altura': altura,
+            'bytes': os.path.getsize(caminho),
+            'ordem': ordem,
+            'derivados': [],
+        }
+
+    def adicionar(self, tipo, arquivo):
+        with self._editar() as itens:
+            ordem = max((i['ordem'] for i in itens if i['tipo'] == tipo), default=0) + 1
+            itens.append(self._novo_item(tipo, arquivo, ordem))
+
+    def remover(self, tipo, arquivo):
+        with self._editar() as itens:
+            itens[:] = [i for i in itens if not (i['tipo'] == tipo and i['arquivo'] == arquivo)]
+
+    def definir_derivados(self, tipo, arquivo, larguras):
+        with self._editar() as itens:
+            for i in itens:
+                if i['tipo'] == tipo and i['arquivo'] == arquivo:
+                    i['derivados'] = list(larguras)
+
+    def reconstruir(self):
+        """Monta o catálogo a partir das pastas, mantendo os dados já conhecidos.
+
+        Usado na primeira execução e pelo comando `reconstruir-catalogo`; a data
+        de envio de arquivos desconhecidos é a data de modificação do arquivo.
+        """
+        with self._editar() as itens:
+            conhecidos = {(i['tipo'], i['arquivo']): i for i in itens}
+            novos = []
+            for tipo, pasta in self.pastas.items():
+                if not os.path.isdir(pasta):
+                    continue
+                derivados = indexar_derivados(self.pastas_derivados[tipo])
+                arquivos = sorted(os.listdir(pasta), key=lambda a: os.path.getmtime(os.path.join(pasta, a)))
+                ordem = max((i['ordem'] for i in conhecidos.values() if i['tipo'] == tipo), default=0)
+                for arquivo in arquivos:
+                    item = conhecidos.get((tipo, arquivo))
+                    if item is None:
+                        ordem += 1
+                        mtime = datetime.utcfromtimestamp(os.path.getmtime(os.path.join(pasta, arquivo)))
+                        item = self._novo_item(tipo, arquivo, ordem, mtime)
+                    item['derivados'] = derivados.get(os.path.splitext(arquivo)[0], [])
+                    novos.append(item)
+            itens[:] = novos
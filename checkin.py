@@ -0,0 +1,222 @@
+# Check-in na entrada do evento: QR Code assinado com HMAC e índice dos validados em memória
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+PREFIXO = 'CF1'
+PREFIXO_LEGADO = 'ingresso_id:'
+
+# Operações do registro de alterações do manifesto
+VALIDADO = 'v'   # ingresso validado ou nome editado
+EXCLUIDO = 'x'   # inscrição excluída
+ADMITIDO = 'a'   # entrada registrada (online ou sincronizada)
+
+
+def _assinatura(ingresso_id, chave):
+    mac = hmac.new(chave.encode(), f"{PREFIXO}:{ingresso_id}".encode(), hashlib.sha256).digest()
+    # 16 bytes (128 bits) bastam e deixam o QR Code menor
+    return base64.urlsafe_b64encode(mac[:16]).rstrip(b'=').decode()
+
+
+def payload_qr(ingresso_id, chave):
+    return f"{PREFIXO}:{ingresso_id}:{_assinatura(ingresso_id, chave)}"
+
+
+def verificar_payload(payload, chave, aceitar_legado=False):
+    """Retorna o id do ingresso se a assinatura do QR Code confere, ou None.
+
+    Com `aceitar_legado`, aceita também o formato antigo "ingresso_id:<id>"
+    (ingressos emitidos antes da assinatura), que não tem como ser conferido.
+    """
+    payload = (payload or '').strip()
+    if payload.startswith(PREFIXO_LEGADO):
+        return payload[len(PREFIXO_LEGADO):] if aceitar_legado else None
+    partes = payload.split(':')
+    if len(partes) != 3 or partes[0] != PREFIXO:
+        return None
+    _, ingresso_id, assinatura = partes
+    if not hmac.compare_digest(assinatura, _assinatura(ingresso_id, chave)):
+        return None
+    return ingresso_id
+
+
+class IndiceCheckin:
+    """Ingressos validados (id -> nome para exibição) e entradas registradas.
+
+    Um índice por processo, carregado no primeiro acesso depois do fork e
+    atualizado pelas rotas de validação, edição e exclusão deste processo;
+    com banco, o que os outros workers fizerem chega por `sincronizar`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._validados = {}
+        self._admitidos = {}
+        # Registro de alterações do modo em memória; com banco ele fica na tabela
+        # AlteracaoCheckin, compartilhada pelos workers. A sequência é a posição + 1.
+        self._alteracoes = []
+        # Com banco: maior seq do AlteracaoCheckin já aplicado, os seqs da janela
+        # relida que já foram aplicados e o instante da última sincronização
+        self._sincronia = threading.Lock()
+        self._seq = 0
+        self._aplicadas = set()
+        self._sincronizado_em = 0.0
+
+    def aquecer(self, carregar):
+        # `carregar()` retorna (validados {id: nome}, admitidos {id: instante},
+        # seq lido antes das listas)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._validados, self._admitidos, self._seq = carregar()
+            self._aplicadas = set()
+            self._sincronizado_em = time.monotonic()
+            self._pid = os.getpid()
+
+    def sincronizar(self, ler, intervalo, janela):
+        """Aplica as alterações gravadas pelos outros workers, no máximo uma
+        vez a cada `intervalo` segundos; enquanto uma thread lê, as outras
+        seguem com o índice como está.
+
+        `ler(seq)` retorna tuplas (seq, operação, ingresso_id, nome,
+        admitido_em) acima de `seq`. Como no delta do manifesto, relê
+        `janela` alterações abaixo do maior seq visto e pula as já aplicadas.
+        """
+        if time.monotonic() - self._sincronizado_em < intervalo or not self._sincronia.acquire(blocking=False):
+            return
+        try:
+            alteracoes = ler(self._seq - min(self._seq, janela))
+            with self._lock:
+                for seq, operacao, ingresso_id, nome, admitido_em in alteracoes:
+                    if seq in self._aplicadas:
+                        continue
+                    self._aplicadas.add(seq)
+                    self._seq = max(self._seq, seq)
+                    if operacao == VALIDADO:
+                        self._validados[ingresso_id] = nome
+                    elif operacao == EXCLUIDO:
+                        self._validados.pop(ingresso_id, None)
+                        self._admitidos.pop(ingresso_id, None)
+                    elif operacao == ADMITIDO and admitido_em is not None:
+                        self._admitidos.setdefault(ingresso_id, admitido_em)
+                self._aplicadas = {s for s in self._aplicadas if s > self._seq - janela}
+            self._sincronizado_em = time.monotonic()
+        finally:
+            self._sincronia.release()
+
+    def validado(self, ingresso_id):
+        return self._validados.get(ingresso_id)
+
+    def adicionar(self, ingresso_id, nome):
+        self._validados[ingresso_id] = nome
+
+    def remover(self, ingresso_id):
+        self._validados.pop(ingresso_id, None)
+        self._admitidos.pop(ingresso_id, None)
+
+    def admitido_em(self, ingresso_id):
+        return self._admitidos.get(ingresso_id)
+
+    def registrar_admissao(self, ingresso_id, instante=None):
+        """Marca a entrada uma única vez; retorna (nova, instante da entrada)."""
+        with self._lock:
+            anterior = self._admitidos.get(ingresso_id)
+            if anterior is not None:
+                return False, anterior
+            instante = instante or datetime.utcnow()
+            self._admitidos[ingresso_id] = instante
+            return True, instante
+
+    def registrar_alteracao(self, operacao, ingresso_id, nome=None):
+        with self._lock:
+            self._alteracoes.append((len(self._alteracoes) + 1, operacao, ingresso_id, nome))
+
+    def alteracoes_desde(self, seq, limite):
+        return self._alteracoes[seq:seq + limite]
+
+    def instantaneo(self):
+        # (validados, admitidos, sequência) consistentes entre si
+        with self._lock:
+            return dict(self._validados), dict(self._admitidos), len(self._alteracoes)
+
+
+def assinar(dados, chave):
+    """HMAC-SHA256 (hex) do JSON canônico de `dados`.
+
+    Os leitores conferem a assinatura com o mesmo token que usam no
+    cabeçalho X-Checkin-Token antes de confiar num manifesto salvo.
+    """
+    corpo = json.dumps(dados, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hmac.new(chave.encode(), corpo.encode(), hashlib.sha256).hexdigest()
+
+
+def montar_manifesto(validados, admitidos, seq, chave):
+    """Manifesto completo: listas paralelas ordenadas pelo id do ingresso.
+
+    `ids` é ordenado para o leitor achar um ingresso por busca binária, e
+    `nomes[i]` é o nome de `ids[i]`; `admitidos` lista os ids com entrada
+    já registrada. Continua com as alterações a partir de `seq`.
+    """
+    ids = sorted(validados)
+    dados = {
+        'seq': seq,
+        'gerado_em': datetime.utcnow().isoformat(),
+        'ids': ids,
+        'nomes': [validados[i] for i in ids],
+        'admitidos': sorted(i for i in admitidos if i in validados),
+    }
+    dados['assinatura'] = assinar(dados, chave)
+    return dados
+
+
+def montar_delta(desde, alteracoes, mais, chave):
+    """Alterações a aplicar sobre o manifesto, em ordem de seq.
+
+    `alteracoes` são tuplas (seq, operação, ingresso_id, nome) e podem
+    começar abaixo de `desde` (a janela relida no Postgres): o leitor
+    descarta as que já aplicou, pelo par (seq, ingresso_id), e guarda
+    `seq` para o próximo pedido.
+    """
+    dados = {
+        'desde': desde,
+        'seq': max(desde, alteracoes[-1][0]) if alteracoes else desde,
+        'mais': mais,
+        'alteracoes': [list(a) for a in alteracoes],
+    }
+    dados['assinatura'] = assinar(dados, chave)
+    return dados
+
+
+def separar_conflitos(admissoes, registradas):
+    """Separa as entradas feitas offline em novas e conflitos.
+
+    `admissoes` é uma lista de (ingresso_id, instante) e `registradas` um
+    dict {ingresso_id: (instante, dispositivo)} com as entradas já gravadas.
+    Conflito é o ingresso que já tinha entrada registrada ou que aparece
+    mais de uma vez no lote (vale a leitura mais antiga).
+    Retorna (novas [(id, instante)], conflitos [dict]).
+    """
+    novas = {}
+    conflitos = []
+    for ingresso_id, instante in sorted(admissoes, key=lambda a: a[1]):
+        anterior = registradas.get(ingresso_id)
+        if anterior is None and ingresso_id in novas:
+            anterior = (novas[ingresso_id], None)
+        if anterior is not None:
+            conflitos.append({
+                'ingresso_id': ingresso_id,
+                'admitido_em': instante.isoformat(),
+                'registrado_em': anterior[0].isoformat(),
+                'dispositivo': anterior[1],
+            })
+            continue
+        novas[ingresso_id] = instante
+    return list(novas.items()), conflitos
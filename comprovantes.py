@@ -0,0 +1,132 @@
+# Comprovantes do Pix enviados na inscrição, guardados pelo SHA-256 do
+# conteúdo (pix/ab/cd/abcd....png), com uma miniatura WebP ao lado.
+import hashlib
+import os
+import re
+
+from werkzeug.utils import secure_filename
+
+PASTA = 'pix'
+TAMANHO_BLOCO = 64 * 1024
+# Formato detectado pelo Pillow -> extensão gravada
+FORMATOS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+# Assinaturas (magic bytes) dos formatos aceitos, conferidas antes do Pillow
+ASSINATURAS = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'RIFF')
+MENSAGEM_INVALIDO = 'Documento inválido. Por favor, envie uma imagem como comprovante.'
+# Nome público do comprovante (sem subpastas): o digest e a extensão
+NOME_COMPROVANTE = re.compile(r'([0-9a-f]{64})\.(png|jpg|gif|webp)')
+# Comprovantes gravados antes do SHA-256 ficam soltos na pasta de uploads
+EXTENSOES_LEGADO = ('.png', '.jpg', '.jpeg', '.gif')
+TAMANHO_MINIATURA = (480, 960)
+SUFIXO_MINIATURA = '.miniatura.webp'
+
+
+class ComprovanteInvalido(ValueError):
+    """O arquivo enviado não é uma imagem aceita ou passa do limite."""
+
+
+def caminho_relativo(digest, extensao):
+    return f"{PASTA}/{digest[:2]}/{digest[2:4]}/{digest}.{extensao}"
+
+
+def nome_publico(relativo):
+    return os.path.basename(relativo)
+
+
+def caminho_do_nome(nome):
+    """Caminho relativo do comprovante a partir do nome público, ou None se
+    o nome não for de um comprovante (subpastas, PDFs, QR Codes etc.)."""
+    if '/' in nome or '\\' in nome or secure_filename(nome) != nome:
+        return None
+    encontrado = NOME_COMPROVANTE.fullmatch(nome)
+    if encontrado:
+        return caminho_relativo(*encontrado.groups())
+    if nome.lower().endswith(EXTENSOES_LEGADO):
+        return nome
+    return None
+
+
+def caminho_miniatura(relativo):
+    return os.path.splitext(relativo)[0] + SUFIXO_MINIATURA
+
+
+def salvar_comprovante(arquivo, pasta_uploads, limite_bytes):
+    """Grava o comprovante e retorna o caminho relativo a `pasta_uploads`.
+
+    `arquivo` é o FileStorage do Werkzeug. Levanta ComprovanteInvalido se o
+    arquivo estiver vazio, passar de `limite_bytes` ou não for PNG, JPEG,
+    GIF ou WebP.
+    """
+    temporario = os.path.join(pasta_uploads, f"comprovante.{os.getpid()}.{id(arquivo)}.tmp")
+    digest = hashlib.sha256()
+    tamanho = 0
+    try:
+        with open(temporario, 'wb') as destino:
+            for bloco in iter(lambda: arquivo.stream.read(TAMANHO_BLOCO), b''):
+                tamanho += len(bloco)
+                if tamanho > limite_bytes:
+                    raise ComprovanteInvalido(f"O comprovante passa do limite de {round(limite_bytes / (1024 * 1024), 1):g} MB.")
+                digest.update(bloco)
+                destino.write(bloco)
+        if tamanho == 0:
+            raise ComprovanteInvalido('O comprovante enviado está vazio.')
+        extensao = _conferir_imagem(temporario)
+
+        relativo = caminho_relativo(digest.hexdigest(), extensao)
+        final = os.path.join(pasta_uploads, relativo)
+        if os.path.exists(final):
+            # Mesmo conteúdo já guardado: nada a gravar
+            os.remove(temporario)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(temporario, final)
+        return relativo
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+def _conferir_imagem(caminho):
+    with open(caminho, 'rb') as f:
+        inicio = f.read(16)
+    if not inicio.startswith(ASSINATURAS) or (inicio.startswith(b'RIFF') and inicio[8:12] != b'WEBP'):
+        raise ComprovanteInvalido(MENSAGEM_INVALIDO)
+    # Pillow só é carregado no primeiro comprovante, fora do boot dos workers
+    from PIL import Image
+    try:
+        # Image.open só lê o cabeçalho; verify() confere a estrutura sem decodificar os pixels
+        with Image.open(caminho) as imagem:
+            formato = imagem.format
+            largura, altura = imagem.size
+            imagem.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ComprovanteInvalido(MENSAGEM_INVALIDO)
+    if formato not in FORMATOS or largura * altura > Image.MAX_IMAGE_PIXELS:
+        raise ComprovanteInvalido(MENSAGEM_INVALIDO)
+    return FORMATOS[formato]
+
+
+def gerar_miniatura(pasta_uploads, relativo):
+    """Gera a miniatura do comprovante, se ainda não existir, e retorna o
+    caminho relativo dela. Como o comprovante, nunca muda depois de gravada.
+
+    Não depende do Flask: roda nos processos de fundo (veja midia.py).
+    """
+    miniatura = caminho_miniatura(relativo)
+    destino = os.path.join(pasta_uploads, miniatura)
+    if os.path.exists(destino):
+        return miniatura
+    from PIL import Image, ImageOps
+    with Image.open(os.path.join(pasta_uploads, relativo)) as imagem:
+        # JPEG grande é decodificado já reduzido (1/2, 1/4, 1/8)
+        imagem.draft('RGB', TAMANHO_MINIATURA)
+        # Fotos do celular vêm deitadas sem a rotação do EXIF; GIF animado usa o primeiro quadro
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode not in ('RGB', 'RGBA'):
+            imagem = imagem.convert('RGBA' if 'A' in imagem.getbands() or 'transparency' in imagem.info else 'RGB')
+        imagem.thumbnail(TAMANHO_MINIATURA, Image.LANCZOS)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        imagem.save(temporario, format='WEBP', quality=75, method=4)
+    os.replace(temporario, destino)
+    return miniatura
@@ -0,0 +1,225 @@
+# Envio dos ingressos por e-mail: threads por processo, cada uma com a sua conexão SMTP
+import heapq
+import itertools
+import logging
+import os
+import random
+import smtplib
+import ssl
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Estados de um envio
+NA_FILA = 'na_fila'
+ENVIANDO = 'enviando'
+ENVIADO = 'enviado'
+FALHOU = 'falhou'
+
+# Teto da espera entre tentativas (segundos)
+ESPERA_MAXIMA = 30 * 60
+# Conexão sem mensagens por esse tempo (segundos) é fechada
+TEMPO_OCIOSO = 15
+# Mensagens por conexão antes de reconectar (servidores costumam limitar)
+MENSAGENS_POR_CONEXAO = 100
+
+
+class ConexaoSMTP:
+    """Conexão SMTP aberta sob demanda e reaproveitada entre mensagens.
+
+    `seguranca` é 'starttls', 'ssl' ou None.
+    """
+
+    def __init__(self, host, porta, usuario=None, senha=None, seguranca=None, timeout=30):
+        self.host = host
+        self.porta = porta
+        self.usuario = usuario
+        self.senha = senha
+        self.seguranca = seguranca
+        self.timeout = timeout
+        self._smtp = None
+        self._enviadas = 0
+
+    @property
+    def aberta(self):
+        return self._smtp is not None
+
+    def _abrir(self):
+        if self.seguranca == 'ssl':
+            smtp = smtplib.SMTP_SSL(self.host, self.porta, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.porta, timeout=self.timeout)
+            if self.seguranca == 'starttls':
+                smtp.starttls(context=ssl.create_default_context())
+        if self.usuario:
+            smtp.login(self.usuario, self.senha or '')
+        self._smtp = smtp
+        self._enviadas = 0
+
+    def enviar(self, mensagem):
+        if self._smtp is not None and self._enviadas >= MENSAGENS_POR_CONEXAO:
+            self.fechar()
+        if self._smtp is None:
+            self._abrir()
+        try:
+            self._smtp.send_message(mensagem)
+        except smtplib.SMTPServerDisconnected:
+            # O servidor fechou a conexão ociosa: uma nova tentativa na hora
+            self._smtp = None
+            self._abrir()
+            self._smtp.send_message(mensagem)
+        self._enviadas += 1
+
+    def fechar(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
+def erro_permanente(erro):
+    """Recusas 5xx do servidor não melhoram com outra tentativa."""
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        return all(codigo >= 500 for codigo, _ in erro.recipients.values())
+    if isinstance(erro, smtplib.SMTPResponseException):
+        return erro.smtp_code >= 500
+    return isinstance(erro, ValueError)
+
+
+class FilaEmails:
+    """Fila agendada de envios, atendida por `workers` threads com uma
+    conexão SMTP cada (`conectar()` cria uma ConexaoSMTP). Falhas temporárias
+    voltam para a fila com espera crescente; recusas 5xx não.
+
+    Como em FilaRender, o estado de cada envio fica com quem usa a fila:
+    - reservar(job_id): marca o envio como "enviando" e devolve (função que
+      monta a mensagem, tentativas já feitas), ou None se outro processo já o pegou;
+    - concluir(job_id, status, erro, tentativas, espera): grava o resultado;
+      com status NA_FILA, `espera` é quantos segundos até a próxima tentativa;
+    - pendentes(): [(job_id, segundos até a tentativa)] que ficaram na fila
+      antes de um reinício;
+    - recuperar(): devolve para a fila os envios "enviando" abandonados e os
+      lista como em pendentes(); chamada a cada `intervalo_recuperacao` segundos.
+    """
+
+    def __init__(self, conectar, reservar, concluir, pendentes=None, workers=4, tentativas=5, espera_base=30,
+                 recuperar=None, intervalo_recuperacao=60):
+        self.conectar = conectar
+        self.reservar = reservar
+        self.concluir = concluir
+        self.pendentes = pendentes
+        self.recuperar = recuperar
+        self.intervalo_recuperacao = intervalo_recuperacao
+        self.workers = workers
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def iniciar(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # (quando, ordem de chegada, job_id)
+            self._agenda = []
+            self._ordem = itertools.count()
+            self._condicao = threading.Condition()
+            for n in range(self.workers):
+                threading.Thread(target=self._trabalhar, name=f'envio-email-{n}', daemon=True).start()
+            if self.recuperar:
+                threading.Thread(target=self._recuperar_abandonados, name='envio-email-recuperacao', daemon=True).start()
+
+        if self.pendentes:
+            try:
+                for job_id, espera in self.pendentes():
+                    self._agendar(job_id, espera)
+            except Exception:
+                logger.exception("Falha ao retomar os envios de e-mail pendentes")
+
+    def enfileirar(self, job_id, espera=0):
+        self.iniciar()
+        self._agendar(job_id, espera)
+
+    def tamanho(self):
+        return len(self._agenda) if self._pid == os.getpid() else 0
+
+    def _recuperar_abandonados(self):
+        while True:
+            time.sleep(self.intervalo_recuperacao)
+            try:
+                for job_id, espera in self.recuperar():
+                    self._agendar(job_id, espera)
+            except Exception:
+                logger.exception("Falha ao recuperar os envios de e-mail abandonados")
+
+    def _agendar(self, job_id, espera):
+        with self._condicao:
+            heapq.heappush(self._agenda, (time.monotonic() + max(0, espera), next(self._ordem), job_id))
+            self._condicao.notify()
+
+    def _proximo(self, timeout):
+        """O próximo envio já vencido, ou None se nada vencer em `timeout` segundos."""
+        limite = time.monotonic() + timeout if timeout is not None else None
+        with self._condicao:
+            while True:
+                agora = time.monotonic()
+                if self._agenda and self._agenda[0][0] <= agora:
+                    return heapq.heappop(self._agenda)[2]
+                if limite is not None and agora >= limite:
+                    return None
+                esperas = [t - agora for t in (self._agenda[0][0] if self._agenda else None, limite) if t is not None]
+                self._condicao.wait(min(esperas) if esperas else None)
+
+    def _trabalhar(self):
+        conexao = self.conectar()
+        while True:
+            job_id = self._proximo(TEMPO_OCIOSO if conexao.aberta else None)
+            if job_id is None:
+                conexao.fechar()
+                continue
+            try:
+                self._enviar(conexao, job_id)
+            except Exception:
+                logger.exception("Falha inesperada no envio do e-mail %s", job_id)
+
+    def _enviar(self, conexao, job_id):
+        reservado = self.reservar(job_id)
+        if reservado is None:
+            return
+        montar, tentativas = reservado
+        tentativas += 1
+        try:
+            mensagem = montar()
+        except Exception as erro:
+            self._falhou(job_id, erro, tentativas)
+            return
+        try:
+            conexao.enviar(mensagem)
+        except Exception as erro:
+            # Depois de um erro a conexão pode estar num estado inválido
+            conexao.fechar()
+            self._falhou(job_id, erro, tentativas)
+            return
+        self._concluir(job_id, ENVIADO, None, tentativas)
+
+    def _falhou(self, job_id, erro, tentativas):
+        if erro_permanente(erro) or tentativas >= self.tentativas:
+            logger.error("E-mail %s não enviado (%d tentativa(s)): %s", job_id, tentativas, erro)
+            self._concluir(job_id, FALHOU, erro, tentativas)
+            return
+        # Espera exponencial com variação aleatória, para as threads não
+        # voltarem todas juntas depois de uma queda do servidor
+        espera = min(self.espera_base * 2 ** (tentativas - 1), ESPERA_MAXIMA) * random.uniform(0.8, 1.2)
+        self._concluir(job_id, NA_FILA, erro, tentativas, espera)
+        self._agendar(job_id, espera)
+
+    def _concluir(self, job_id, status, erro, tentativas, espera=None):
+        try:
+            self.concluir(job_id, status, erro, tentativas, espera)
+        except Exception:
+            logger.exception("Falha ao registrar o envio do e-mail %s", job_id)
@@ -1,19 +1,48 @@
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, flash, session
+from flask import Flask, render_template, request, redirect, url_for, send_from_directory, flash, session, abort, Response, stream_with_context, g
+from werkzeug.utils import safe_join
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import re
 import uuid
-import qrcode
-from PIL import Image
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
+import json
+import time
+import base64
+import hashlib
+import hmac
+import mimetypes
+import logging
+import threading
+from contextlib import nullcontext
+from concurrent.futures import TimeoutError as FuturoTimeout
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from cache_ingressos import CacheIngressos, chave_ingresso, renderizar_ingresso
+from fila_render import FilaRender, NA_FILA, GERANDO, PRONTO, FALHOU, SUFIXO_PENDENTE
+from indice_inscritos import ORDENS
+from repositorio import RepositorioSQL, RepositorioMemoria
+from midia import gerar_derivados, indexar_derivados, remover_derivados, nome_derivado
+from catalogo_midia import CatalogoMidia
+from exportacao import gerar_csv, gerar_xlsx
+from comprovantes import (salvar_comprovante, ComprovanteInvalido, caminho_miniatura, gerar_miniatura,
+                          nome_publico, caminho_do_nome)
+from sqlite_local import url_sqlite, configurar_wal, trava_inicializacao
+from admissao import LimiteTaxa, FilaInscricoes, FilaCheia
+import envio_email
+import painel
+from painel import AlteracoesMemoria, montar_estatisticas, evento_sse
+from envio_email import ConexaoSMTP, FilaEmails
+from metricas import registro as metricas, medir_banco, formatar as formatar_metricas, Perfilador, PASTA as PASTA_METRICAS
+from checkin import (IndiceCheckin, payload_qr, verificar_payload, montar_manifesto, montar_delta,
+                     separar_conflitos, VALIDADO, EXCLUIDO, ADMITIDO)
+from cache_http import (hash_arquivo, escolher_codificacao, comprimir, pre_comprimir_pasta, CachePagina,
+                        TIPOS_COMPRIMIVEIS, EXTENSOES_PRE_COMPRIMIDAS, TAMANHO_MINIMO_COMPRESSAO)
 
 # Importações para SQLAlchemy
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text, func, insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+from sqlalchemy.schema import CreateIndex
 # Importação para variáveis de ambiente
 from dotenv import load_dotenv
 
@@ -24,11 +53,83 @@ load_dotenv()
 app = Flask(__name__, template_folder='modelos', static_folder='estatico')
 
 app.secret_key = os.environ.get('SECRET_KEY', 'uma_chave_secreta_muito_segura')
-app.config['UPLOAD_FOLDER'] = 'arquivos_enviados'
+app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', 'arquivos_enviados')
 app.config['GALLERY_FOLDER'] = 'estatico/galeria'
 app.config['BANNERS_FOLDER'] = 'estatico/banners'
+# Versões redimensionadas (WebP/JPEG) das fotos; uma subpasta por tipo de upload
+app.config['DERIVADOS_FOLDER'] = 'estatico/derivados'
+app.config['MEDIA_CATALOG_FILE'] = 'catalogo_midia.json'
 app.config['EVENT_TITLE_FILE'] = 'event_title.txt'
 app.config['EVENT_SUBTITLE_FILE'] = 'event_subtitle.txt'
+# Por quanto tempo (segundos) cada worker confia no título/subtítulo em cache
+# antes de conferir a versão no banco (ou o mtime dos arquivos)
+app.config['EVENT_CACHE_TTL'] = float(os.environ.get('EVENT_CACHE_TTL', 5))
+app.config['ADMIN_PAGE_SIZE'] = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+# Inscrições pendentes por lote carregado na fila de revisão dos comprovantes
+app.config['REVISAO_PAGE_SIZE'] = int(os.environ.get('REVISAO_PAGE_SIZE', 20))
+# Token dos leitores de QR Code na entrada (cabeçalho X-Checkin-Token); o
+# admin logado também pode registrar entradas
+app.config['CHECKIN_TOKEN'] = os.environ.get('CHECKIN_TOKEN')
+# Ingressos emitidos antes do QR Code assinado trazem só "ingresso_id:<id>",
+# que não tem assinatura; só são aceitos se ligado explicitamente
+app.config['CHECKIN_ACEITAR_QR_LEGADO'] = os.environ.get('CHECKIN_ACEITAR_QR_LEGADO', '0') == '1'
+# Máximo de alterações por resposta do delta do manifesto de check-in
+app.config['CHECKIN_DELTA_LIMITE'] = int(os.environ.get('CHECKIN_DELTA_LIMITE', 5000))
+# No Postgres o seq é reservado no INSERT e aparece no COMMIT, fora de ordem: o
+# delta relê essa quantidade de alterações abaixo do `desde` e o leitor
+# descarta as que já aplicou (mesmo seq e ingresso_id)
+app.config['CHECKIN_DELTA_JANELA'] = int(os.environ.get('CHECKIN_DELTA_JANELA', 200))
+# Com banco, cada worker aplica ao seu índice do check-in as alterações dos
+# outros no máximo a cada tantos segundos; uma exclusão feita em outro worker
+# pode levar esse tempo para valer na porta
+app.config['CHECKIN_SINCRONIA'] = float(os.environ.get('CHECKIN_SINCRONIA', 1))
+# Limite do corpo das requisições (acima disso o Flask responde 413) e do
+# arquivo do comprovante do Pix
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+app.config['COMPROVANTE_MAX_BYTES'] = int(os.environ.get('COMPROVANTE_MAX_BYTES', 8 * 1024 * 1024))
+# Controle de admissão do /registrar: fichas por IP (taxa por segundo e rajada) e tamanho da fila
+app.config['INSCRICAO_TAXA'] = float(os.environ.get('INSCRICAO_TAXA', 1))
+app.config['INSCRICAO_RAJADA'] = int(os.environ.get('INSCRICAO_RAJADA', 20))
+app.config['INSCRICAO_FILA_MAX'] = int(os.environ.get('INSCRICAO_FILA_MAX', 1000))
+# Inscrições aceitas ficam nessa pasta até serem gravadas no banco
+app.config['INSCRICAO_DIARIO'] = os.environ.get('INSCRICAO_DIARIO', os.path.join(app.config['UPLOAD_FOLDER'], 'inscricoes_pendentes'))
+# Quantos proxies reversos ficam na frente do app (o Render usa um); o IP do
+# participante vem do X-Forwarded-For escrito por eles
+app.config['PROXY_HOPS'] = int(os.environ.get('PROXY_HOPS', 1 if os.environ.get('RENDER') else 0))
+# Painel ao vivo (SSE): intervalo das conferências, duração de cada conexão e conexões por worker
+app.config['PAINEL_INTERVALO'] = float(os.environ.get('PAINEL_INTERVALO', 2))
+app.config['PAINEL_CONEXAO_MAX'] = float(os.environ.get('PAINEL_CONEXAO_MAX', 60))
+app.config['PAINEL_CONEXOES'] = int(os.environ.get('PAINEL_CONEXOES', 2))
+# Token do Prometheus para /metrics (cabeçalho Authorization: Bearer); o
+# admin logado também pode ver as métricas
+app.config['METRICAS_TOKEN'] = os.environ.get('METRICAS_TOKEN')
+# Perfilador por amostragem das requisições lentas (veja metricas.py)
+app.config['METRICAS_PERFIL'] = os.environ.get('METRICAS_PERFIL') == '1'
+app.config['METRICAS_PERFIL_LIMIAR'] = float(os.environ.get('METRICAS_PERFIL_LIMIAR', 1.0))
+app.config['METRICAS_PERFIL_INTERVALO'] = float(os.environ.get('METRICAS_PERFIL_INTERVALO', 0.01))
+# Por quanto tempo (segundos) o uso de disco dos uploads fica em cache
+app.config['METRICAS_DISCO_TTL'] = float(os.environ.get('METRICAS_DISCO_TTL', 60))
+# Cache em disco dos PDFs dos ingressos (orçamento em MB) e espera máxima de /ingresso antes do 202
+app.config['INGRESSOS_CACHE_FOLDER'] = os.environ.get('INGRESSOS_CACHE_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'ingressos'))
+app.config['INGRESSOS_CACHE_MB'] = float(os.environ.get('INGRESSOS_CACHE_MB', 512))
+app.config['INGRESSO_ESPERA'] = float(os.environ.get('INGRESSO_ESPERA', 15))
+# Envio dos ingressos por e-mail na validação (desligado sem SMTP_HOST); SMTP_SEGURANCA: starttls, ssl ou nenhuma
+app.config['SMTP_HOST'] = os.environ.get('SMTP_HOST')
+app.config['SMTP_PORT'] = int(os.environ.get('SMTP_PORT', 587))
+app.config['SMTP_USUARIO'] = os.environ.get('SMTP_USUARIO')
+app.config['SMTP_SENHA'] = os.environ.get('SMTP_SENHA')
+app.config['SMTP_SEGURANCA'] = os.environ.get('SMTP_SEGURANCA', {587: 'starttls', 465: 'ssl'}.get(app.config['SMTP_PORT'], 'nenhuma'))
+app.config['EMAIL_REMETENTE'] = os.environ.get('EMAIL_REMETENTE', app.config['SMTP_USUARIO'] or 'ingressos@localhost')
+# Threads de envio por processo, tentativas por mensagem e espera (segundos) antes da segunda, que dobra a cada falha
+app.config['EMAIL_WORKERS'] = int(os.environ.get('EMAIL_WORKERS', 4))
+app.config['EMAIL_TENTATIVAS'] = int(os.environ.get('EMAIL_TENTATIVAS', 5))
+app.config['EMAIL_ESPERA_BASE'] = float(os.environ.get('EMAIL_ESPERA_BASE', 30))
+# Processos do pool de PDFs e imagens em cada worker do gunicorn: os núcleos
+# divididos entre os workers (WEB_CONCURRENCY, preenchido pelo gunicorn.conf.py)
+app.config['RENDER_WORKERS'] = int(os.environ.get('RENDER_WORKERS', max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))))
+
+if app.config['PROXY_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_HOPS'], x_proto=app.config['PROXY_HOPS'])
 
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
@@ -38,10 +139,14 @@ if not os.path.exists(app.config['BANNERS_FOLDER']):
     os.makedirs(app.config['BANNERS_FOLDER'])
 
 # Lógica de seleção do banco de dados
-USE_DATABASE = os.environ.get('DATABASE_URL') is not None
+# Sem DATABASE_URL, SQLite local em modo WAL; EVENTO_MEMORIA=1 mantém o modo só em memória
+USE_MEMORIA = os.environ.get('EVENTO_MEMORIA') == '1'
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join('dados', 'evento.db'))
+DATABASE_URL = os.environ.get('DATABASE_URL') or (None if USE_MEMORIA else url_sqlite(SQLITE_PATH))
+USE_DATABASE = DATABASE_URL is not None
 
 if USE_DATABASE:
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     db = SQLAlchemy(app)
 
@@ -54,7 +159,18 @@ if USE_DATABASE:
         email = db.Column(db.String(100), nullable=False)
         tipo_ingresso = db.Column(db.String(20), nullable=False)
         comprovante_pix = db.Column(db.String(100), nullable=False)
-        validado = db.Column(db.Boolean, default=False)
+        validado = db.Column(db.Boolean, default=False, index=True)
+        criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+        # Índices da listagem do admin: filtros por status, tipo e email, e a
+        # paginação por cursor em (criado_em, id)
+        __table_args__ = (
+            db.Index('ix_inscricao_tipo_ingresso', 'tipo_ingresso'),
+            db.Index('ix_inscricao_email', func.lower(email)),
+            db.Index('ix_inscricao_criado_em_id', 'criado_em', 'id'),
+            # Comprovantes repetidos (o caminho é o SHA-256 do arquivo)
+            db.Index('ix_inscricao_comprovante_pix', 'comprovante_pix'),
+        )
 
     class Admin(db.Model):
         id = db.Column(db.Integer, primary_key=True)
@@ -65,11 +181,79 @@ if USE_DATABASE:
         id = db.Column(db.Integer, primary_key=True)
         titulo = db.Column(db.String(255), nullable=False)
         subtitulo = db.Column(db.String(255), nullable=False)
+        # Incrementada a cada edição; os workers comparam com a versão em cache
+        versao = db.Column(db.Integer, nullable=False, default=1)
+
+    # Trabalho de geração do PDF de um ingresso; a tabela guarda a fila para
+    # que os trabalhos pendentes sobrevivam a um reinício do servidor.
+    class TrabalhoIngresso(db.Model):
+        ingresso_id = db.Column(db.String(36), primary_key=True)
+        status = db.Column(db.String(20), nullable=False, default=NA_FILA, index=True)
+        erro = db.Column(db.Text, nullable=True)
+        atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Entrada registrada no check-in; a chave primária garante uma única entrada por ingresso
+    class Checkin(db.Model):
+        ingresso_id = db.Column(db.String(36), primary_key=True)
+        admitido_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+        dispositivo = db.Column(db.String(100), nullable=True)
+
+    # Envio do ingresso por e-mail; guarda a fila e as tentativas para que
+    # os envios pendentes sobrevivam a um reinício do servidor.
+    class EnvioEmail(db.Model):
+        ingresso_id = db.Column(db.String(36), primary_key=True)
+        status = db.Column(db.String(20), nullable=False, default=envio_email.NA_FILA, index=True)
+        tentativas = db.Column(db.Integer, nullable=False, default=0)
+        erro = db.Column(db.Text, nullable=True)
+        proxima_tentativa = db.Column(db.DateTime, nullable=True)
+        atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Registro numerado das alterações do manifesto de check-in, para os leitores sem rede
+    class AlteracaoCheckin(db.Model):
+        seq = db.Column(db.Integer, primary_key=True)
+        operacao = db.Column(db.String(1), nullable=False)
+        ingresso_id = db.Column(db.String(36), nullable=False)
+        nome = db.Column(db.String(100), nullable=True)
+        criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Registro numerado das alterações das inscrições para o painel do admin
+    # (novas, validadas, editadas e excluídas; veja painel.py)
+    class AlteracaoPainel(db.Model):
+        seq = db.Column(db.Integer, primary_key=True)
+        operacao = db.Column(db.String(1), nullable=False)
+        ingresso_id = db.Column(db.String(36), nullable=False)
+        criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Colunas que db.create_all() não acrescenta em tabelas antigas: (tabela, coluna, tipo SQL, valor inicial)
+    COLUNAS_NOVAS = [
+        ('inscricao', 'criado_em', 'TIMESTAMP', datetime.utcnow),
+        ('evento_info', 'versao', 'INTEGER', lambda: 1),
+    ]
+
+    def _atualizar_esquema():
+        inspetor = inspect(db.engine)
+        for tabela, coluna, tipo, valor_inicial in COLUNAS_NOVAS:
+            if coluna in {c['name'] for c in inspetor.get_columns(tabela)}:
+                continue
+            with db.engine.begin() as conexao:
+                conexao.execute(text(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}'))
+                conexao.execute(text(f'UPDATE {tabela} SET {coluna} = :valor WHERE {coluna} IS NULL'), {'valor': valor_inicial()})
+        with db.engine.begin() as conexao:
+            for indice in Inscricao.__table__.indexes:
+                conexao.execute(CreateIndex(indice, if_not_exists=True))
 
-    # Função para inicializar o banco de dados
+    # Só registra os eventos do engine; nenhuma conexão é aberta no import
+    with app.app_context():
+        configurar_wal(db.engine)
+        medir_banco(metricas, db.engine, db.session)
+
+    # Idempotente; roda pelo comando inicializar-banco, nunca de dentro de um pedido.
+    # A trava de arquivo só serve ao SQLite local; no Postgres o comando roda uma vez por release
     def inicializar_banco():
-        with app.app_context():
+        trava = nullcontext() if os.environ.get('DATABASE_URL') else trava_inicializacao(os.path.abspath(SQLITE_PATH))
+        with app.app_context(), trava:
             db.create_all()
+            _atualizar_esquema()
             if not Admin.query.filter_by(username='Leandro').first():
                 admin_user = Admin(username='Leandro', password='123456')
                 db.session.add(admin_user)
@@ -77,98 +261,487 @@ if USE_DATABASE:
                 evento_info = EventoInfo(titulo="Conferência de Discipulado", subtitulo="Discipulado e Legado - Formando a Próxima Geração")
                 db.session.add(evento_info)
             db.session.commit()
-    # NOVA CHAMADA: O banco é inicializado aqui, antes de qualquer rota ser acessada.
-    inicializar_banco()
+
+    def apos_fork():
+        # Conexões herdadas do processo pai não podem ser usadas pelo filho;
+        # close=False descarta o pool sem fechar os sockets do pai
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+    repositorio = RepositorioSQL(db, Inscricao)
 else:
     # A lógica original do dicionário permanece
     ADMIN_CREDENTIALS = {
         'username': 'Leandro',
         'password': '123456'
     }
-    inscritos = {}
+    repositorio = RepositorioMemoria()
+
+    def inicializar_banco():
+        pass
+
+    def apos_fork():
+        pass
+
+    # Status da geração do PDF de cada ingresso (no banco é a tabela TrabalhoIngresso)
+    estado_render = {}
+    # Envio de cada ingresso por e-mail (no banco é a tabela EnvioEmail)
+    estado_email = {}
+
+FALTA_INICIALIZAR = ("Banco sem as tabelas do app: rode `flask --app evento inicializar-banco` "
+                     "(no Procfile é a fase release) antes de subir o servidor.")
+_banco_conferido = False
+
+def banco_pronto():
+    """Confere se inicializar-banco já criou as tabelas. Só lê o catálogo do
+    banco, sem DDL; depois da primeira resposta positiva o processo não
+    pergunta mais."""
+    global _banco_conferido
+    if _banco_conferido or not USE_DATABASE:
+        return True
+    with app.app_context():
+        existentes = set(inspect(db.engine).get_table_names())
+    _banco_conferido = set(db.metadata.tables) <= existentes
+    return _banco_conferido
+
+@app.before_request
+def conferir_banco():
+    if not banco_pronto():
+        logger.error(FALTA_INICIALIZAR)
+        return FALTA_INICIALIZAR, 503
+
+# Lidas no import para montar o banco, pastas, caches e filas: trocá-las em
+# create_app não chegaria a esses objetos, então só valem pelo ambiente
+CONFIG_DO_IMPORT = frozenset({
+    'SQLALCHEMY_DATABASE_URI', 'UPLOAD_FOLDER', 'GALLERY_FOLDER', 'BANNERS_FOLDER',
+    'DERIVADOS_FOLDER', 'MEDIA_CATALOG_FILE', 'INGRESSOS_CACHE_FOLDER', 'INGRESSOS_CACHE_MB',
+    'INSCRICAO_DIARIO', 'INSCRICAO_FILA_MAX', 'INSCRICAO_RAJADA', 'INSCRICAO_TAXA',
+    'RENDER_WORKERS', 'EMAIL_WORKERS', 'EMAIL_TENTATIVAS', 'EMAIL_ESPERA_BASE',
+    'SMTP_PORT', 'SMTP_USUARIO', 'PAINEL_CONEXOES', 'PROXY_HOPS',
+    'METRICAS_PERFIL', 'METRICAS_PERFIL_INTERVALO', 'METRICAS_PERFIL_LIMIAR',
+})
+
+def create_app(**config):
+    """Fábrica para o gunicorn (evento:create_app()): aplica `config` sobre
+    app.config e prepara o banco antes do primeiro pedido. Com --preload
+    isso acontece uma vez, no processo mestre. Chaves de CONFIG_DO_IMPORT
+    são recusadas: defina-as pelo ambiente antes de importar o módulo."""
+    fixas = CONFIG_DO_IMPORT.intersection(config)
+    if fixas:
+        raise ValueError('Configuração lida no import, defina pelo ambiente: ' + ', '.join(sorted(fixas)))
+    app.config.update(config)
+    if not banco_pronto():
+        raise RuntimeError(FALTA_INICIALIZAR)
+    return app
 
 # Dados do evento extraídos das imagens fornecidas
 EVENT_LOCAL = "Real Classic Bahia - Hotel e Convenções\nOrla da Pituba - Rua Fernando Menezes de Góes, 165 - Salvador"
 EVENT_DATE = "13 e 14 de Setembro"
 EVENT_TIME = "Sábado: 18h / Domingo: 08h"
 
-# Corrigido: Adicionado a verificação para o caso onde o banco está vazio
-def get_event_title():
+TITULO_PADRAO = "Conferência de Discipulado"
+SUBTITULO_PADRAO = "Discipulado e Legado - Formando a Próxima Geração"
+
+# Cache do título e subtítulo por processo: (versão, título, subtítulo, conferido em)
+_cache_evento = (None, None, None, 0.0)
+
+def _ler_info_evento():
+    # Retorna (versão, título, subtítulo) direto do banco ou dos arquivos
     if USE_DATABASE:
         info = EventoInfo.query.first()
-        return info.titulo if info else "Conferência de Discipulado"
-    else:
-        if os.path.exists(app.config['EVENT_TITLE_FILE']):
-            with open(app.config['EVENT_TITLE_FILE'], 'r', encoding='utf-8') as f:
-                return f.read().strip()
-        return "Conferência de Discipulado"
+        if not info:
+            return None, TITULO_PADRAO, SUBTITULO_PADRAO
+        return info.versao, info.titulo, info.subtitulo
+    versao = _versao_info_evento()
+    textos = []
+    for arquivo, padrao in ((app.config['EVENT_TITLE_FILE'], TITULO_PADRAO), (app.config['EVENT_SUBTITLE_FILE'], SUBTITULO_PADRAO)):
+        if os.path.exists(arquivo):
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                textos.append(f.read().strip())
+        else:
+            textos.append(padrao)
+    return versao, textos[0], textos[1]
+
+def _versao_info_evento():
+    if USE_DATABASE:
+        return db.session.query(EventoInfo.versao).order_by(EventoInfo.id).limit(1).scalar()
+    versao = []
+    for arquivo in (app.config['EVENT_TITLE_FILE'], app.config['EVENT_SUBTITLE_FILE']):
+        try:
+            versao.append(os.stat(arquivo).st_mtime_ns)
+        except OSError:
+            versao.append(None)
+    return tuple(versao)
+
+def get_event_info():
+    global _cache_evento
+    versao, titulo, subtitulo, conferido_em = _cache_evento
+    agora = time.monotonic()
+    if titulo is not None and agora - conferido_em < app.config['EVENT_CACHE_TTL']:
+        return titulo, subtitulo
+    if titulo is None or _versao_info_evento() != versao:
+        versao, titulo, subtitulo = _ler_info_evento()
+    _cache_evento = (versao, titulo, subtitulo, agora)
+    return titulo, subtitulo
+
+def invalidar_cache_evento():
+    global _cache_evento
+    _cache_evento = (None, None, None, 0.0)
+    cache_pagina_inicial.invalidar()
+
+def get_event_title():
+    return get_event_info()[0]
 
-# Corrigido: Adicionado a verificação para o caso onde o banco está vazio
 def get_event_subtitle():
+    return get_event_info()[1]
+
+# --- Cache HTTP ---
+# URLs com ?v=<hash do conteúdo> ficam em cache para sempre; tudo sai com ETag forte
+
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+
+def enviar_arquivo(pasta, filename, cache_control):
+    """send_from_directory com ETag forte e, para arquivos de texto, as
+    variantes .br/.gz pré-comprimidas quando existirem."""
+    pasta = os.path.join(app.root_path, pasta)
+    caminho = safe_join(pasta, filename)
+    if caminho is None or not os.path.isfile(caminho):
+        abort(404)
+
+    etag = hash_arquivo(caminho)
+    enviado = filename
+    codificacao = None
+    if filename.endswith(EXTENSOES_PRE_COMPRIMIDAS):
+        codificacao = escolher_codificacao(request.accept_encodings)
+        sufixo = {'br': '.br', 'gzip': '.gz'}.get(codificacao)
+        if sufixo and os.path.isfile(caminho + sufixo):
+            enviado = filename + sufixo
+            # Cada representação tem a sua ETag forte
+            etag = f"{etag}-{codificacao}"
+        else:
+            codificacao = None
+
+    resposta = send_from_directory(pasta, enviado, etag=etag, conditional=True,
+                                   mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    if codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    if filename.endswith(EXTENSOES_PRE_COMPRIMIDAS):
+        resposta.vary.add('Accept-Encoding')
+    resposta.headers['Cache-Control'] = cache_control
+    return resposta
+
+def estatico(filename):
+    # Só é imutável se o ?v= bate com o conteúdo atual; uma página antiga em
+    # cache pedindo a versão anterior recebe o arquivo atual, sem cache longo.
+    digest = hash_arquivo(os.path.join(app.static_folder, filename))
+    versao = request.args.get('v')
+    cache_control = CACHE_IMUTAVEL if versao and digest and digest.startswith(versao) else 'public, no-cache'
+    return enviar_arquivo(app.static_folder, filename, cache_control)
+
+app.view_functions['static'] = estatico
+
+@app.url_defaults
+def impressao_digital_estatico(endpoint, values):
+    # Todo url_for('static', ...) ganha ?v=<hash>, inclusive nos templates
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        digest = hash_arquivo(os.path.join(app.static_folder, values['filename']))
+        if digest:
+            values['v'] = digest[:12]
+
+@app.after_request
+def comprimir_e_etag(resposta):
+    if (request.method != 'GET' or resposta.status_code != 200 or resposta.direct_passthrough
+            or resposta.is_streamed or resposta.mimetype not in TIPOS_COMPRIMIVEIS
+            or 'Content-Encoding' in resposta.headers or 'ETag' in resposta.headers):
+        return resposta
+
+    corpo = resposta.get_data()
+    codificacao = escolher_codificacao(request.accept_encodings) if len(corpo) >= TAMANHO_MINIMO_COMPRESSAO else None
+    etag = hashlib.sha256(corpo).hexdigest()[:32] + (f"-{codificacao}" if codificacao else '')
+    resposta.set_etag(etag)
+    resposta.vary.add('Accept-Encoding')
+    if 'Cache-Control' not in resposta.headers:
+        resposta.headers['Cache-Control'] = 'private, no-cache'
+
+    if request.if_none_match.contains(etag):
+        resposta.status_code = 304
+        resposta.set_data(b'')
+        return resposta
+    if codificacao:
+        resposta.set_data(comprimir(corpo, codificacao))
+        resposta.headers['Content-Encoding'] = codificacao
+    return resposta
+
+@app.cli.command('comprimir-estaticos')
+def comprimir_estaticos_comando():
+    """Grava as variantes .gz/.br dos arquivos de texto de estatico/."""
+    print(f"{pre_comprimir_pasta(app.static_folder)} variante(s) gravada(s)")
+
+# --- Métricas ---
+# Tempo de cada rota e, com METRICAS_PERFIL=1, o perfil das requisições lentas
+
+perfilador = Perfilador(os.path.join(PASTA_METRICAS, 'perfis'), app.config['METRICAS_PERFIL_LIMIAR'],
+                        app.config['METRICAS_PERFIL_INTERVALO']) if app.config['METRICAS_PERFIL'] else None
+
+# Conexões que ficam abertas por minutos (SSE) não entram no histograma de
+# tempo de resposta nem no perfilador
+ROTAS_CONTINUAS = {'painel_eventos'}
+
+@app.before_request
+def iniciar_medicao():
+    if request.endpoint in ROTAS_CONTINUAS:
+        return
+    g.inicio_requisicao = time.perf_counter()
+    if perfilador:
+        perfilador.comecar()
+
+@app.after_request
+def guardar_status(resposta):
+    g.status_resposta = resposta.status_code
+    return resposta
+
+@app.teardown_request
+def concluir_medicao(erro):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is None:
+        return
+    duracao = time.perf_counter() - inicio
+    rota = request.endpoint or 'nao_encontrada'
+    metricas.observar('http_requisicao_segundos', duracao, rota=rota, metodo=request.method,
+                      status=g.pop('status_resposta', 500))
+    if perfilador:
+        perfilador.terminar(f"{request.method}_{rota}", duracao)
+
+# (instante, bytes, arquivos) da última medição da pasta de uploads
+_uso_disco = (0.0, 0, 0)
+
+def uso_disco_uploads():
+    global _uso_disco
+    medido_em, total, arquivos = _uso_disco
+    if time.monotonic() - medido_em < app.config['METRICAS_DISCO_TTL']:
+        return total, arquivos
+    total = arquivos = 0
+    for raiz, _, nomes in os.walk(app.config['UPLOAD_FOLDER']):
+        for nome in nomes:
+            try:
+                total += os.stat(os.path.join(raiz, nome)).st_size
+                arquivos += 1
+            except OSError:
+                pass
+    _uso_disco = (time.monotonic(), total, arquivos)
+    return total, arquivos
+
+def renderizacoes_pendentes():
     if USE_DATABASE:
-        info = EventoInfo.query.first()
-        return info.subtitulo if info else "Discipulado e Legado - Formando a Próxima Geração"
+        contagem = dict(db.session.query(TrabalhoIngresso.status, func.count()).filter(
+            TrabalhoIngresso.status.in_([NA_FILA, GERANDO])).group_by(TrabalhoIngresso.status))
     else:
-        if os.path.exists(app.config['EVENT_SUBTITLE_FILE']):
-            with open(app.config['EVENT_SUBTITLE_FILE'], 'r', encoding='utf-8') as f:
-                return f.read().strip()
-        return "Discipulado e Legado - Formando a Próxima Geração"
+        valores = list(estado_render.values())
+        contagem = {status: valores.count(status) for status in (NA_FILA, GERANDO)}
+    return [({'status': status}, contagem.get(status, 0)) for status in (NA_FILA, GERANDO)]
+
+def emails_por_status():
+    if USE_DATABASE:
+        contagem = dict(db.session.query(EnvioEmail.status, func.count()).group_by(EnvioEmail.status))
+    else:
+        valores = [e['status'] for e in list(estado_email.values())]
+        contagem = {status: valores.count(status) for status in EMAIL_STATUS_LABELS}
+    return [({'status': status}, contagem.get(status, 0)) for status in EMAIL_STATUS_LABELS]
+
+def metricas_autorizado():
+    token = app.config['METRICAS_TOKEN']
+    cabecalho = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(cabecalho, f"Bearer {token}"):
+        return True
+    return bool(is_authenticated())
+
+@app.route('/metrics')
+def metrics():
+    if not metricas_autorizado():
+        return "Não autorizado.", 401, {'WWW-Authenticate': 'Bearer'}
+
+    base = {'tipo': None, 'busca': None, 'ordem': 'recentes'}
+    bytes_uploads, arquivos_uploads = uso_disco_uploads()
+    medidores = [
+        ('evento_inscricoes', 'Inscrições por status',
+         [({'status': 'validado'}, repositorio.contar({**base, 'status': True})),
+          ({'status': 'pendente'}, repositorio.contar({**base, 'status': False}))]),
+        ('evento_uploads_bytes', 'Espaço ocupado pela pasta de uploads', [({}, bytes_uploads)]),
+        ('evento_uploads_arquivos', 'Arquivos na pasta de uploads', [({}, arquivos_uploads)]),
+        ('evento_renderizacoes_pendentes', 'Ingressos esperando a geração do PDF', renderizacoes_pendentes()),
+        ('evento_emails', 'Envios de ingresso por e-mail por status', emails_por_status()),
+        ('evento_fila_inscricoes', 'Inscrições aceitas ainda não gravadas (neste worker)', [({}, fila_inscricoes.tamanho())]),
+    ]
+    resposta = Response(formatar_metricas(metricas.coletar(), medidores), mimetype='text/plain')
+    resposta.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
 
 # --- Rotas do Site ---
 
+# --- Página inicial ---
+# Cada processo guarda o HTML já comprimido, com a versão do catálogo e o título na chave
+
+cache_pagina_inicial = CachePagina()
+
+def responder_pagina_em_cache(pagina):
+    _, etag, corpos = pagina
+    codificacao = escolher_codificacao(request.accept_encodings)
+    if codificacao not in corpos:
+        codificacao = None
+    # Mesmo formato das ETags de comprimir_e_etag: uma por representação
+    etag += f"-{codificacao}" if codificacao else ''
+    resposta = Response(corpos[codificacao], mimetype='text/html')
+    resposta.set_etag(etag)
+    resposta.vary.add('Accept-Encoding')
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    if request.if_none_match.contains(etag):
+        resposta.status_code = 304
+        resposta.set_data(b'')
+    elif codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    return resposta
+
 @app.route('/')
 def pagina_inicial():
-    gallery_photos = os.listdir(app.config['GALLERY_FOLDER'])
-    banners = os.listdir(app.config['BANNERS_FOLDER'])
-    banners.sort()
-    latest_banner = banners[-1] if banners else None
-    event_title = get_event_title()
-    event_subtitle = get_event_subtitle()
-    return render_template('pagina_inicial.html', gallery_photos=gallery_photos, latest_banner=latest_banner, event_title=event_title, event_subtitle=event_subtitle)
+    # Uma mensagem pendente (flash) é da sessão de quem vai ver a página:
+    # essa resposta é renderizada na hora e fica fora do cache
+    if session.get('_flashes'):
+        return renderizar_pagina_inicial()
+    # A chave é calculada antes de renderizar: uma alteração no meio do
+    # caminho nunca deixa HTML antigo guardado sob a chave nova
+    chave = (catalogo_midia.versao(), get_event_info())
+    pagina = cache_pagina_inicial.obter(chave) or cache_pagina_inicial.guardar(chave, renderizar_pagina_inicial())
+    return responder_pagina_em_cache(pagina)
+
+def renderizar_pagina_inicial():
+    galeria = catalogo_midia.itens('galeria')
+    gallery_photos = [item['arquivo'] for item in galeria]
+    banner = catalogo_midia.banner_atual()
+    latest_banner = banner['arquivo'] if banner else None
+    event_title, event_subtitle = get_event_info()
+
+    fontes_galeria = {item['arquivo']: fontes_imagem('galeria', item['arquivo'], item['derivados']) for item in galeria}
+    fontes_banner = fontes_imagem('banners', banner['arquivo'], banner['derivados']) if banner else None
+    return render_template('pagina_inicial.html', gallery_photos=gallery_photos, latest_banner=latest_banner, event_title=event_title, event_subtitle=event_subtitle,
+                           fontes_galeria=fontes_galeria, fontes_banner=fontes_banner)
+
+# --- Inscrição ---
+# O id vem da chave de envio do formulário: reenviar o mesmo formulário não cria outra inscrição
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE_INSCRICAO = uuid.UUID('6f1c1f7e-3f0c-4b8e-9a59-0a4f6c1d2b10')
+
+# Tentativas de gravar quando o banco está travado ou a conexão caiu
+TENTATIVAS_GRAVACAO = 4
+
+def _gravar_com_novas_tentativas(inscricoes):
+    for tentativa in range(TENTATIVAS_GRAVACAO):
+        try:
+            repositorio.adicionar(inscricoes)
+            registrar_alteracoes_painel(painel.INSCRITO, [i['id'] for i in inscricoes])
+            repositorio.confirmar()
+            return
+        except OperationalError:
+            repositorio.descartar()
+            if tentativa == TENTATIVAS_GRAVACAO - 1:
+                raise
+            time.sleep(0.1 * 2 ** tentativa)
+
+def _gravar_inscricoes(lote):
+    with app.app_context():
+        for inscricao in lote:
+            # As recuperadas do diário trazem a data como texto
+            if isinstance(inscricao['criado_em'], str):
+                inscricao['criado_em'] = datetime.fromisoformat(inscricao['criado_em'])
+        # Reenvios que chegaram depois do primeiro já gravado ficam de fora
+        gravadas = list(repositorio.obter([i['id'] for i in lote]))
+        novas = [i for i in lote if i['id'] not in gravadas]
+        try:
+            _gravar_com_novas_tentativas(novas)
+            return [i['id'] for i in lote]
+        except (IntegrityError, OperationalError):
+            # Outro worker gravou algum destes ids (mesma chave de envio) no meio, ou o banco continua fora
+            repositorio.descartar()
+        for inscricao in novas:
+            try:
+                _gravar_com_novas_tentativas([inscricao])
+            except IntegrityError:
+                repositorio.descartar()
+            except Exception:
+                repositorio.descartar()
+                # Continua no diário e é regravada depois; o log permite recuperá-la à mão
+                logger.exception("Inscrição não gravada (diário: %s): %r",
+                                 fila_inscricoes.diario, inscricao)
+                continue
+            gravadas.append(inscricao['id'])
+        return gravadas
+
+limite_inscricoes = LimiteTaxa(app.config['INSCRICAO_TAXA'], app.config['INSCRICAO_RAJADA'])
+fila_inscricoes = FilaInscricoes(_gravar_inscricoes, tamanho_maximo=app.config['INSCRICAO_FILA_MAX'],
+                                 diario=app.config['INSCRICAO_DIARIO'] if USE_DATABASE else None)
+
+def id_inscricao(chave_envio):
+    return str(uuid.uuid5(NAMESPACE_INSCRICAO, chave_envio))
 
 @app.route('/registrar', methods=['POST'])
 def registrar():
+    espera = limite_inscricoes.permitir(request.remote_addr)
+    if espera:
+        flash(f'Muitas inscrições enviadas deste endereço. Aguarde {int(espera) + 1} segundo(s) e tente de novo.')
+        resposta = redirect(url_for('pagina_inicial'), code=303)
+        resposta.headers['Retry-After'] = str(int(espera) + 1)
+        return resposta
+
     nome_principal = request.form['nome']
     nome_secundario = request.form.get('nome_secundario', '')
     telefone = request.form['telefone']
     email = request.form['email']
     tipo_ingresso = request.form['tipo_ingresso']
-    comprovante = request.files['comprovante_pix']
+    comprovante = request.files.get('comprovante_pix')
 
-    if not comprovante or not comprovante.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
+    if not comprovante:
         flash('Documento inválido. Por favor, envie uma imagem como comprovante.')
         return redirect(url_for('pagina_inicial'))
+    # O tipo é conferido pelo conteúdo, não pela extensão do nome do arquivo
+    try:
+        with metricas.trecho('upload'):
+            comprovante_filename = salvar_comprovante(comprovante, app.config['UPLOAD_FOLDER'], app.config['COMPROVANTE_MAX_BYTES'])
+    except ComprovanteInvalido as erro:
+        flash(str(erro))
+        return redirect(url_for('pagina_inicial'))
 
-    ingresso_id = str(uuid.uuid4())
-    comprovante_filename = f"{ingresso_id}_{comprovante.filename}"
-    comprovante_path = os.path.join(app.config['UPLOAD_FOLDER'], comprovante_filename)
-    comprovante.save(comprovante_path)
+    # Sem a chave gerada pelo formulário (JavaScript desligado), o mesmo email
+    # com o mesmo comprovante conta como reenvio
+    chave_envio = request.form.get('chave_envio') or f"{email.strip().lower()}|{comprovante_filename}"
+    ingresso_id = id_inscricao(chave_envio)
+    if fila_inscricoes.pendente(ingresso_id) or repositorio.obter_um(ingresso_id):
+        flash('Já recebemos esta inscrição! Aguarde a validação do seu pagamento.')
+        return redirect(url_for('pagina_inicial'))
 
-    if USE_DATABASE:
-        novo_inscrito = Inscricao(
-            id=ingresso_id,
-            nome_completo=nome_principal,
-            nome_secundario=nome_secundario,
-            telefone=telefone,
-            email=email,
-            tipo_ingresso=tipo_ingresso,
-            comprovante_pix=comprovante_filename
-        )
-        db.session.add(novo_inscrito)
-        db.session.commit()
-    else:
-        inscritos[ingresso_id] = {
+    try:
+        posicao = fila_inscricoes.enfileirar({
+            'id': ingresso_id,
             'nome_completo': nome_principal,
             'nome_secundario': nome_secundario,
             'telefone': telefone,
             'email': email,
             'tipo_ingresso': tipo_ingresso,
             'comprovante_pix': comprovante_filename,
-            'validado': False,
-            'qr_code_path': None
-        }
-    
-    flash('Seu registro foi enviado! Aguarde a validação do seu pagamento.')
+            'criado_em': datetime.utcnow(),
+        })
+    except FilaCheia:
+        flash('Estamos recebendo muitas inscrições agora. Por favor, tente de novo em alguns segundos.')
+        resposta = redirect(url_for('pagina_inicial'), code=303)
+        resposta.headers['Retry-After'] = '5'
+        return resposta
+
+    # Miniatura para a fila de revisão do admin, gerada no pool de fundo
+    if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], caminho_miniatura(comprovante_filename))):
+        fila_trabalhos.submeter(gerar_miniatura, app.config['UPLOAD_FOLDER'], comprovante_filename)
+
+    flash(f'Recebemos sua inscrição! Você é o nº {posicao} na fila de processamento. Aguarde a validação do seu pagamento.')
     return redirect(url_for('pagina_inicial'))
 
 # --- Rotas de Autenticação e Admin ---
@@ -204,224 +777,765 @@ def logout():
 def is_authenticated():
     return session.get('logged_in')
 
+# --- Listagem paginada das inscrições ---
+# Paginação por cursor: (valor da ordenação, id) do último item da página
+
+def filtros_listagem(args):
+    return {
+        'status': {'pendente': False, 'validado': True}.get(args.get('status')),
+        'tipo': args.get('tipo') or None,
+        'busca': (args.get('q') or '').strip() or None,
+        'ordem': args.get('ordem') if args.get('ordem') in ORDENS else 'recentes',
+    }
+
+def codificar_cursor(valor, ingresso_id):
+    if isinstance(valor, datetime):
+        valor = {'dt': valor.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps([valor, ingresso_id]).encode()).decode()
+
+def decodificar_cursor(cursor):
+    try:
+        valor, ingresso_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(valor, dict):
+            valor = datetime.fromisoformat(valor['dt'])
+    except (ValueError, TypeError, KeyError):
+        return None
+    return valor, ingresso_id
+
+def contar_inscricoes(filtros):
+    return repositorio.contar(filtros)
+
+def listar_inscricoes(filtros, apos=None, limite=None):
+    """Retorna ({id: inscrição} da página, cursor da próxima página ou None)."""
+    pagina, ultimo = repositorio.listar(filtros, apos, limite or app.config['ADMIN_PAGE_SIZE'])
+    return pagina, codificar_cursor(*ultimo) if ultimo else None
+
+def comprovantes_repetidos(pagina):
+    """{id: [(outro id, nome), ...]} das inscrições da página cujo comprovante
+    (o mesmo arquivo, pelo SHA-256) também foi usado em outra inscrição."""
+    usos = repositorio.mesmo_comprovante(data['comprovante_pix'] for data in pagina.values())
+    repetidos = {}
+    for ingresso_id, data in pagina.items():
+        outros = [u for u in usos.get(data['comprovante_pix'], []) if u[0] != ingresso_id]
+        if outros:
+            repetidos[ingresso_id] = outros
+    return repetidos
+
 @app.route('/admin')
 def admin():
     if not is_authenticated():
         return redirect(url_for('login'))
         
-    event_title = get_event_title()
-    event_subtitle = get_event_subtitle()
+    event_title, event_subtitle = get_event_info()
+
+    filtros = filtros_listagem(request.args)
+    apos = decodificar_cursor(request.args['apos']) if request.args.get('apos') else None
+    inscritos_dict, proximo_cursor = listar_inscricoes(filtros, apos)
+    total_filtrado = contar_inscricoes(filtros)
+
+    inscritos_count = repositorio.total()
+    pdf_status = status_pdf_varios(list(inscritos_dict))
+    email_status = status_email_varios(list(inscritos_dict))
+    comprovante_repetido = comprovantes_repetidos(inscritos_dict)
+
+    # Parâmetros atuais da listagem, sem o cursor, para montar os links de paginação
+    args_listagem = {k: v for k, v in request.args.items() if k in ('status', 'tipo', 'q', 'ordem') and v}
+
+    return render_template('admin.html', inscritos=inscritos_dict, event_title=event_title, event_subtitle=event_subtitle, inscritos_count=inscritos_count,
+                           pdf_status=pdf_status, pdf_status_labels=PDF_STATUS_LABELS,
+                           email_status=email_status, email_status_labels=EMAIL_STATUS_LABELS, envio_email_ativo=envio_email_ativo(),
+                           total_filtrado=total_filtrado, proximo_cursor=proximo_cursor, args_listagem=args_listagem,
+                           comprovante_repetido=comprovante_repetido, painel=estatisticas_painel())
+
+# --- Painel do admin ---
+# Contagens e alterações ao vivo por SSE (veja painel.py)
+
+# Máximo de alterações lidas por conferência
+LIMITE_ALTERACOES_PAINEL = 500
+# Como no delta do check-in: com banco, relê essas alterações abaixo do último
+# seq, porque no Postgres uma transação com seq menor pode terminar depois
+JANELA_ALTERACOES_PAINEL = 200
+# Sem alterações por esse tempo (segundos), um comentário mantém a conexão nos proxies
+INTERVALO_PING_PAINEL = 15
+# Acima do limite de conexões, o navegador tenta de novo depois disso (ms)
+ESPERA_PAINEL_CHEIO = 15000
 
+alteracoes_memoria = None if USE_DATABASE else AlteracoesMemoria()
+vagas_painel = threading.BoundedSemaphore(app.config['PAINEL_CONEXOES'])
+
+def registrar_alteracoes_painel(operacao, ingresso_ids):
+    # Como registrar_alteracao_checkin: com banco entra na transação de quem chama
+    if not ingresso_ids:
+        return
     if USE_DATABASE:
-        inscritos_list = Inscricao.query.all()
-        inscritos_dict = {i.id: i for i in inscritos_list}
-        inscritos_count = len(inscritos_list)
+        db.session.execute(insert(AlteracaoPainel), [{'operacao': operacao, 'ingresso_id': i} for i in ingresso_ids])
     else:
-        inscritos_dict = inscritos
-        inscritos_count = len(inscritos)
+        alteracoes_memoria.registrar(operacao, ingresso_ids)
 
-    return render_template('admin.html', inscritos=inscritos_dict, event_title=event_title, event_subtitle=event_subtitle, inscritos_count=inscritos_count)
+def seq_painel():
+    if USE_DATABASE:
+        return db.session.query(func.max(AlteracaoPainel.seq)).scalar() or 0
+    return alteracoes_memoria.seq()
 
+def alteracoes_painel_desde(seq):
+    # Com banco a resposta pode trazer alterações já enviadas; quem chama as descarta pelo seq
+    if USE_DATABASE:
+        janela = min(seq, JANELA_ALTERACOES_PAINEL)
+        linhas = (db.session.query(AlteracaoPainel.seq, AlteracaoPainel.operacao, AlteracaoPainel.ingresso_id)
+                  .filter(AlteracaoPainel.seq > seq - janela).order_by(AlteracaoPainel.seq)
+                  .limit(LIMITE_ALTERACOES_PAINEL + janela))
+        return [tuple(l) for l in linhas]
+    return alteracoes_memoria.desde(seq, LIMITE_ALTERACOES_PAINEL)
 
-# --- Funções de Cabeçalho e Rodapé para o PDF ---
-# (Essa parte permanece a mesma)
+def estatisticas_painel():
+    return montar_estatisticas(*repositorio.estatisticas())
 
-def header_and_footer_pdf(canvas_obj, doc):
-    canvas_obj.saveState()
+def linha_painel(ingresso_id, inscrito):
+    # O que a página precisa para montar a linha da tabela
+    return {
+        'id': ingresso_id,
+        'nome_completo': inscrito['nome_completo'],
+        'email': inscrito['email'],
+        'telefone': inscrito['telefone'],
+        'tipo_ingresso': inscrito['tipo_ingresso'],
+        'validado': inscrito['validado'],
+        'comprovante_url': url_comprovante(inscrito['comprovante_pix']),
+        'validar_url': url_for('validar_ingresso', ingresso_id=ingresso_id),
+    }
 
-    logo_path = os.path.join(app.static_folder, 'imagens', 'logo_casa_firme.png')
-    
-    if os.path.exists(logo_path):
-        logo_pil_image = Image.open(logo_path)
-        logo_width_in_points = logo_pil_image.width
-        logo_height_in_points = logo_pil_image.height
-        logo_img_reader = ImageReader(logo_pil_image)
-
-        timbre_width = 1.5 * inch
-        timbre_height = (timbre_width * logo_height_in_points) / logo_width_in_points
-        canvas_obj.drawImage(logo_img_reader, 50, A4[1] - 70, width=timbre_width, height=timbre_height)
-
-        watermark_width = 4 * inch
-        watermark_height = (watermark_width * logo_height_in_points) / logo_width_in_points
-        x_center = (A4[0] - watermark_width) / 2
-        y_center = (A4[1] - watermark_height) / 2
-        
-        canvas_obj.setFillAlpha(0.15)
-        canvas_obj.drawImage(logo_img_reader, x_center, y_center, width=watermark_width, height=watermark_height, mask='auto')
-        canvas_obj.setFillAlpha(1.0)
+@app.route('/admin/painel')
+def painel_admin():
+    if not is_authenticated():
+        return {'status': 'nao_autorizado'}, 401
+    # A sequência é lida antes das contagens, como no manifesto do check-in
+    seq = seq_painel()
+    return {'seq': seq, **estatisticas_painel()}
+
+@app.route('/admin/painel/eventos')
+def painel_eventos():
+    if not is_authenticated():
+        # 204 faz o EventSource do navegador parar de reconectar
+        return '', 204
+
+    cabecalhos = {'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+    if not vagas_painel.acquire(blocking=False):
+        # Um 503 faria o EventSource desistir; a resposta vazia com retry o faz voltar mais tarde
+        return f'retry: {ESPERA_PAINEL_CHEIO}\n\n', 200, {**cabecalhos, 'Content-Type': 'text/event-stream'}
+
+    # Ao reconectar, o navegador manda o último seq recebido
+    seq = request.headers.get('Last-Event-ID', type=int)
+
+    def corpo():
+        nonlocal seq
+        inicio = ultimo_envio = time.monotonic()
+        if seq is None:
+            seq = seq_painel()
+        # Seqs da janela relida que esta conexão já enviou
+        enviadas = set()
+        yield 'retry: 3000\n\n'
+        yield evento_sse('estatisticas', estatisticas_painel(), seq)
+        while time.monotonic() - inicio < app.config['PAINEL_CONEXAO_MAX']:
+            alteracoes = [a for a in alteracoes_painel_desde(seq) if a[0] not in enviadas]
+            if alteracoes:
+                inscritos = repositorio.obter([i for _, operacao, i in alteracoes if operacao in (painel.INSCRITO, painel.EDITADO)])
+                for seq_alteracao, operacao, ingresso_id in alteracoes:
+                    inscrito = inscritos.get(ingresso_id)
+                    dados = linha_painel(ingresso_id, inscrito) if inscrito else {'id': ingresso_id}
+                    enviadas.add(seq_alteracao)
+                    # O id do evento só avança: é dele que a reconexão continua
+                    seq = max(seq, seq_alteracao)
+                    yield evento_sse('alteracao', {'seq': seq_alteracao, 'operacao': operacao, 'inscricao': dados}, seq)
+                enviadas = {s for s in enviadas if s > seq - JANELA_ALTERACOES_PAINEL}
+                yield evento_sse('estatisticas', estatisticas_painel(), seq)
+                ultimo_envio = time.monotonic()
+            elif time.monotonic() - ultimo_envio > INTERVALO_PING_PAINEL:
+                yield ': ping\n\n'
+                ultimo_envio = time.monotonic()
+            if USE_DATABASE:
+                # Devolve a conexão ao pool entre as conferências; no SQLite
+                # isso também evita segurar um snapshot antigo do WAL
+                db.session.close()
+                time.sleep(app.config['PAINEL_INTERVALO'])
+            else:
+                alteracoes_memoria.aguardar(seq, app.config['PAINEL_INTERVALO'])
+
+    # X-Accel-Buffering: proxies como o nginx não devem acumular o stream
+    resposta = Response(stream_with_context(corpo()), mimetype='text/event-stream', headers=cabecalhos)
+    # A vaga volta quando o stream termina ou o navegador desconecta
+    resposta.call_on_close(vagas_painel.release)
+    return resposta
+
+# --- Exportação das inscrições ---
+# Mesmos filtros e ordem da listagem; o arquivo sai aos pedaços, lido do repositório em lotes
+
+COLUNAS_EXPORTACAO = ['ID', 'Nome completo', 'Segundo nome', 'Telefone', 'Email', 'Tipo de ingresso',
+                      'Validado', 'Inscrito em', 'Entrada em']
+LOTE_EXPORTACAO = 1000
+
+def linhas_exportacao(filtros):
+    for lote in repositorio.iterar_lotes(filtros, LOTE_EXPORTACAO):
+        admitidos = admissoes([data['id'] for data in lote])
+        for data in lote:
+            yield (data['id'], data['nome_completo'], data['nome_secundario'], data['telefone'], data['email'],
+                   data['tipo_ingresso'], data['validado'], data['criado_em'], admitidos.get(data['id']))
+
+@app.route('/admin/exportar.<formato>')
+def exportar_inscricoes(formato):
+    if not is_authenticated():
+        return redirect(url_for('login'))
+    if formato not in ('csv', 'xlsx'):
+        abort(404)
+
+    linhas = linhas_exportacao(filtros_listagem(request.args))
+    nome = f"inscricoes_{datetime.utcnow():%Y%m%d_%H%M}.{formato}"
+    if formato == 'csv':
+        corpo, mimetype = gerar_csv(COLUNAS_EXPORTACAO, linhas), 'text/csv'
     else:
-        print(f"ATENÇÃO: A imagem da logo não foi encontrada em: {logo_path}")
+        corpo, mimetype = gerar_xlsx(COLUNAS_EXPORTACAO, linhas), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # stream_with_context mantém a sessão do banco aberta enquanto o gerador roda
+    resposta = Response(stream_with_context(corpo), mimetype=mimetype)
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome}"'
+    resposta.headers['Cache-Control'] = 'no-store'
+    # Sem buffer no proxy (nginx), para os bytes saírem assim que gerados
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
+
+# --- Fila de geração dos ingressos ---
+# A validação adianta a geração do PDF no cache; /ingresso gera na hora o que faltar
+
+LOGO_PATH = os.path.join(app.static_folder, 'imagens', 'logo_casa_firme.png')
 
-    canvas_obj.setFont('Helvetica-Bold', 12)
-    canvas_obj.setFillColorRGB(0, 0, 0)
-    canvas_obj.drawCentredString(A4[0]/2, 30, "PAGO")
+# Trabalhos "gerando" há mais tempo que isso foram abandonados e voltam para a fila
+TEMPO_MAXIMO_RENDER = timedelta(minutes=10)
+
+PDF_STATUS_LABELS = {
+    NA_FILA: 'Na fila',
+    GERANDO: 'Gerando',
+    PRONTO: 'Pronto',
+    FALHOU: 'Falhou',
+}
+
+def dados_evento():
+    titulo, subtitulo = get_event_info()
+    return {
+        'titulo': titulo,
+        'subtitulo': subtitulo,
+        'data': EVENT_DATE,
+        'horario': EVENT_TIME,
+        'local': EVENT_LOCAL,
+    }
 
-    canvas_obj.restoreState()
+def dados_inscrito(ingresso_id, inscrito):
+    dados = {campo: inscrito[campo] for campo in ('nome_completo', 'nome_secundario', 'telefone', 'email', 'tipo_ingresso')}
+    dados['qr'] = payload_qr(ingresso_id, app.secret_key)
+    return dados
 
+cache_ingressos = CacheIngressos(app.config['INGRESSOS_CACHE_FOLDER'], app.config['INGRESSOS_CACHE_MB'] * 1024 * 1024)
+
+def trabalho_ingresso(ingresso_id, inscrito):
+    """Argumentos de renderizar_ingresso para a versão atual do ingresso."""
+    dados, evento = dados_inscrito(ingresso_id, inscrito), dados_evento()
+    return (cache_ingressos.pasta, cache_ingressos.limite_bytes, chave_ingresso(ingresso_id, dados, evento, LOGO_PATH),
+            ingresso_id, dados, evento, LOGO_PATH)
+
+def chave_do_ingresso(ingresso_id, inscrito):
+    return chave_ingresso(ingresso_id, dados_inscrito(ingresso_id, inscrito), dados_evento(), LOGO_PATH)
+
+@app.cli.command('limpar-ingressos-antigos')
+def limpar_ingressos_antigos_comando():
+    """Remove os PDFs e QR Codes gerados antes do cache de ingressos."""
+    removidos = 0
+    for nome in os.listdir(app.config['UPLOAD_FOLDER']):
+        if (nome.startswith('ingresso_') and nome.endswith('.pdf')) or (nome.startswith('qr_') and nome.endswith('.png')):
+            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], nome))
+            removidos += 1
+    print(f"{removidos} arquivo(s) removido(s)")
+
+def _reservar_render(ingresso_id):
+    if USE_DATABASE:
+        with app.app_context():
+            # Atualização condicional: só um worker do gunicorn consegue reservar o trabalho
+            reservado = TrabalhoIngresso.query.filter_by(ingresso_id=ingresso_id, status=NA_FILA).update(
+                {'status': GERANDO, 'atualizado_em': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+            if not reservado:
+                return None
+            inscrito = repositorio.obter_um(ingresso_id)
+            if not inscrito:
+                TrabalhoIngresso.query.filter_by(ingresso_id=ingresso_id).delete()
+                db.session.commit()
+                return None
+            return trabalho_ingresso(ingresso_id, inscrito)
+    else:
+        inscrito = repositorio.obter_um(ingresso_id)
+        if not inscrito or estado_render.get(ingresso_id) != NA_FILA:
+            return None
+        estado_render[ingresso_id] = GERANDO
+        return trabalho_ingresso(ingresso_id, inscrito)
+
+def _concluir_render(ingresso_id, erro):
+    status = FALHOU if erro is not None else PRONTO
+    if USE_DATABASE:
+        with app.app_context():
+            trabalho = db.session.get(TrabalhoIngresso, ingresso_id)
+            if trabalho:
+                trabalho.status = status
+                trabalho.erro = str(erro) if erro is not None else None
+                trabalho.atualizado_em = datetime.utcnow()
+                db.session.commit()
+    elif ingresso_id in estado_render:
+        estado_render[ingresso_id] = status
+
+def _render_abandonados():
+    if not USE_DATABASE:
+        return []
+    with app.app_context():
+        limite = datetime.utcnow() - TEMPO_MAXIMO_RENDER
+        abandonados = db.session.scalars(
+            update(TrabalhoIngresso).where(TrabalhoIngresso.status == GERANDO, TrabalhoIngresso.atualizado_em < limite)
+            .values(status=NA_FILA).returning(TrabalhoIngresso.ingresso_id)
+            .execution_options(synchronize_session=False)).all()
+        db.session.commit()
+        return abandonados
+
+def _render_pendentes():
+    if not USE_DATABASE:
+        return []
+    _render_abandonados()
+    with app.app_context():
+        return [t.ingresso_id for t in TrabalhoIngresso.query.filter_by(status=NA_FILA).all()]
+
+# O mesmo pool também processa as imagens enviadas (veja processar_imagem_enviada)
+fila_trabalhos = FilaRender(renderizar_ingresso, _reservar_render, _concluir_render, _render_pendentes,
+                            workers=app.config['RENDER_WORKERS'], recuperar=_render_abandonados)
+
+@app.before_request
+def iniciar_fila_trabalhos():
+    # Retoma, uma vez por processo, os trabalhos que ficaram na fila antes de um reinício
+    fila_trabalhos.iniciar()
+    if envio_email_ativo():
+        fila_emails.iniciar()
+
+def _marcar_na_fila(ingresso_ids):
+    # No modo banco as linhas ficam na sessão; quem chama faz o commit junto com a validação
+    if USE_DATABASE:
+        existentes = {t.ingresso_id: t for t in TrabalhoIngresso.query.filter(TrabalhoIngresso.ingresso_id.in_(ingresso_ids))}
+        agora = datetime.utcnow()
+        for ingresso_id in ingresso_ids:
+            trabalho = existentes.get(ingresso_id)
+            if not trabalho:
+                trabalho = TrabalhoIngresso(ingresso_id=ingresso_id)
+                db.session.add(trabalho)
+            trabalho.status = NA_FILA
+            trabalho.erro = None
+            trabalho.atualizado_em = agora
+    else:
+        for ingresso_id in ingresso_ids:
+            estado_render[ingresso_id] = NA_FILA
+
+def enfileirar_ingressos(ingresso_ids, enviar_email=False):
+    if not ingresso_ids:
+        return
+    _marcar_na_fila(ingresso_ids)
+    emails = _marcar_email_na_fila(ingresso_ids) if enviar_email and envio_email_ativo() else []
+    repositorio.confirmar()
+    for ingresso_id in ingresso_ids:
+        fila_trabalhos.enfileirar(ingresso_id)
+    for ingresso_id in emails:
+        fila_emails.enfileirar(ingresso_id)
+
+def status_pdf_varios(ingresso_ids):
+    if USE_DATABASE:
+        return {t.ingresso_id: t.status for t in TrabalhoIngresso.query.filter(TrabalhoIngresso.ingresso_id.in_(ingresso_ids))}
+    return {i: estado_render[i] for i in ingresso_ids if i in estado_render}
+
+def status_pdf(ingresso_id):
+    return status_pdf_varios([ingresso_id]).get(ingresso_id)
+
+
+def validar_inscricoes(ingresso_ids):
+    """Valida as inscrições ainda pendentes entre `ingresso_ids` e retorna
+    {id: inscrição} das que foram validadas agora."""
+    validadas = repositorio.validar(ingresso_ids)
+    validados = list(validadas)
+    # Validação, registro do manifesto e fila gravados em uma única transação
+    for ingresso_id, inscrito in validadas.items():
+        registrar_alteracao_checkin(VALIDADO, ingresso_id, inscrito['nome_completo'])
+    registrar_alteracoes_painel(painel.VALIDADO, validados)
+    enfileirar_ingressos(validados, enviar_email=True)
+    for ingresso_id, inscrito in validadas.items():
+        indice_checkin.adicionar(ingresso_id, inscrito['nome_completo'])
+    return validadas
 
 @app.route('/validar_ingresso/<ingresso_id>')
 def validar_ingresso(ingresso_id):
     if not is_authenticated():
         return redirect(url_for('login'))
     
+    validadas = validar_inscricoes([ingresso_id])
+    if validadas:
+        inscrito = validadas[ingresso_id]
+        flash(f'Ingresso de {inscrito["nome_completo"]} validado com sucesso! O PDF está sendo gerado'
+              + (' e será enviado por e-mail.' if envio_email_ativo() else '.'))
+        return redirect(url_for('admin'))
+    
+    return "Ingresso não encontrado ou já validado.", 404
+
+@app.route('/admin/validar_lote', methods=['POST'])
+def validar_lote():
+    if not is_authenticated():
+        return redirect(url_for('login'))
+
+    # dict.fromkeys remove repetidos mantendo a ordem da seleção
+    ingresso_ids = list(dict.fromkeys(request.form.getlist('ingresso_ids')))
+    if not ingresso_ids:
+        flash('Nenhuma inscrição selecionada.')
+        return redirect(url_for('admin'))
+
+    validadas = validar_inscricoes(ingresso_ids)
+    validados = list(validadas)
+
+    lote = None
+    if validados and request.form.get('pdf_combinado'):
+        from ingresso_pdf import gerar_lote
+        lote = f"lote_{uuid.uuid4()}.pdf"
+        itens = [(i, dados_inscrito(i, validadas[i])) for i in validados]
+        open(os.path.join(app.config['UPLOAD_FOLDER'], lote + SUFIXO_PENDENTE), 'w').close()
+        fila_trabalhos.submeter(gerar_lote, lote, itens, dados_evento(), app.config['UPLOAD_FOLDER'], LOGO_PATH)
+
+    flash(f'{len(validados)} ingresso(s) validado(s) com sucesso! Os PDFs estão sendo gerados.')
+    if len(validados) < len(ingresso_ids):
+        flash(f'{len(ingresso_ids) - len(validados)} inscrição(ões) ignorada(s): não encontrada(s) ou já validada(s).')
+    return redirect(url_for('admin', lote=lote) if lote else url_for('admin'))
+
+@app.route('/admin/regerar_ingresso/<ingresso_id>', methods=['POST'])
+def regerar_ingresso(ingresso_id):
+    if not is_authenticated():
+        return redirect(url_for('login'))
+
+    if status_pdf(ingresso_id) == FALHOU:
+        enfileirar_ingressos([ingresso_id])
+        flash('O PDF do ingresso voltou para a fila de geração.')
+    else:
+        flash('Erro: Não há falha de geração para este ingresso.')
+    return redirect(url_for('admin'))
+
+# --- Envio dos ingressos por e-mail ---
+# O PDF anexado vem do cache de ingressos ou é gerado pelo pool de renderização
+
+EMAIL_STATUS_LABELS = {
+    envio_email.NA_FILA: 'Na fila',
+    envio_email.ENVIANDO: 'Enviando',
+    envio_email.ENVIADO: 'Enviado',
+    envio_email.FALHOU: 'Falhou',
+}
+
+# Envios "enviando" há mais tempo que isso voltam para a fila (o processo caiu)
+TEMPO_MAXIMO_ENVIO = timedelta(minutes=10)
+
+def envio_email_ativo():
+    return bool(app.config['SMTP_HOST'])
+
+def montar_email(ingresso_id):
+    with app.app_context():
+        inscrito = repositorio.obter_um(ingresso_id)
+        if not inscrito or not inscrito['validado']:
+            raise ValueError('Inscrição não encontrada ou não validada.')
+        args = trabalho_ingresso(ingresso_id, inscrito)
+    evento = args[5]
+    relativo = cache_ingressos.obter(args[2]) or gerar_ingresso_agora(args).result(timeout=300)
+    with open(os.path.join(cache_ingressos.pasta, relativo), 'rb') as f:
+        pdf = f.read()
+
+    mensagem = EmailMessage()
+    mensagem['From'] = app.config['EMAIL_REMETENTE']
+    mensagem['To'] = inscrito['email']
+    mensagem['Subject'] = f"Seu ingresso - {evento['titulo']}"
+    mensagem.set_content(
+        f"Olá, {inscrito['nome_completo']}!\n\n"
+        f"Sua inscrição na {evento['titulo']} foi confirmada. O ingresso está em anexo: "
+        f"apresente o QR Code na entrada do evento, impresso ou no celular.\n\n"
+        f"{evento['data']} - {evento['horario']}\n{evento['local']}\n")
+    mensagem.add_attachment(pdf, maintype='application', subtype='pdf', filename=f"ingresso_{ingresso_id}.pdf")
+    return mensagem
+
+def _reservar_email(ingresso_id):
     if USE_DATABASE:
-        inscrito = Inscricao.query.get(ingresso_id)
-        if inscrito and not inscrito.validado:
-            inscrito.validado = True
+        with app.app_context():
+            reservado = EnvioEmail.query.filter_by(ingresso_id=ingresso_id, status=envio_email.NA_FILA).update(
+                {'status': envio_email.ENVIANDO, 'atualizado_em': datetime.utcnow()}, synchronize_session=False)
             db.session.commit()
-            
-            qr_code_data = f"ingresso_id:{ingresso_id}"
-            qr_code_img = qrcode.make(qr_code_data)
-            qr_code_path_temp = os.path.join(app.config['UPLOAD_FOLDER'], f"qr_{ingresso_id}.png")
-            qr_code_img.save(qr_code_path_temp)
-
-            pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], f"ingresso_{ingresso_id}.pdf")
-            doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=36)
-            story = []
-            styles = getSampleStyleSheet()
-            
-            titulo_style = ParagraphStyle(name='Titulo', parent=styles['Normal'], fontSize=20, alignment=1, spaceAfter=12)
-            subtitulo_style = ParagraphStyle(name='Subtitulo', parent=styles['Normal'], fontSize=12, alignment=1, spaceAfter=24)
-            story.append(Paragraph(get_event_title(), titulo_style))
-            story.append(Paragraph(get_event_subtitle(), subtitulo_style))
-            
-            inscrito_info = [
-                ["Nome Completo:", inscrito.nome_completo],
-                ["Telefone:", inscrito.telefone],
-                ["Email:", inscrito.email],
-                ["Tipo de Ingresso:", inscrito.tipo_ingresso],
-                ["", ""]
-            ]
-            
-            if inscrito.nome_secundario:
-                inscrito_info.insert(1, ["Nome Secundário:", inscrito.nome_secundario])
-
-            table_style = TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ])
-
-            t = Table(inscrito_info, colWidths=[2.5*inch, 4*inch])
-            t.setStyle(table_style)
-            story.append(t)
-            story.append(Spacer(1, 0.3*inch))
-            
-            event_details = [
-                ["Data:", EVENT_DATE],
-                ["Horário:", EVENT_TIME],
-                ["Local:", EVENT_LOCAL]
-            ]
-            
-            details_table = Table(event_details, colWidths=[2.5*inch, 4*inch])
-            details_table.setStyle(table_style)
-            story.append(details_table)
-            story.append(Spacer(1, 0.3*inch))
-            
-            qr_code_pdf_image = RLImage(qr_code_path_temp, width=2.5*inch, height=2.5*inch)
-            story.append(qr_code_pdf_image)
-            story.append(Paragraph("Apresente este QR Code na entrada do evento para validação.", styles['Italic']))
-
-            doc.build(story, onFirstPage=header_and_footer_pdf, onLaterPages=header_and_footer_pdf)
-            
-            flash(f'Ingresso de {inscrito.nome_completo} validado com sucesso! O PDF foi gerado.')
-            return redirect(url_for('admin'))
+            if not reservado:
+                return None
+            tentativas = db.session.get(EnvioEmail, ingresso_id).tentativas
     else:
-        if ingresso_id in inscritos and not inscritos[ingresso_id]['validado']:
-            inscrito = inscritos[ingresso_id]
-            inscrito['validado'] = True
-
-            qr_code_data = f"ingresso_id:{ingresso_id}"
-            qr_code_img = qrcode.make(qr_code_data)
-            qr_code_path_temp = os.path.join(app.config['UPLOAD_FOLDER'], f"qr_{ingresso_id}.png")
-            qr_code_img.save(qr_code_path_temp)
-            inscrito['qr_code_path'] = qr_code_path_temp
-
-            pdf_filename = f"ingresso_{ingresso_id}.pdf"
-            pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
-            
-            doc = SimpleDocTemplate(pdf_path, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=36)
-            story = []
-            styles = getSampleStyleSheet()
-            
-            titulo_style = ParagraphStyle(name='Titulo', parent=styles['Normal'], fontSize=20, alignment=1, spaceAfter=12)
-            subtitulo_style = ParagraphStyle(name='Subtitulo', parent=styles['Normal'], fontSize=12, alignment=1, spaceAfter=24)
-            story.append(Paragraph(get_event_title(), titulo_style))
-            story.append(Paragraph(get_event_subtitle(), subtitulo_style))
-            
-            inscrito_info = [
-                ["Nome Completo:", inscrito['nome_completo']],
-                ["Telefone:", inscrito['telefone']],
-                ["Email:", inscrito['email']],
-                ["Tipo de Ingresso:", inscrito['tipo_ingresso']],
-                ["", ""]
-            ]
-            
-            if inscrito['nome_secundario']:
-                inscrito_info.insert(1, ["Nome Secundário:", inscrito['nome_secundario']])
-
-            table_style = TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ])
-
-            t = Table(inscrito_info, colWidths=[2.5*inch, 4*inch])
-            t.setStyle(table_style)
-            story.append(t)
-            story.append(Spacer(1, 0.3*inch))
-            
-            event_details = [
-                ["Data:", EVENT_DATE],
-                ["Horário:", EVENT_TIME],
-                ["Local:", EVENT_LOCAL]
-            ]
-            
-            details_table = Table(event_details, colWidths=[2.5*inch, 4*inch])
-            details_table.setStyle(table_style)
-            story.append(details_table)
-            story.append(Spacer(1, 0.3*inch))
-            
-            qr_code_pdf_image = RLImage(qr_code_path_temp, width=2.5*inch, height=2.5*inch)
-            story.append(qr_code_pdf_image)
-            story.append(Paragraph("Apresente este QR Code na entrada do evento para validação.", styles['Italic']))
+        envio = estado_email.get(ingresso_id)
+        if not envio or envio['status'] != envio_email.NA_FILA:
+            return None
+        envio['status'] = envio_email.ENVIANDO
+        tentativas = envio['tentativas']
+    return (lambda: montar_email(ingresso_id)), tentativas
+
+def _concluir_email(ingresso_id, status, erro, tentativas, espera):
+    agora = datetime.utcnow()
+    campos = {
+        'status': status,
+        'tentativas': tentativas,
+        'erro': str(erro)[:500] if erro is not None else None,
+        'proxima_tentativa': agora + timedelta(seconds=espera) if espera else None,
+    }
+    if USE_DATABASE:
+        with app.app_context():
+            EnvioEmail.query.filter_by(ingresso_id=ingresso_id).update({**campos, 'atualizado_em': agora}, synchronize_session=False)
+            db.session.commit()
+    elif ingresso_id in estado_email:
+        estado_email[ingresso_id].update(campos)
 
-            doc.build(story, onFirstPage=header_and_footer_pdf, onLaterPages=header_and_footer_pdf)
+def _emails_abandonados():
+    if not USE_DATABASE:
+        return []
+    with app.app_context():
+        limite = datetime.utcnow() - TEMPO_MAXIMO_ENVIO
+        abandonados = db.session.scalars(
+            update(EnvioEmail).where(EnvioEmail.status == envio_email.ENVIANDO, EnvioEmail.atualizado_em < limite)
+            .values(status=envio_email.NA_FILA).returning(EnvioEmail.ingresso_id)
+            .execution_options(synchronize_session=False)).all()
+        db.session.commit()
+        return [(ingresso_id, 0) for ingresso_id in abandonados]
 
-            flash(f'Ingresso de {inscrito["nome_completo"]} validado com sucesso! O PDF foi gerado.')
-            return redirect(url_for('admin'))
-    
-    return "Ingresso não encontrado ou já validado.", 404
+def _emails_pendentes():
+    if not USE_DATABASE:
+        return []
+    _emails_abandonados()
+    with app.app_context():
+        agora = datetime.utcnow()
+        return [(e.ingresso_id, (e.proxima_tentativa - agora).total_seconds() if e.proxima_tentativa else 0)
+                for e in EnvioEmail.query.filter_by(status=envio_email.NA_FILA)]
+
+def _conectar_smtp():
+    seguranca = app.config['SMTP_SEGURANCA']
+    return ConexaoSMTP(app.config['SMTP_HOST'], app.config['SMTP_PORT'], app.config['SMTP_USUARIO'], app.config['SMTP_SENHA'],
+                       seguranca if seguranca in ('starttls', 'ssl') else None)
+
+fila_emails = FilaEmails(_conectar_smtp, _reservar_email, _concluir_email, _emails_pendentes,
+                         workers=app.config['EMAIL_WORKERS'], tentativas=app.config['EMAIL_TENTATIVAS'],
+                         espera_base=app.config['EMAIL_ESPERA_BASE'], recuperar=_emails_abandonados)
+
+# Envios nesses estados não voltam para o início da fila: seriam enviados duas vezes
+EMAIL_EM_ANDAMENTO = (envio_email.NA_FILA, envio_email.ENVIANDO)
+
+def _marcar_email_na_fila(ingresso_ids):
+    """Põe na fila os envios que não estão na fila nem sendo enviados e retorna os ids deles."""
+    # Como em _marcar_na_fila: no modo banco quem chama faz o commit
+    novo = {'status': envio_email.NA_FILA, 'tentativas': 0, 'erro': None, 'proxima_tentativa': None}
+    if USE_DATABASE:
+        agora = datetime.utcnow()
+        existentes = {e.ingresso_id for e in EnvioEmail.query.filter(EnvioEmail.ingresso_id.in_(ingresso_ids))}
+        # Atualização condicional: de dois pedidos simultâneos, só um recoloca o envio na fila
+        marcados = db.session.scalars(
+            update(EnvioEmail).where(EnvioEmail.ingresso_id.in_(existentes), EnvioEmail.status.not_in(EMAIL_EM_ANDAMENTO))
+            .values(**novo, atualizado_em=agora).returning(EnvioEmail.ingresso_id)
+            .execution_options(synchronize_session=False)).all()
+        novos = [i for i in ingresso_ids if i not in existentes]
+        db.session.add_all(EnvioEmail(ingresso_id=i, atualizado_em=agora, **novo) for i in novos)
+        return list(marcados) + novos
+    marcados = [i for i in ingresso_ids if estado_email.get(i, {}).get('status') not in EMAIL_EM_ANDAMENTO]
+    for ingresso_id in marcados:
+        estado_email[ingresso_id] = dict(novo)
+    return marcados
+
+def status_email_varios(ingresso_ids):
+    """{id: {'status', 'tentativas', 'erro'}} dos ingressos com envio registrado."""
+    if USE_DATABASE:
+        return {e.ingresso_id: {'status': e.status, 'tentativas': e.tentativas, 'erro': e.erro}
+                for e in EnvioEmail.query.filter(EnvioEmail.ingresso_id.in_(ingresso_ids))}
+    return {i: estado_email[i] for i in ingresso_ids if i in estado_email}
+
+@app.route('/admin/enviar_email/<ingresso_id>', methods=['POST'])
+def enviar_email_ingresso(ingresso_id):
+    if not is_authenticated():
+        return redirect(url_for('login'))
+
+    inscrito = repositorio.obter_um(ingresso_id)
+    if not envio_email_ativo():
+        flash('Erro: o envio de e-mails não está configurado (SMTP_HOST).')
+    elif not inscrito or not inscrito['validado']:
+        flash('Erro: Inscrição não encontrada ou não validada.')
+    elif not _marcar_email_na_fila([ingresso_id]):
+        flash('O e-mail deste ingresso já está na fila de envio.')
+    else:
+        repositorio.confirmar()
+        fila_emails.enfileirar(ingresso_id)
+        flash(f'O ingresso de {inscrito["nome_completo"]} voltou para a fila de envio por e-mail.')
+    return redirect(url_for('admin'))
 
 # --- Rotas de Admin (Continuação) ---
 
+def excluir_inscricao(ingresso_id):
+    """Exclui a inscrição e o que depende dela; False se ela não existir."""
+    inscrito = repositorio.obter_um(ingresso_id)
+    if not repositorio.excluir([ingresso_id]):
+        return False
+    if inscrito['validado']:
+        cache_ingressos.remover(chave_do_ingresso(ingresso_id, inscrito))
+    if USE_DATABASE:
+        TrabalhoIngresso.query.filter_by(ingresso_id=ingresso_id).delete()
+        EnvioEmail.query.filter_by(ingresso_id=ingresso_id).delete()
+        Checkin.query.filter_by(ingresso_id=ingresso_id).delete()
+    else:
+        estado_render.pop(ingresso_id, None)
+        estado_email.pop(ingresso_id, None)
+    registrar_alteracao_checkin(EXCLUIDO, ingresso_id)
+    registrar_alteracoes_painel(painel.EXCLUIDO, [ingresso_id])
+    repositorio.confirmar()
+    indice_checkin.remover(ingresso_id)
+    return True
+
 @app.route('/admin/excluir_ingresso/<ingresso_id>', methods=['POST'])
 def excluir_ingresso(ingresso_id):
     if not is_authenticated():
         flash("Você não tem permissão para realizar essa ação.")
         return redirect(url_for('login'))
     
-    if USE_DATABASE:
-        inscrito = Inscricao.query.get(ingresso_id)
-        if inscrito:
-            db.session.delete(inscrito)
-            db.session.commit()
-            flash("Inscrição excluída com sucesso.")
-        else:
-            flash("Erro: Inscrição não encontrada.")
+    if excluir_inscricao(ingresso_id):
+        flash("Inscrição excluída com sucesso.")
     else:
-        if ingresso_id in inscritos:
-            del inscritos[ingresso_id]
-            flash("Inscrição excluída com sucesso.")
-        else:
-            flash("Erro: Inscrição não encontrada.")
+        flash("Erro: Inscrição não encontrada.")
     
     return redirect(url_for('admin'))
 
+# --- Fila de revisão dos comprovantes ---
+# Pendentes das mais antigas para as mais novas; recusar exclui a inscrição, como o botão Excluir
+
+FILTROS_REVISAO = {'status': False, 'tipo': None, 'busca': None, 'ordem': 'antigos'}
+
+def item_revisao(ingresso_id, inscrito, repetidos):
+    return {
+        'id': ingresso_id,
+        'nome_completo': inscrito['nome_completo'],
+        'nome_secundario': inscrito['nome_secundario'],
+        'email': inscrito['email'],
+        'telefone': inscrito['telefone'],
+        'tipo_ingresso': inscrito['tipo_ingresso'],
+        'criado_em': inscrito['criado_em'].isoformat() if inscrito['criado_em'] else None,
+        'miniatura_url': url_comprovante(inscrito['comprovante_pix'], miniatura=True),
+        'comprovante_url': url_comprovante(inscrito['comprovante_pix']),
+        'repetido': [[outro_id[:8], nome] for outro_id, nome in repetidos],
+    }
+
+def lote_revisao(apos):
+    pagina, proximo = listar_inscricoes(FILTROS_REVISAO, apos, app.config['REVISAO_PAGE_SIZE'])
+    repetidos = comprovantes_repetidos(pagina)
+    return {
+        'itens': [item_revisao(i, inscrito, repetidos.get(i, [])) for i, inscrito in pagina.items()],
+        'proximo': proximo,
+    }
+
+@app.route('/admin/revisao')
+def revisao_comprovantes():
+    if not is_authenticated():
+        return redirect(url_for('login'))
+    event_title, _ = get_event_info()
+    return render_template('revisao.html', event_title=event_title, pendentes=contar_inscricoes(FILTROS_REVISAO),
+                           lote=lote_revisao(None))
+
+@app.route('/admin/revisao/itens')
+def revisao_itens():
+    if not is_authenticated():
+        return {'status': 'nao_autorizado'}, 401
+    apos = decodificar_cursor(request.args['apos']) if request.args.get('apos') else None
+    return lote_revisao(apos)
+
+@app.route('/admin/revisao/<ingresso_id>/<acao>', methods=['POST'])
+def revisar_inscricao(ingresso_id, acao):
+    if not is_authenticated():
+        return {'status': 'nao_autorizado'}, 401
+    if acao == 'aprovar':
+        feito = bool(validar_inscricoes([ingresso_id]))
+    elif acao == 'recusar':
+        feito = excluir_inscricao(ingresso_id)
+    else:
+        abort(404)
+    # Já validada ou excluída por outro admin: a página só segue para a próxima
+    return {'status': 'ok' if feito else 'ignorada', 'pendentes': contar_inscricoes(FILTROS_REVISAO)}
+
+@app.cli.command('gerar-miniaturas')
+def gerar_miniaturas_comando():
+    """Gera as miniaturas que faltam dos comprovantes das inscrições pendentes."""
+    pasta = app.config['UPLOAD_FOLDER']
+    comprovantes = {inscrito['comprovante_pix'] for lote in repositorio.iterar_lotes(FILTROS_REVISAO) for inscrito in lote}
+    for relativo in sorted(comprovantes):
+        if os.path.exists(os.path.join(pasta, caminho_miniatura(relativo))):
+            continue
+        try:
+            gerar_miniatura(pasta, relativo)
+            print(relativo)
+        except OSError as erro:
+            print(f"{relativo}: {erro}")
+
+# --- Imagens da galeria e dos banners ---
+# Versões redimensionadas geradas no pool de fundo, para o srcset da página inicial
+
+def pasta_derivados(tipo):
+    return os.path.join(app.config['DERIVADOS_FOLDER'], tipo)
+
+PASTAS_MIDIA = {'galeria': app.config['GALLERY_FOLDER'], 'banners': app.config['BANNERS_FOLDER']}
+catalogo_midia = CatalogoMidia(app.config['MEDIA_CATALOG_FILE'], PASTAS_MIDIA, {tipo: pasta_derivados(tipo) for tipo in PASTAS_MIDIA})
+
+def salvar_imagem_enviada(tipo, photo):
+    photo_filename = str(uuid.uuid4()) + os.path.splitext(photo.filename)[1]
+    photo_path = os.path.join(PASTAS_MIDIA[tipo], photo_filename)
+    with metricas.trecho('upload'):
+        photo.save(photo_path)
+    catalogo_midia.adicionar(tipo, photo_filename)
+    cache_pagina_inicial.invalidar()
+
+    def registrar_derivados(futuro):
+        if futuro.exception() is None:
+            catalogo_midia.definir_derivados(tipo, photo_filename, futuro.result())
+            cache_pagina_inicial.invalidar()
+    fila_trabalhos.submeter(gerar_derivados, photo_path, pasta_derivados(tipo)).add_done_callback(registrar_derivados)
+
+def excluir_imagem(tipo, filename):
+    file_path = os.path.join(PASTAS_MIDIA[tipo], filename)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    remover_derivados(pasta_derivados(tipo), filename)
+    catalogo_midia.remover(tipo, filename)
+    cache_pagina_inicial.invalidar()
+
+def fontes_imagem(tipo, arquivo, larguras):
+    # srcset das versões WebP e JPEG; None enquanto as versões não existirem
+    if not larguras:
+        return None
+    def url(largura, extensao):
+        return url_for('static', filename=f"derivados/{tipo}/{nome_derivado(arquivo, largura, extensao)}")
+    return {
+        'webp': ', '.join(f"{url(largura, 'webp')} {largura}w" for largura in larguras),
+        'jpg': ', '.join(f"{url(largura, 'jpg')} {largura}w" for largura in larguras),
+        'src': url(larguras[-1], 'jpg'),
+        'src_webp': url(larguras[-1], 'webp'),
+    }
+
+@app.cli.command('gerar-derivados')
+def gerar_derivados_comando():
+    """Gera as versões redimensionadas das imagens já enviadas."""
+    for tipo, pasta in PASTAS_MIDIA.items():
+        existentes = indexar_derivados(pasta_derivados(tipo))
+        for arquivo in sorted(os.listdir(pasta)):
+            if os.path.splitext(arquivo)[0] in existentes:
+                continue
+            larguras = gerar_derivados(os.path.join(pasta, arquivo), pasta_derivados(tipo))
+            print(f"{tipo}/{arquivo}: {', '.join(map(str, larguras)) or 'ignorada (animada)'}")
+    catalogo_midia.reconstruir()
+
+@app.cli.command('reconstruir-catalogo')
+def reconstruir_catalogo_comando():
+    """Sincroniza o catálogo de mídia com os arquivos das pastas."""
+    catalogo_midia.reconstruir()
+    for tipo in PASTAS_MIDIA:
+        print(f"{tipo}: {len(catalogo_midia.itens(tipo))} imagem(ns)")
+
 @app.route('/admin/upload_fotos', methods=['GET', 'POST'])
 def upload_fotos():
     if not is_authenticated():
@@ -433,30 +1547,24 @@ def upload_fotos():
             upload_type = request.form['upload_type']
             
             if upload_type == 'galeria':
-                folder = app.config['GALLERY_FOLDER']
                 for photo in photos_to_upload:
                     if photo and photo.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                        photo_filename = str(uuid.uuid4()) + os.path.splitext(photo.filename)[1]
-                        photo_path = os.path.join(folder, photo_filename)
-                        photo.save(photo_path)
+                        salvar_imagem_enviada('galeria', photo)
                 flash('Fotos da galeria enviadas com sucesso!')
             elif upload_type == 'banner':
-                folder = app.config['BANNERS_FOLDER']
-                for filename in os.listdir(folder):
-                    os.remove(os.path.join(folder, filename))
+                for item in catalogo_midia.itens('banners'):
+                    excluir_imagem('banners', item['arquivo'])
                 
                 for photo in photos_to_upload:
                     if photo and photo.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                        photo_filename = str(uuid.uuid4()) + os.path.splitext(photo.filename)[1]
-                        photo_path = os.path.join(folder, photo_filename)
-                        photo.save(photo_path)
+                        salvar_imagem_enviada('banners', photo)
                 flash('Novo banner enviado com sucesso!')
             
             return redirect(url_for('upload_fotos'))
 
-    gallery_photos = os.listdir(app.config['GALLERY_FOLDER'])
-    banners = os.listdir(app.config['BANNERS_FOLDER'])
-    latest_banner = banners[-1] if banners else None
+    gallery_photos = [item['arquivo'] for item in catalogo_midia.itens('galeria')]
+    banner = catalogo_midia.banner_atual()
+    latest_banner = banner['arquivo'] if banner else None
     return render_template('upload_fotos.html', gallery_photos=gallery_photos, latest_banner=latest_banner)
 
 @app.route('/admin/excluir_foto/<filename>', methods=['POST'])
@@ -464,10 +1572,8 @@ def excluir_foto(filename):
     if not is_authenticated():
         return redirect(url_for('login'))
     
-    file_path = os.path.join(app.config['GALLERY_FOLDER'], filename)
-    
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    if catalogo_midia.item('galeria', filename):
+        excluir_imagem('galeria', filename)
         flash(f'A foto {filename} foi excluída com sucesso!')
     else:
         flash('Erro: O arquivo não foi encontrado.')
@@ -479,13 +1585,10 @@ def excluir_banner():
     if not is_authenticated():
         return redirect(url_for('login'))
     
-    banner_folder = app.config['BANNERS_FOLDER']
-    banners = os.listdir(banner_folder)
+    banner = catalogo_midia.banner_atual()
     
-    if banners:
-        latest_banner = banners[-1]
-        file_path = os.path.join(banner_folder, latest_banner)
-        os.remove(file_path)
+    if banner:
+        excluir_imagem('banners', banner['arquivo'])
         flash('O banner foi excluído com sucesso!')
     else:
         flash('Não há nenhum banner para excluir.')
@@ -530,7 +1633,9 @@ def alterar_titulo_evento():
         if evento_info:
             evento_info.titulo = novo_titulo
             evento_info.subtitulo = novo_subtitulo
+            evento_info.versao = (evento_info.versao or 0) + 1
             db.session.commit()
+            invalidar_cache_evento()
             flash('Título e subtítulo do evento atualizados com sucesso!')
         else:
             flash('Erro: Informações do evento não encontradas no banco.', 'error')
@@ -547,6 +1652,7 @@ def alterar_titulo_evento():
             flash('Título e subtítulo do evento atualizados com sucesso!')
         else:
             flash('O subtítulo não pode estar vazio.', 'error')
+        invalidar_cache_evento()
     
     return redirect(url_for('admin'))
 
@@ -555,31 +1661,24 @@ def editar_ingresso(ingresso_id):
     if not is_authenticated():
         return redirect(url_for('login'))
     
-    if USE_DATABASE:
-        ingresso_data = Inscricao.query.get(ingresso_id)
-        if not ingresso_data:
-            flash("Inscrição não encontrada.")
-            return redirect(url_for('admin'))
-    else:
-        if ingresso_id not in inscritos:
-            flash("Inscrição não encontrada.")
-            return redirect(url_for('admin'))
-        ingresso_data = inscritos[ingresso_id]
+    ingresso_data = repositorio.obter_um(ingresso_id)
+    if not ingresso_data:
+        flash("Inscrição não encontrada.")
+        return redirect(url_for('admin'))
 
     if request.method == 'POST':
-        if USE_DATABASE:
-            ingresso_data.nome_completo = request.form['nome_completo']
-            ingresso_data.nome_secundario = request.form['nome_secundario']
-            ingresso_data.telefone = request.form['telefone']
-            ingresso_data.email = request.form['email']
-            ingresso_data.tipo_ingresso = request.form['tipo_ingresso']
-            db.session.commit()
-        else:
-            ingresso_data['nome_completo'] = request.form['nome_completo']
-            ingresso_data['nome_secundario'] = request.form['nome_secundario']
-            ingresso_data['telefone'] = request.form['telefone']
-            ingresso_data['email'] = request.form['email']
-            ingresso_data['tipo_ingresso'] = request.form['tipo_ingresso']
+        campos = {campo: request.form[campo] for campo in ('nome_completo', 'nome_secundario', 'telefone', 'email', 'tipo_ingresso')}
+        repositorio.atualizar({ingresso_id: campos})
+        registrar_alteracoes_painel(painel.EDITADO, [ingresso_id])
+        if ingresso_data['validado']:
+            registrar_alteracao_checkin(VALIDADO, ingresso_id, campos['nome_completo'])
+            # O PDF com os dados antigos sai do cache e o novo é gerado em
+            # segundo plano (a chave muda com os campos)
+            cache_ingressos.remover(chave_do_ingresso(ingresso_id, ingresso_data))
+            enfileirar_ingressos([ingresso_id])
+        repositorio.confirmar()
+        if ingresso_data['validado']:
+            indice_checkin.adicionar(ingresso_id, campos['nome_completo'])
         flash("Inscrição atualizada com sucesso!")
         return redirect(url_for('admin'))
 
@@ -587,26 +1686,353 @@ def editar_ingresso(ingresso_id):
 
 @app.route('/qr_code/<ingresso_id>')
 def qr_code(ingresso_id):
-    if USE_DATABASE:
-        inscrito = Inscricao.query.get(ingresso_id)
-        if inscrito and inscrito.validado:
-            qr_code_path = os.path.join(app.config['UPLOAD_FOLDER'], f"qr_{ingresso_id}.png")
-            return send_from_directory(app.config['UPLOAD_FOLDER'], os.path.basename(qr_code_path))
-    else:
-        if ingresso_id in inscritos and inscritos[ingresso_id]['validado']:
-            qr_code_path = inscritos[ingresso_id]['qr_code_path']
-            return send_from_directory(app.config['UPLOAD_FOLDER'], os.path.basename(qr_code_path))
+    inscrito = repositorio.obter_um(ingresso_id)
+    if inscrito and inscrito['validado']:
+        # O nome leva o hash do conteúdo: trocar a secret_key não serve um PNG antigo
+        conteudo = payload_qr(ingresso_id, app.secret_key)
+        filename = f"qr/{ingresso_id}_{hashlib.sha256(conteudo.encode()).hexdigest()[:12]}.png"
+        caminho = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        if not os.path.exists(caminho):
+            from ingresso_pdf import salvar_qr_png
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            salvar_qr_png(conteudo, caminho)
+        return enviar_arquivo(app.config['UPLOAD_FOLDER'], filename, 'private, no-cache')
     
     return "Ingresso não validado ou não encontrado.", 404
 
+# --- Check-in na entrada ---
+# QR Code assinado (veja checkin.py); cada entrada é gravada uma única vez
+
+indice_checkin = IndiceCheckin()
+
+def _carregar_indice_checkin():
+    if USE_DATABASE:
+        # A sequência é lida antes das listas: alterações que entrarem no meio
+        # chegam de novo na sincronização, e aplicá-las duas vezes não muda nada
+        seq = db.session.query(func.max(AlteracaoCheckin.seq)).scalar() or 0
+        admitidos = dict(db.session.query(Checkin.ingresso_id, Checkin.admitido_em).all())
+    else:
+        # No modo em memória o próprio índice guarda as entradas registradas
+        seq, admitidos = 0, {}
+    return repositorio.validados(), admitidos, seq
+
+def _alteracoes_indice_checkin(seq):
+    # Para IndiceCheckin.sincronizar; o instante da entrada vem da tabela Checkin
+    return (db.session.query(AlteracaoCheckin.seq, AlteracaoCheckin.operacao, AlteracaoCheckin.ingresso_id,
+                             AlteracaoCheckin.nome, Checkin.admitido_em)
+            .outerjoin(Checkin, Checkin.ingresso_id == AlteracaoCheckin.ingresso_id)
+            .filter(AlteracaoCheckin.seq > seq).order_by(AlteracaoCheckin.seq).all())
+
+def admissoes(ingresso_ids):
+    """{id: instante da entrada} dos ingressos que já entraram no evento."""
+    if USE_DATABASE:
+        return dict(db.session.query(Checkin.ingresso_id, Checkin.admitido_em).filter(Checkin.ingresso_id.in_(ingresso_ids)))
+    return {i: indice_checkin.admitido_em(i) for i in ingresso_ids if indice_checkin.admitido_em(i) is not None}
+
+def registrar_alteracao_checkin(operacao, ingresso_id, nome=None):
+    # Com banco a alteração entra na transação da rota que chamou; quem chama faz o commit
+    if USE_DATABASE:
+        db.session.add(AlteracaoCheckin(operacao=operacao, ingresso_id=ingresso_id, nome=nome))
+    else:
+        indice_checkin.registrar_alteracao(operacao, ingresso_id, nome)
+
+@app.before_request
+def aquecer_indice_checkin():
+    # Carrega o índice uma vez por processo, no primeiro acesso depois do fork;
+    # com o banco fora, a página sai assim mesmo e o próximo pedido tenta de novo
+    try:
+        indice_checkin.aquecer(_carregar_indice_checkin)
+    except SQLAlchemyError:
+        repositorio.descartar()
+        logger.exception("Falha ao carregar o índice do check-in")
+
+def checkin_autorizado():
+    token = app.config['CHECKIN_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('X-Checkin-Token', ''), token):
+        return True
+    return bool(is_authenticated())
+
+def _recusa_checkin(ingresso_id, nome, admitido_em):
+    return {'status': 'ja_admitido', 'ingresso_id': ingresso_id, 'nome': nome, 'admitido_em': admitido_em.isoformat()}, 409
+
+@app.route('/checkin', methods=['POST'])
+def checkin():
+    if not checkin_autorizado():
+        return {'status': 'nao_autorizado'}, 401
+
+    dados = request.get_json(silent=True) or request.form
+    ingresso_id = verificar_payload(dados.get('qr'), app.secret_key, app.config['CHECKIN_ACEITAR_QR_LEGADO'])
+    if not ingresso_id:
+        return {'status': 'qr_invalido'}, 403
+
+    if USE_DATABASE:
+        # O que os outros workers validaram, editaram ou excluíram chega pelo AlteracaoCheckin
+        indice_checkin.sincronizar(_alteracoes_indice_checkin, app.config['CHECKIN_SINCRONIA'],
+                                   app.config['CHECKIN_DELTA_JANELA'])
+    nome = indice_checkin.validado(ingresso_id)
+    if nome is None and USE_DATABASE:
+        # Validado em outro worker depois da última sincronização: só aí vai ao banco
+        inscrito = repositorio.obter_um(ingresso_id)
+        if inscrito and inscrito['validado']:
+            nome = inscrito['nome_completo']
+            indice_checkin.adicionar(ingresso_id, nome)
+    if nome is None:
+        return {'status': 'nao_validado', 'ingresso_id': ingresso_id}, 404
+
+    anterior = indice_checkin.admitido_em(ingresso_id)
+    if anterior is not None:
+        return _recusa_checkin(ingresso_id, nome, anterior)
+
+    instante = datetime.utcnow()
+    if USE_DATABASE:
+        db.session.add(Checkin(ingresso_id=ingresso_id, admitido_em=instante, dispositivo=dados.get('dispositivo')))
+        registrar_alteracao_checkin(ADMITIDO, ingresso_id)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outro worker (ou outro leitor) registrou a entrada primeiro
+            db.session.rollback()
+            anterior = db.session.get(Checkin, ingresso_id).admitido_em
+            indice_checkin.registrar_admissao(ingresso_id, anterior)
+            return _recusa_checkin(ingresso_id, nome, anterior)
+        indice_checkin.registrar_admissao(ingresso_id, instante)
+    else:
+        nova, instante = indice_checkin.registrar_admissao(ingresso_id, instante)
+        if not nova:
+            return _recusa_checkin(ingresso_id, nome, instante)
+        registrar_alteracao_checkin(ADMITIDO, ingresso_id)
+
+    return {'status': 'admitido', 'ingresso_id': ingresso_id, 'nome': nome, 'admitido_em': instante.isoformat()}
+
+# --- Check-in sem rede ---
+# Manifesto completo uma vez, depois só as alterações com ?desde=<seq>
+
+def chave_manifesto():
+    # Os leitores conhecem o token, não a secret_key
+    return app.config['CHECKIN_TOKEN'] or app.secret_key
+
+@app.route('/checkin/manifesto')
+def checkin_manifesto():
+    if not checkin_autorizado():
+        return {'status': 'nao_autorizado'}, 401
+
+    limite = app.config['CHECKIN_DELTA_LIMITE']
+    desde = request.args.get('desde', type=int)
+    if desde is None:
+        if USE_DATABASE:
+            # Alterações que entrarem durante a leitura chegam de novo no próximo delta
+            validados, admitidos, seq = _carregar_indice_checkin()
+        else:
+            validados, admitidos, seq = indice_checkin.instantaneo()
+        return montar_manifesto(validados, admitidos, seq, chave_manifesto())
+
+    if USE_DATABASE:
+        # Relê a janela abaixo do `desde`: alterações de transações que terminaram
+        # depois da última consulta do leitor, mas com seq menor
+        janela = min(desde, app.config['CHECKIN_DELTA_JANELA'])
+        limite += janela
+        linhas = (db.session.query(AlteracaoCheckin.seq, AlteracaoCheckin.operacao, AlteracaoCheckin.ingresso_id, AlteracaoCheckin.nome)
+                  .filter(AlteracaoCheckin.seq > desde - janela).order_by(AlteracaoCheckin.seq).limit(limite + 1).all())
+        alteracoes = [tuple(l) for l in linhas]
+    else:
+        # Em memória o registro é anexado sob trava, já na ordem em que as alterações valem
+        alteracoes = indice_checkin.alteracoes_desde(desde, limite + 1)
+    return montar_delta(desde, alteracoes[:limite], len(alteracoes) > limite, chave_manifesto())
+
+def _ler_admissoes_offline(itens):
+    # Retorna ([(ingresso_id, instante)], recusadas)
+    admissoes, recusadas = [], []
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        if item.get('qr'):
+            ingresso_id = verificar_payload(item['qr'], app.secret_key, app.config['CHECKIN_ACEITAR_QR_LEGADO'])
+        else:
+            ingresso_id = item.get('ingresso_id')
+        if not ingresso_id:
+            recusadas.append({'qr': item.get('qr'), 'motivo': 'qr_invalido'})
+            continue
+        try:
+            instante = datetime.fromisoformat(item['admitido_em'])
+        except (KeyError, TypeError, ValueError):
+            recusadas.append({'ingresso_id': ingresso_id, 'motivo': 'instante_invalido'})
+            continue
+        admissoes.append((ingresso_id, instante.replace(tzinfo=None)))
+    return admissoes, recusadas
+
+@app.route('/checkin/sincronizar', methods=['POST'])
+def checkin_sincronizar():
+    if not checkin_autorizado():
+        return {'status': 'nao_autorizado'}, 401
+
+    dados = request.get_json(silent=True) or {}
+    dispositivo = dados.get('dispositivo')
+    admissoes, recusadas = _ler_admissoes_offline(dados.get('admissoes') or [])
+
+    ids = list({i for i, _ in admissoes})
+    validos = {i for i, data in repositorio.obter(ids).items() if data['validado']}
+    recusadas += [{'ingresso_id': i, 'motivo': 'nao_validado'} for i, _ in admissoes if i not in validos]
+    admissoes = [a for a in admissoes if a[0] in validos]
+
+    if USE_DATABASE:
+        # Um commit para o lote; se outro leitor gravar no meio, a chave primária o recusa e ele é refeito
+        for tentativa in range(3):
+            registradas = {c.ingresso_id: (c.admitido_em, c.dispositivo)
+                           for c in Checkin.query.filter(Checkin.ingresso_id.in_(ids))}
+            novas, conflitos = separar_conflitos(admissoes, registradas)
+            for ingresso_id, instante in novas:
+                db.session.add(Checkin(ingresso_id=ingresso_id, admitido_em=instante, dispositivo=dispositivo))
+                registrar_alteracao_checkin(ADMITIDO, ingresso_id)
+            try:
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+        else:
+            return {'status': 'tente_novamente'}, 503
+        for ingresso_id, instante in novas:
+            indice_checkin.registrar_admissao(ingresso_id, instante)
+    else:
+        registradas = {i: (indice_checkin.admitido_em(i), None) for i in ids if indice_checkin.admitido_em(i) is not None}
+        candidatas, conflitos = separar_conflitos(admissoes, registradas)
+        novas = []
+        for ingresso_id, instante in candidatas:
+            nova, anterior = indice_checkin.registrar_admissao(ingresso_id, instante)
+            if nova:
+                novas.append((ingresso_id, instante))
+                registrar_alteracao_checkin(ADMITIDO, ingresso_id)
+            else:
+                conflitos.append({'ingresso_id': ingresso_id, 'admitido_em': instante.isoformat(),
+                                  'registrado_em': anterior.isoformat(), 'dispositivo': None})
+
+    return {
+        'status': 'sincronizado',
+        'aceitas': [i for i, _ in novas],
+        'conflitos': conflitos,
+        'recusadas': recusadas,
+    }
+
+@app.errorhandler(413)
+def requisicao_grande_demais(erro):
+    limite = round(app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024), 1)
+    flash(f'O arquivo enviado é grande demais (limite de {limite:g} MB).')
+    return redirect(request.referrer or url_for('pagina_inicial'))
+
+@app.template_global()
+def url_comprovante(relativo, miniatura=False):
+    return url_for('comprovante_miniatura' if miniatura else 'comprovante', filename=nome_publico(relativo))
+
+def caminho_comprovante(filename):
+    # Só o admin vê os comprovantes, e só os da pasta deles (nada de ingressos/ ou qr/)
+    if not is_authenticated():
+        abort(401)
+    relativo = caminho_do_nome(filename)
+    if relativo is None or not os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], relativo)):
+        abort(404)
+    return relativo
+
 @app.route('/comprovante/<filename>')
 def comprovante(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # O nome do comprovante é único e o arquivo nunca muda
+    return enviar_arquivo(app.config['UPLOAD_FOLDER'], caminho_comprovante(filename), 'private, max-age=31536000, immutable')
+
+@app.route('/comprovante_miniatura/<filename>')
+def comprovante_miniatura(filename):
+    # Normalmente já gerada desde o /registrar; as que faltam são geradas aqui
+    relativo = caminho_comprovante(filename)
+    pasta = app.config['UPLOAD_FOLDER']
+    miniatura = caminho_miniatura(relativo)
+    if not os.path.isfile(os.path.join(pasta, miniatura)):
+        try:
+            gerar_miniatura(pasta, relativo)
+        except OSError:
+            logger.exception("Falha ao gerar a miniatura de %s", relativo)
+            return redirect(url_for('comprovante', filename=filename))
+    return enviar_arquivo(pasta, miniatura, 'private, max-age=31536000, immutable')
+
+# Gerações em andamento neste processo, por chave: pedidos simultâneos do
+# mesmo ingresso esperam a mesma geração
+_geracoes_ingresso = {}
+_lock_geracoes = threading.Lock()
+
+def gerar_ingresso_agora(args):
+    chave = args[2]
+    with _lock_geracoes:
+        futuro = _geracoes_ingresso.get(chave)
+        if futuro is None:
+            futuro = _geracoes_ingresso[chave] = fila_trabalhos.submeter(renderizar_ingresso, *args)
+            futuro.add_done_callback(lambda _: _geracoes_ingresso.pop(chave, None))
+    return futuro
+
+def pdf_ingresso(ingresso_id):
+    inscrito = repositorio.obter_um(ingresso_id)
+    if not inscrito or not inscrito['validado']:
+        return "Ingresso não validado ou não encontrado.", 404
+
+    args = trabalho_ingresso(ingresso_id, inscrito)
+    chave = args[2]
+    relativo = cache_ingressos.obter(chave)
+    if relativo is None:
+        try:
+            relativo = gerar_ingresso_agora(args).result(timeout=app.config['INGRESSO_ESPERA'])
+        except FuturoTimeout:
+            return "O ingresso ainda não está pronto. Tente novamente em alguns instantes.", 202, {'Retry-After': '5'}
+        except Exception:
+            logger.exception("Falha ao gerar o ingresso %s", ingresso_id)
+            return "Falha ao gerar o ingresso. Tente novamente em alguns instantes.", 500
+
+    # A chave é o hash do conteúdo do PDF: serve de ETag forte sem reler o arquivo
+    resposta = send_from_directory(os.path.join(app.root_path, cache_ingressos.pasta), relativo, etag=chave,
+                                   conditional=True, mimetype='application/pdf',
+                                   download_name=f"ingresso_{ingresso_id}.pdf")
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
 
 @app.route('/ingresso/<filename>')
 def ingresso_pdf(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    if not (filename.startswith('ingresso_') and filename.endswith('.pdf')):
+        abort(404)
+    return pdf_ingresso(filename[len('ingresso_'):-len('.pdf')])
+
+NOME_LOTE = re.compile(r'lote_[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.pdf')
+
+# PDFs combinados dos lotes trazem os dados de todos os inscritos: só para o admin
+@app.route('/admin/lote/<filename>')
+def pdf_lote(filename):
+    if not is_authenticated():
+        abort(401)
+    if not NOME_LOTE.fullmatch(filename):
+        abort(404)
+    if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+        # O PDF é gerado em segundo plano; enquanto o trabalho estiver na fila
+        # avisamos que ainda não está pronto em vez de responder 404.
+        marcador = os.path.join(app.config['UPLOAD_FOLDER'], filename + SUFIXO_PENDENTE)
+        if os.path.exists(marcador):
+            with open(marcador) as f:
+                if f.read() == 'falhou':
+                    return "Falha ao gerar o PDF combinado. Valide o lote novamente.", 500
+            return "O PDF ainda não está pronto. Tente novamente em alguns instantes.", 202, {'Retry-After': '5'}
+    return enviar_arquivo(app.config['UPLOAD_FOLDER'], filename, 'private, no-cache')
+
+@app.cli.command('inicializar-banco')
+def inicializar_banco_comando():
+    """Cria as tabelas, migra o esquema e cadastra o admin e o evento."""
+    if not USE_DATABASE:
+        print("Modo em memória (EVENTO_MEMORIA=1): não há banco para inicializar.")
+        return
+    inicializar_banco()
+    print("Banco inicializado.")
+
+def precarregar_modulos():
+    """Importa as bibliotecas pesadas (ReportLab, qrcode, Pillow), que o
+    app só carrega no primeiro uso. O gunicorn.conf.py chama isto no
+    processo mestre com --preload, para os workers herdarem os módulos já
+    carregados (copy-on-write); o pool de renderização os carrega no
+    forkserver (veja fila_render.py)."""
+    import ingresso_pdf
+    from PIL import Image, ImageOps
 
 if __name__ == '__main__':
-    # REMOVIDO: A inicialização agora acontece no topo do arquivo
-    app.run(debug=True, host='0.0.0.0')
\ No newline at end of file
+    # Servidor de desenvolvimento: um processo só, então inicializa o banco aqui mesmo
+    inicializar_banco()
+    create_app().run(debug=True, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,126 @@
+# Exportação das inscrições em CSV e XLSX, gerada aos pedaços enquanto as linhas são lidas
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Linhas acumuladas antes de cada envio para não mandar pedaços minúsculos
+LINHAS_POR_BLOCO = 500
+
+# Planilhas interpretam células que começam com esses caracteres como fórmulas
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+# Caracteres de controle que não podem aparecer em XML
+_CONTROLE_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    if hasattr(valor, 'strftime'):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    return str(valor)
+
+
+def _celula_csv(valor):
+    texto = _texto(valor)
+    # Um nome como "=HYPERLINK(...)" vindo do formulário público não deve virar fórmula
+    return "'" + texto if texto.startswith(_INICIO_FORMULA) else texto
+
+
+def gerar_csv(cabecalho, linhas):
+    # BOM e ";" para o Excel em português abrir o arquivo já separado em colunas
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    escritor.writerow(cabecalho)
+    for n, linha in enumerate(linhas, 1):
+        escritor.writerow([_celula_csv(v) for v in linha])
+        if n % LINHAS_POR_BLOCO == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _Saida:
+    """Arquivo só de escrita cujo conteúdo é retirado aos pedaços.
+
+    Sem tell/seek, o zipfile grava cada entrada em fluxo (com descritor de
+    dados no final), que é o que permite enviar o XLSX enquanto é gerado.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _linha_xml(numero, valores):
+    celulas = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_CONTROLE_XML.sub("", _texto(v)))}</t></is></c>'
+        for v in valores
+    )
+    return f'<row r="{numero}">{celulas}</row>'
+
+
+def gerar_xlsx(cabecalho, linhas, nome_planilha='Inscrições'):
+    """Planilha XLSX mínima (uma aba, células de texto) gerada em fluxo."""
+    saida = _Saida()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as pacote:
+        pacote.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        pacote.writestr('_rels/.rels', _RELS)
+        pacote.writestr('xl/workbook.xml', _WORKBOOK.format(nome=escape(nome_planilha)))
+        pacote.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        # force_zip64: o tamanho da aba não é conhecido antes de terminar
+        with pacote.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as aba:
+            aba.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            aba.write(_linha_xml(1, cabecalho).encode('utf-8'))
+            for numero, linha in enumerate(linhas, 2):
+                aba.write(_linha_xml(numero, linha).encode('utf-8'))
+                if numero % LINHAS_POR_BLOCO == 0:
+                    yield saida.retirar()
+            aba.write(b'</sheetData></worksheet>')
+    yield saida.retirar()
@@ -0,0 +1,156 @@
+# Fila de geração dos ingressos: um pool de processos gera o QR Code e o PDF fora do worker HTTP
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+# Estados de um trabalho de renderização
+NA_FILA = 'na_fila'
+GERANDO = 'gerando'
+PRONTO = 'pronto'
+FALHOU = 'falhou'
+
+# Sufixo do arquivo que marca um PDF combinado ainda em geração
+SUFIXO_PENDENTE = '.pendente'
+
+# Módulos carregados uma vez no servidor de processos, não a cada processo do pool
+PRECARREGAR = ['cache_ingressos', 'comprovantes']
+
+
+def contexto_pool():
+    """Processos do pool partem de um servidor limpo (forkserver), não de uma
+    cópia do worker com as threads, travas e conexões dele."""
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    contexto = multiprocessing.get_context('forkserver')
+    contexto.set_forkserver_preload(PRECARREGAR)
+    return contexto
+
+
+class FilaRender:
+    """Despacha trabalhos para um pool de processos, respeitando o número de vagas.
+
+    A persistência do estado fica com quem usa a fila, através destas funções:
+    - reservar(job_id): marca o trabalho como "gerando" e devolve a tupla de
+      argumentos para `trabalho`, ou None se outro processo já o pegou;
+    - concluir(job_id, erro): grava o resultado (erro é None em caso de sucesso);
+    - pendentes(): lista os trabalhos que ficaram na fila antes de um reinício;
+    - recuperar(): devolve para a fila os trabalhos "gerando" abandonados (o
+      processo que os reservou caiu) e os lista; chamada a cada
+      `intervalo_recuperacao` segundos.
+    """
+
+    def __init__(self, trabalho, reservar, concluir, pendentes=None, workers=None, recuperar=None,
+                 intervalo_recuperacao=60):
+        self.trabalho = trabalho
+        self.reservar = reservar
+        self.concluir = concluir
+        self.pendentes = pendentes
+        self.workers = workers or os.cpu_count() or 1
+        self.recuperar = recuperar
+        self.intervalo_recuperacao = intervalo_recuperacao
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def iniciar(self):
+        # O pool e a thread de despacho são criados por processo, depois do
+        # fork do gunicorn; threads e pools não sobrevivem a um fork.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._fila = queue.Queue()
+            self._vagas = threading.BoundedSemaphore(self.workers)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=contexto_pool())
+            threading.Thread(target=self._despachar, name='fila-render', daemon=True).start()
+            if self.recuperar:
+                threading.Thread(target=self._recuperar_abandonados, name='fila-render-recuperacao', daemon=True).start()
+
+        if self.pendentes:
+            try:
+                for job_id in self.pendentes():
+                    self._fila.put(job_id)
+            except Exception:
+                logger.exception("Falha ao retomar os trabalhos pendentes da fila")
+
+    def enfileirar(self, job_id):
+        self.iniciar()
+        self._fila.put(job_id)
+
+    def submeter(self, funcao, *args):
+        # Trabalho avulso, sem estado persistido: vai direto para o pool
+        self.iniciar()
+        futuro = self._pool.submit(funcao, *args)
+        futuro.add_done_callback(self._registrar_falha_avulsa)
+        return futuro
+
+    def _registrar_falha_avulsa(self, futuro):
+        erro = futuro.exception()
+        if erro is not None:
+            logger.error("Falha em trabalho avulso da fila: %s", erro)
+            if isinstance(erro, BrokenProcessPool):
+                self._recriar_pool()
+
+    def _recuperar_abandonados(self):
+        while True:
+            time.sleep(self.intervalo_recuperacao)
+            try:
+                for job_id in self.recuperar():
+                    self._fila.put(job_id)
+            except Exception:
+                logger.exception("Falha ao recuperar os trabalhos abandonados da fila")
+
+    def _despachar(self):
+        while True:
+            job_id = self._fila.get()
+            self._vagas.acquire()
+            try:
+                args = self.reservar(job_id)
+            except Exception:
+                logger.exception("Falha ao reservar o trabalho %s", job_id)
+                args = None
+            if args is None:
+                self._vagas.release()
+                continue
+
+            try:
+                futuro = self._pool.submit(self.trabalho, *args)
+            except BrokenProcessPool as erro:
+                self._recriar_pool()
+                self._vagas.release()
+                self._concluir(job_id, erro)
+                continue
+            except RuntimeError:
+                # Interpretador encerrando; o trabalho reservado é retomado
+                # por pendentes() quando for considerado abandonado
+                logger.warning("Pool encerrado; o trabalho %s ficará para o próximo início", job_id)
+                return
+            futuro.add_done_callback(partial(self._finalizar, job_id))
+
+    def _finalizar(self, job_id, futuro):
+        self._vagas.release()
+        erro = futuro.exception()
+        if isinstance(erro, BrokenProcessPool):
+            self._recriar_pool()
+        self._concluir(job_id, erro)
+
+    def _concluir(self, job_id, erro):
+        if erro is not None:
+            logger.error("Falha ao gerar o trabalho %s: %s", job_id, erro)
+        try:
+            self.concluir(job_id, erro)
+        except Exception:
+            logger.exception("Falha ao registrar a conclusão do trabalho %s", job_id)
+
+    def _recriar_pool(self):
+        with self._lock:
+            antigo = self._pool
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=contexto_pool())
+        antigo.shutdown(wait=False)
@@ -0,0 +1,28 @@
+# Configuração do gunicorn; com preload_app o mestre importa o app uma vez e os workers compartilham os módulos
+import os
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+# Recicla cada worker depois de tantas requisições (no modo em memória os dados morreriam com ele)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0 if os.environ.get('EVENTO_MEMORIA') == '1' else 2000))
+max_requests_jitter = max_requests // 10
+# Workers com threads (gthread); no modo em memória os dados são do processo, então um só
+workers = int(os.environ.get('WEB_CONCURRENCY', 1 if os.environ.get('EVENTO_MEMORIA') == '1'
+                             else min(2 * (os.cpu_count() or 1) + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# Cada worker abre o seu pool de renderização (RENDER_WORKERS processos); o app
+# divide os núcleos por WEB_CONCURRENCY para o total não passar de um por núcleo.
+# O arquivo é lido antes do import do app, então o valor calculado chega a ele
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+
+def when_ready(server):
+    # Ainda no mestre, depois do import do app e antes do fork dos workers
+    if preload_app:
+        import evento
+        evento.precarregar_modulos()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import evento
+        evento.apos_fork()
@@ -0,0 +1,175 @@
+# Índices da listagem do admin no modo em memória, para não varrer todos os inscritos a cada página
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime
+
+# Campos ordenáveis da listagem: nome da ordem -> (campo, decrescente)
+ORDENS = {
+    'recentes': ('criado_em', True),
+    'antigos': ('criado_em', False),
+    'nome': ('nome_completo', False),
+}
+
+# Só um endereço completo usa o índice exato de email; partes dele ("@gmail") vão pela busca por substring
+EMAIL_COMPLETO = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+
+def email_completo(busca):
+    return EMAIL_COMPLETO.fullmatch(busca) is not None
+
+
+def trigramas(texto):
+    texto = texto.lower()
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def texto_busca(data):
+    return ' '.join((data['nome_completo'] or '', data['nome_secundario'] or '', data['email'] or '', data['telefone'] or '')).lower()
+
+
+class IndiceInscritos:
+    """Índices por status, tipo de ingresso, email, trigramas do texto e
+    listas ordenadas por data de criação e por nome."""
+
+    # Com poucos candidatos vale mais ordenar o conjunto do que percorrer a lista ordenada
+    LIMITE_ORDENAR_CANDIDATOS = 2000
+
+    def __init__(self):
+        self._campos = {}
+        self._por_status = {True: set(), False: set()}
+        self._por_tipo = {}
+        self._por_email = {}
+        self._por_comprovante = {}
+        self._trigramas = {}
+        self._ordenado = {campo: [] for campo, _ in ORDENS.values()}
+        # Contadores do painel do admin, sem varrer as inscrições
+        self._contagens = Counter()
+        self._por_dia = Counter()
+
+    def atualizar(self, ingresso_id, data):
+        self.remover(ingresso_id)
+        campos = {
+            'validado': bool(data['validado']),
+            'tipo_ingresso': data['tipo_ingresso'],
+            'email': (data['email'] or '').strip().lower(),
+            'texto': texto_busca(data),
+            'criado_em': data.get('criado_em') or datetime.min,
+            'nome_completo': data['nome_completo'] or '',
+            'comprovante_pix': data.get('comprovante_pix'),
+        }
+        self._campos[ingresso_id] = campos
+        self._por_status[campos['validado']].add(ingresso_id)
+        self._por_tipo.setdefault(campos['tipo_ingresso'], set()).add(ingresso_id)
+        self._por_email.setdefault(campos['email'], set()).add(ingresso_id)
+        self._por_comprovante.setdefault(campos['comprovante_pix'], set()).add(ingresso_id)
+        for tri in trigramas(campos['texto']):
+            self._trigramas.setdefault(tri, set()).add(ingresso_id)
+        for campo, lista in self._ordenado.items():
+            insort(lista, (campos[campo], ingresso_id))
+        self._contagens[(campos['tipo_ingresso'], campos['validado'])] += 1
+        self._por_dia[campos['criado_em'].date()] += 1
+
+    def remover(self, ingresso_id):
+        campos = self._campos.pop(ingresso_id, None)
+        if campos is None:
+            return
+        self._por_status[campos['validado']].discard(ingresso_id)
+        self._descartar(self._por_tipo, campos['tipo_ingresso'], ingresso_id)
+        self._descartar(self._por_email, campos['email'], ingresso_id)
+        self._descartar(self._por_comprovante, campos['comprovante_pix'], ingresso_id)
+        for tri in trigramas(campos['texto']):
+            self._descartar(self._trigramas, tri, ingresso_id)
+        for campo, lista in self._ordenado.items():
+            posicao = bisect_left(lista, (campos[campo], ingresso_id))
+            if posicao < len(lista) and lista[posicao][1] == ingresso_id:
+                del lista[posicao]
+        self._descontar(self._contagens, (campos['tipo_ingresso'], campos['validado']))
+        self._descontar(self._por_dia, campos['criado_em'].date())
+
+    @staticmethod
+    def _descontar(contador, chave):
+        contador[chave] -= 1
+        if contador[chave] <= 0:
+            del contador[chave]
+
+    @staticmethod
+    def _descartar(indice, chave, ingresso_id):
+        ids = indice.get(chave)
+        if ids is not None:
+            ids.discard(ingresso_id)
+            if not ids:
+                del indice[chave]
+
+    def _candidatos(self, status=None, tipo=None, busca=None):
+        # Interseção dos índices que se aplicam; None significa "todos"
+        conjuntos = []
+        if status is not None:
+            conjuntos.append(self._por_status[status])
+        if tipo:
+            conjuntos.append(self._por_tipo.get(tipo, set()))
+        busca = (busca or '').strip().lower()
+        verificar_texto = None
+        if busca:
+            if email_completo(busca):
+                conjuntos.append(self._por_email.get(busca, set()))
+            else:
+                tris = trigramas(busca)
+                if tris:
+                    conjuntos.extend(self._trigramas.get(tri, set()) for tri in tris)
+                # Os trigramas só filtram; a busca por substring confirma o resultado
+                verificar_texto = busca
+        if not conjuntos:
+            candidatos = None
+        else:
+            conjuntos.sort(key=len)
+            candidatos = set(conjuntos[0]).intersection(*conjuntos[1:])
+        if verificar_texto is not None:
+            base = candidatos if candidatos is not None else self._campos.keys()
+            candidatos = {i for i in base if verificar_texto in self._campos[i]['texto']}
+        return candidatos
+
+    def estatisticas(self):
+        """({(tipo, validado): quantidade}, {'AAAA-MM-DD': quantidade})."""
+        return dict(self._contagens), {dia.isoformat(): n for dia, n in self._por_dia.items()}
+
+    def contar(self, status=None, tipo=None, busca=None):
+        candidatos = self._candidatos(status, tipo, busca)
+        return len(self._campos) if candidatos is None else len(candidatos)
+
+    def buscar(self, status=None, tipo=None, busca=None, ordem='recentes', apos=None, limite=50):
+        """Retorna até `limite` ids na ordem pedida, começando depois do
+        cursor `apos` (par (valor, id) do último item da página anterior)."""
+        campo, decrescente = ORDENS[ordem]
+        candidatos = self._candidatos(status, tipo, busca)
+
+        if candidatos is not None and len(candidatos) <= self.LIMITE_ORDENAR_CANDIDATOS:
+            chaves = sorted(((self._campos[i][campo], i) for i in candidatos), reverse=decrescente)
+            if apos is not None:
+                apos = tuple(apos)
+                chaves = [c for c in chaves if (c < apos if decrescente else c > apos)]
+            return [i for _, i in chaves[:limite]]
+
+        lista = self._ordenado[campo]
+        resultado = []
+        if decrescente:
+            fim = bisect_left(lista, tuple(apos)) if apos is not None else len(lista)
+            posicoes = range(fim - 1, -1, -1)
+        else:
+            inicio = bisect_right(lista, tuple(apos)) if apos is not None else 0
+            posicoes = range(inicio, len(lista))
+        for posicao in posicoes:
+            ingresso_id = lista[posicao][1]
+            if candidatos is None or ingresso_id in candidatos:
+                resultado.append(ingresso_id)
+                if len(resultado) == limite:
+                    break
+        return resultado
+
+    def mesmo_comprovante(self, comprovante_pix):
+        # Inscrições que usaram o mesmo arquivo de comprovante
+        return self._por_comprovante.get(comprovante_pix, set())
+
+    def chave(self, ingresso_id, ordem):
+        campo, _ = ORDENS[ordem]
+        return (self._campos[ingresso_id][campo], ingresso_id)
@@ -0,0 +1,251 @@
+# Geração do QR Code e do PDF do ingresso; sem Flask, roda no pool de fila_render.py
+import os
+import qrcode
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Flowable
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+
+from fila_render import SUFIXO_PENDENTE
+from metricas import registro
+
+
+# Tamanho da logo no cabeçalho e na marca d'água, e a resolução usada para
+# reduzir a imagem original antes de colocá-la no PDF.
+TIMBRE_WIDTH = 1.5 * inch
+WATERMARK_WIDTH = 4 * inch
+LOGO_DPI = 200
+
+
+class ContextoRender:
+    """Tudo o que é igual em todos os ingressos: logo já decodificada e
+    reduzida para os dois tamanhos usados, estilos e dados do evento."""
+
+    def __init__(self, evento, logo_path):
+        self.evento = evento
+        self.logo_path = logo_path
+
+        styles = getSampleStyleSheet()
+        self.italic_style = styles['Italic']
+        self.titulo_style = ParagraphStyle(name='Titulo', parent=styles['Normal'], fontSize=20, alignment=1, spaceAfter=12)
+        self.subtitulo_style = ParagraphStyle(name='Subtitulo', parent=styles['Normal'], fontSize=12, alignment=1, spaceAfter=24)
+        self.table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LINEBELOW', (0, 0), (-1, -1), 1, colors.black),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        self.event_details = [
+            ["Data:", evento['data']],
+            ["Horário:", evento['horario']],
+            ["Local:", evento['local']]
+        ]
+
+        self.timbre = None
+        self.watermark = None
+        if os.path.exists(logo_path):
+            with Image.open(logo_path) as logo:
+                logo.load()
+                self.timbre = _logo_reduzida(logo, TIMBRE_WIDTH)
+                self.watermark = _logo_reduzida(logo, WATERMARK_WIDTH)
+
+    def header_and_footer_pdf(self, canvas_obj, doc):
+        canvas_obj.saveState()
+
+        if self.timbre:
+            logo_img_reader, timbre_height = self.timbre
+            canvas_obj.drawImage(logo_img_reader, 50, A4[1] - 70, width=TIMBRE_WIDTH, height=timbre_height)
+
+            logo_img_reader, watermark_height = self.watermark
+            x_center = (A4[0] - WATERMARK_WIDTH) / 2
+            y_center = (A4[1] - watermark_height) / 2
+
+            canvas_obj.setFillAlpha(0.15)
+            canvas_obj.drawImage(logo_img_reader, x_center, y_center, width=WATERMARK_WIDTH, height=watermark_height, mask='auto')
+            canvas_obj.setFillAlpha(1.0)
+        else:
+            print(f"ATENÇÃO: A imagem da logo não foi encontrada em: {self.logo_path}")
+
+        canvas_obj.setFont('Helvetica-Bold', 12)
+        canvas_obj.setFillColorRGB(0, 0, 0)
+        canvas_obj.drawCentredString(A4[0]/2, 30, "PAGO")
+
+        canvas_obj.restoreState()
+
+
+def _logo_reduzida(logo, largura_pontos):
+    # Retorna (ImageReader, altura em pontos) da logo reduzida para a largura pedida
+    altura_pontos = (largura_pontos * logo.height) / logo.width
+    largura_px = max(1, round(largura_pontos / inch * LOGO_DPI))
+    if logo.mode not in ('RGB', 'RGBA'):
+        logo = logo.convert('RGBA')
+    if largura_px < logo.width:
+        logo = logo.resize((largura_px, max(1, round(logo.height * largura_px / logo.width))), Image.LANCZOS)
+    else:
+        logo = logo.copy()
+    return ImageReader(logo), altura_pontos
+
+
+# Um contexto por processo; é recriado só quando a logo ou os dados do evento mudam
+_contexto_render = None
+_chave_contexto = None
+
+
+def obter_contexto_render(evento, logo_path):
+    global _contexto_render, _chave_contexto
+    try:
+        logo_mtime = os.stat(logo_path).st_mtime_ns
+    except OSError:
+        logo_mtime = None
+    chave = (logo_path, logo_mtime, tuple(sorted(evento.items())))
+    if chave != _chave_contexto:
+        _contexto_render = ContextoRender(evento, logo_path)
+        _chave_contexto = chave
+    return _contexto_render
+
+
+# Lado do QR Code impresso no ingresso
+QR_TAMANHO = 2.5 * inch
+
+
+def _conteudo_qr(ingresso_id, inscrito):
+    # 'qr' é o payload assinado do check-in; sem ele, usa o formato antigo
+    return inscrito.get('qr') or f"ingresso_id:{ingresso_id}"
+
+
+def matriz_qr(conteudo):
+    """Módulos do QR Code (linhas de booleanos, já com a borda), com os mesmos
+    parâmetros de qrcode.make."""
+    with registro.trecho('qr'):
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=4)
+        qr.add_data(conteudo)
+        qr.make(fit=True)
+        return qr.get_matrix()
+
+
+class QRVetorial(Flowable):
+    """QR Code desenhado direto no canvas como retângulos, sem imagem.
+
+    Módulos pretos vizinhos na mesma linha viram um único retângulo e todos
+    entram num só caminho preenchido: o PDF fica menor e a impressão sai
+    nítida em qualquer resolução.
+    """
+
+    def __init__(self, matriz, tamanho=QR_TAMANHO):
+        super().__init__()
+        self.matriz = matriz
+        self.width = self.height = tamanho
+
+    def draw(self):
+        modulo = self.width / len(self.matriz)
+        caminho = self.canv.beginPath()
+        for linha, modulos in enumerate(self.matriz):
+            y = self.height - (linha + 1) * modulo
+            coluna = 0
+            while coluna < len(modulos):
+                if not modulos[coluna]:
+                    coluna += 1
+                    continue
+                inicio = coluna
+                while coluna < len(modulos) and modulos[coluna]:
+                    coluna += 1
+                caminho.rect(inicio * modulo, y, (coluna - inicio) * modulo, modulo)
+        self.canv.saveState()
+        self.canv.setFillColorRGB(0, 0, 0)
+        self.canv.drawPath(caminho, stroke=0, fill=1)
+        self.canv.restoreState()
+
+
+def salvar_qr_png(conteudo, caminho):
+    """Grava o QR Code como PNG (a imagem de /qr_code), com nome temporário
+    e renomeação no final."""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with registro.trecho('qr'):
+        qrcode.make(conteudo).save(temporario, format='PNG')
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def _story_ingresso(ctx, ingresso_id, inscrito):
+    story = []
+    story.append(Paragraph(ctx.evento['titulo'], ctx.titulo_style))
+    story.append(Paragraph(ctx.evento['subtitulo'], ctx.subtitulo_style))
+
+    inscrito_info = [
+        ["Nome Completo:", inscrito['nome_completo']],
+        ["Telefone:", inscrito['telefone']],
+        ["Email:", inscrito['email']],
+        ["Tipo de Ingresso:", inscrito['tipo_ingresso']],
+        ["", ""]
+    ]
+
+    if inscrito['nome_secundario']:
+        inscrito_info.insert(1, ["Nome Secundário:", inscrito['nome_secundario']])
+
+    t = Table(inscrito_info, colWidths=[2.5*inch, 4*inch])
+    t.setStyle(ctx.table_style)
+    story.append(t)
+    story.append(Spacer(1, 0.3*inch))
+
+    details_table = Table(ctx.event_details, colWidths=[2.5*inch, 4*inch])
+    details_table.setStyle(ctx.table_style)
+    story.append(details_table)
+    story.append(Spacer(1, 0.3*inch))
+
+    qr_vetorial = QRVetorial(matriz_qr(_conteudo_qr(ingresso_id, inscrito)))
+    qr_vetorial.hAlign = 'CENTER'
+    story.append(qr_vetorial)
+    story.append(Paragraph("Apresente este QR Code na entrada do evento para validação.", ctx.italic_style))
+    return story
+
+
+def _build(ctx, pdf_path, story):
+    # Nome temporário por processo: o mesmo arquivo pode estar sendo gerado
+    # por dois processos ao mesmo tempo (ingresso avulso e lote, por exemplo)
+    temporario = f"{pdf_path}.{os.getpid()}.tmp"
+    doc = SimpleDocTemplate(temporario, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=36)
+    with registro.trecho('pdf'):
+        doc.build(story, onFirstPage=ctx.header_and_footer_pdf, onLaterPages=ctx.header_and_footer_pdf)
+    os.replace(temporario, pdf_path)
+
+
+def gerar_ingresso(ingresso_id, inscrito, evento, pasta, logo_path, contexto=None, nome=None):
+    """Gera o PDF do ingresso em `pasta` (padrão ingresso_<id>.pdf) e retorna o nome.
+
+    `inscrito` traz os campos da inscrição e, em 'qr', o conteúdo do QR Code;
+    `evento` traz titulo, subtitulo, data, horario e local. Sem `contexto`,
+    usa o contexto de renderização do processo.
+    """
+    ctx = contexto or obter_contexto_render(evento, logo_path)
+
+    pdf_filename = nome or f"ingresso_{ingresso_id}.pdf"
+    _build(ctx, os.path.join(pasta, pdf_filename), _story_ingresso(ctx, ingresso_id, inscrito))
+    return pdf_filename
+
+
+def gerar_lote(pdf_filename, itens, evento, pasta, logo_path):
+    """Gera um único PDF com um ingresso por página, para impressão.
+
+    `itens` é uma lista de pares (ingresso_id, inscrito). Enquanto o PDF é
+    gerado existe o arquivo <pdf_filename>.pendente; se a geração falhar,
+    ele passa a conter "falhou".
+    """
+    marcador = os.path.join(pasta, pdf_filename + SUFIXO_PENDENTE)
+    try:
+        ctx = obter_contexto_render(evento, logo_path)
+        story = []
+        for ingresso_id, inscrito in itens:
+            if story:
+                story.append(PageBreak())
+            story.extend(_story_ingresso(ctx, ingresso_id, inscrito))
+        _build(ctx, os.path.join(pasta, pdf_filename), story)
+    except Exception:
+        with open(marcador, 'w') as f:
+            f.write('falhou')
+        raise
+    os.remove(marcador)
+    return pdf_filename
@@ -0,0 +1,328 @@
+# Métricas no formato do Prometheus, sem dependências; /metrics soma os instantâneos de cada processo
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (desenvolvimento local)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PASTA = os.environ.get('METRICAS_DIR', os.path.join('dados', 'metricas'))
+# Limites (segundos) dos baldes dos histogramas
+BALDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# De quanto em quanto tempo (segundos) cada processo grava o instantâneo
+INTERVALO_PUBLICACAO = 2
+# Soma dos processos encerrados, para os contadores nunca diminuírem
+ENCERRADOS = 'encerrados.json'
+
+DESCRICOES = {
+    'http_requisicao_segundos': 'Tempo de resposta por rota',
+    'trecho_segundos': 'Tempo dos trechos internos (qr, pdf, db_consulta, db_commit, upload)',
+}
+
+
+class Registro:
+    """Histogramas do processo atual: {(nome, rótulos): [baldes..., soma, total]}."""
+
+    def __init__(self, pasta=PASTA):
+        self.pasta = pasta
+        self._lock = threading.Lock()
+        self._pid = None
+        self._sujo = False
+
+    def _iniciar(self):
+        # Um processo filho começa do zero em vez de repetir as contagens do pai
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._series = {}
+        threading.Thread(target=self._publicar_periodicamente, name='metricas', daemon=True).start()
+
+    def observar(self, nome, segundos, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self._iniciar()
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * (len(BALDES) + 2)
+            for i, limite in enumerate(BALDES):
+                if segundos <= limite:
+                    serie[i] += 1
+            serie[-2] += segundos
+            serie[-1] += 1
+            self._sujo = True
+
+    @contextmanager
+    def medir(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def trecho(self, trecho):
+        return self.medir('trecho_segundos', trecho=trecho)
+
+    # --- Publicação entre processos ---
+
+    def _arquivo(self, pid):
+        return os.path.join(self.pasta, f"{pid}.json")
+
+    def instantaneo(self):
+        with self._lock:
+            self._iniciar()
+            return [[nome, list(rotulos), list(serie)] for (nome, rotulos), serie in self._series.items()]
+
+    def publicar(self):
+        if not self._sujo:
+            return
+        self._sujo = False
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            temporario = self._arquivo(os.getpid()) + '.tmp'
+            with open(temporario, 'w') as f:
+                json.dump(self.instantaneo(), f)
+            os.replace(temporario, self._arquivo(os.getpid()))
+        except OSError:
+            logger.exception("Falha ao gravar as métricas do processo")
+
+    def _publicar_periodicamente(self):
+        while True:
+            time.sleep(INTERVALO_PUBLICACAO)
+            self.publicar()
+
+    @contextmanager
+    def _trava(self):
+        # Quem coleta incorpora os processos encerrados; um de cada vez, para nenhum ser somado duas vezes
+        os.makedirs(self.pasta, exist_ok=True)
+        with open(os.path.join(self.pasta, '.trava'), 'w') as trava:
+            if fcntl:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _ler(self, caminho):
+        try:
+            with open(caminho) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def coletar(self):
+        """Soma os instantâneos dos processos vivos, o deste e os dos encerrados."""
+        self.publicar()
+        somadas = {}
+        lidos = set()
+        try:
+            with self._trava():
+                encerrados = self._ler(os.path.join(self.pasta, ENCERRADOS))
+                vivos = []
+                for arquivo in os.listdir(self.pasta):
+                    nome_pid = arquivo[:-len('.json')]
+                    if not arquivo.endswith('.json') or not nome_pid.isdigit():
+                        continue
+                    pid = int(nome_pid)
+                    series = self._ler(self._arquivo(pid))
+                    if pid == os.getpid() or _vivo(pid):
+                        vivos.append((pid, series))
+                        continue
+                    # Processo encerrado: as contagens passam para a soma dos encerrados antes de o arquivo sair
+                    encerrados = _somar(_somar({}, encerrados), series)
+                    encerrados = [[nome, list(rotulos), serie] for (nome, rotulos), serie in encerrados.items()]
+                    temporario = os.path.join(self.pasta, ENCERRADOS + '.tmp')
+                    with open(temporario, 'w') as f:
+                        json.dump(encerrados, f)
+                    os.replace(temporario, os.path.join(self.pasta, ENCERRADOS))
+                    _remover(self._arquivo(pid))
+        except OSError:
+            logger.exception("Falha ao ler as métricas dos outros processos")
+            encerrados, vivos = [], []
+        _somar(somadas, encerrados)
+        for pid, series in vivos:
+            lidos.add(pid)
+            _somar(somadas, series)
+        if os.getpid() not in lidos:
+            # Sem pasta gravável: ao menos as métricas deste processo
+            _somar(somadas, self.instantaneo())
+        return somadas
+
+
+def _somar(somadas, series):
+    """Acrescenta a `somadas` ({(nome, rótulos): série}) as séries de um instantâneo."""
+    for nome, rotulos, serie in series:
+        chave = (nome, tuple(tuple(r) for r in rotulos))
+        atual = somadas.setdefault(chave, [0] * len(serie))
+        for i, valor in enumerate(serie):
+            atual[i] += valor
+    return somadas
+
+
+def medir_banco(registro, engine, sessao):
+    """Mede cada comando SQL (trecho db_consulta, por operação) e cada
+    commit da sessão, incluindo o flush (trecho db_commit)."""
+    from sqlalchemy import event
+
+    def antes_comando(conexao, cursor, sql, parametros, contexto, varios):
+        conexao.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+    def depois_comando(conexao, cursor, sql, parametros, contexto, varios):
+        inicio = conexao.info['metricas_inicio'].pop()
+        operacao = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else 'outro'
+        if operacao not in ('select', 'insert', 'update', 'delete'):
+            operacao = 'outro'
+        registro.observar('trecho_segundos', time.perf_counter() - inicio, trecho='db_consulta', operacao=operacao)
+
+    def erro_comando(contexto):
+        pilha = contexto.connection.info.get('metricas_inicio') if contexto.connection is not None else None
+        if pilha:
+            pilha.pop()
+
+    def antes_commit(sessao_atual):
+        sessao_atual.info['metricas_commit'] = time.perf_counter()
+
+    def depois_commit(sessao_atual):
+        inicio = sessao_atual.info.pop('metricas_commit', None)
+        if inicio is not None:
+            registro.observar('trecho_segundos', time.perf_counter() - inicio, trecho='db_commit')
+
+    event.listen(engine, 'before_cursor_execute', antes_comando)
+    event.listen(engine, 'after_cursor_execute', depois_comando)
+    event.listen(engine, 'handle_error', erro_comando)
+    event.listen(sessao, 'before_commit', antes_commit)
+    event.listen(sessao, 'after_commit', depois_commit)
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+
+def formatar(histogramas, medidores):
+    """Texto no formato de exposição do Prometheus.
+
+    `histogramas` é o resultado de Registro.coletar(); `medidores` é uma
+    lista de (nome, descrição, [(rótulos, valor), ...]).
+    """
+    linhas = []
+    for nome in sorted({n for n, _ in histogramas}):
+        linhas.append(f"# HELP {nome} {DESCRICOES.get(nome, nome)}")
+        linhas.append(f"# TYPE {nome} histogram")
+        for (n, rotulos), serie in sorted(histogramas.items()):
+            if n != nome:
+                continue
+            for limite, contagem in zip(BALDES, serie):
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos + (('le', f'{limite:g}'),))} {contagem}")
+            linhas.append(f"{nome}_bucket{_rotulos(rotulos + (('le', '+Inf'),))} {serie[-1]}")
+            linhas.append(f"{nome}_sum{_rotulos(rotulos)} {serie[-2]:.6f}")
+            linhas.append(f"{nome}_count{_rotulos(rotulos)} {serie[-1]}")
+    for nome, descricao, valores in medidores:
+        linhas.append(f"# HELP {nome} {descricao}")
+        linhas.append(f"# TYPE {nome} gauge")
+        for rotulos, valor in valores:
+            linhas.append(f"{nome}{_rotulos(tuple(rotulos.items()))} {valor}")
+    return '\n'.join(linhas) + '\n'
+
+
+# --- Perfilador por amostragem ---
+
+class Perfilador:
+    """Amostra as pilhas das threads que estão atendendo requisições.
+
+    Uma thread por processo lê sys._current_frames() a cada `intervalo`
+    segundos; as amostras de cada requisição só são gravadas se ela levar
+    mais que `limiar` segundos.
+    """
+
+    def __init__(self, pasta, limiar=1.0, intervalo=0.01):
+        self.pasta = pasta
+        self.limiar = limiar
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._pid = None
+        self._ativas = {}
+
+    def _iniciar(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ativas = {}
+            threading.Thread(target=self._amostrar, name='perfilador', daemon=True).start()
+
+    def comecar(self):
+        self._iniciar()
+        with self._lock:
+            self._ativas[threading.get_ident()] = Counter()
+
+    def terminar(self, descricao, duracao):
+        with self._lock:
+            amostras = self._ativas.pop(threading.get_ident(), None)
+        if not amostras or duracao < self.limiar:
+            return
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            nome = f"{datetime.utcnow():%Y%m%d_%H%M%S_%f}_{os.getpid()}_{descricao}.folded"
+            with open(os.path.join(self.pasta, nome), 'w') as f:
+                for pilha, contagem in amostras.most_common():
+                    f.write(f"{pilha} {contagem}\n")
+        except OSError:
+            logger.exception("Falha ao gravar o perfil da requisição")
+            return
+        logger.warning("Requisição lenta (%.2f s): %s; perfil em %s", duracao, descricao, nome)
+
+    def _amostrar(self):
+        while True:
+            time.sleep(self.intervalo)
+            quadros = sys._current_frames()
+            with self._lock:
+                for ident, amostras in self._ativas.items():
+                    quadro = quadros.get(ident)
+                    if quadro is not None:
+                        amostras[_pilha(quadro)] += 1
+
+
+def _pilha(quadro):
+    funcoes = []
+    while quadro is not None:
+        codigo = quadro.f_code
+        funcoes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+        quadro = quadro.f_back
+    return ';'.join(reversed(funcoes))
+
+
+# Registro compartilhado pelos módulos do app (rotas, banco, renderização)
+registro = Registro()
@@ -0,0 +1,80 @@
+# Versões redimensionadas das fotos da galeria e dos banners; sem Flask, roda no pool de fundo
+import os
+
+# Larguras geradas para o srcset; imagens menores geram só a própria largura
+LARGURAS = (480, 960, 1920)
+FORMATOS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def nome_derivado(arquivo, largura, extensao):
+    return f"{os.path.splitext(arquivo)[0]}-{largura}.{extensao}"
+
+
+def gerar_derivados(origem, pasta_destino, larguras=LARGURAS):
+    """Gera WebP e JPEG da imagem `origem` em cada largura, sem metadados
+    (EXIF, GPS etc.), e retorna a lista de larguras geradas.
+
+    Imagens animadas são ignoradas para não perder a animação.
+    """
+    from PIL import Image, ImageOps
+    arquivo = os.path.basename(origem)
+    os.makedirs(pasta_destino, exist_ok=True)
+    with Image.open(origem) as imagem:
+        if getattr(imagem, 'is_animated', False):
+            return []
+        # Aplica a rotação do EXIF antes de descartá-lo
+        imagem = ImageOps.exif_transpose(imagem)
+        if imagem.mode not in ('RGB', 'RGBA'):
+            imagem = imagem.convert('RGBA' if 'A' in imagem.getbands() or 'transparency' in imagem.info else 'RGB')
+
+        geradas = sorted({min(largura, imagem.width) for largura in larguras})
+        for largura in geradas:
+            altura = max(1, round(imagem.height * largura / imagem.width))
+            reduzida = imagem.resize((largura, altura), Image.LANCZOS) if largura < imagem.width else imagem
+            for extensao, opcoes in FORMATOS.items():
+                versao = reduzida
+                if opcoes['format'] == 'JPEG' and versao.mode == 'RGBA':
+                    fundo = Image.new('RGB', versao.size, (255, 255, 255))
+                    fundo.paste(versao, mask=versao.getchannel('A'))
+                    versao = fundo
+                destino = os.path.join(pasta_destino, nome_derivado(arquivo, largura, extensao))
+                temporario = f"{destino}.{os.getpid()}.tmp"
+                versao.save(temporario, **opcoes)
+                os.replace(temporario, destino)
+    return geradas
+
+
+def indexar_derivados(pasta_destino):
+    """Retorna {nome base da imagem original: [larguras]} com as larguras
+    que já têm as duas versões (WebP e JPEG) em disco."""
+    if not os.path.isdir(pasta_destino):
+        return {}
+    encontrados = {}
+    for nome in os.listdir(pasta_destino):
+        base, extensao = os.path.splitext(nome)
+        base, _, largura = base.rpartition('-')
+        if extensao[1:] in FORMATOS and largura.isdigit():
+            encontrados.setdefault((base, int(largura)), set()).add(extensao[1:])
+    indice = {}
+    for (base, largura), extensoes in encontrados.items():
+        if len(extensoes) == len(FORMATOS):
+            indice.setdefault(base, []).append(largura)
+    for larguras in indice.values():
+        larguras.sort()
+    return indice
+
+
+def remover_derivados(pasta_destino, arquivo):
+    if not os.path.isdir(pasta_destino):
+        return
+    base_original = os.path.splitext(arquivo)[0]
+    for nome in os.listdir(pasta_destino):
+        base, _, largura = os.path.splitext(nome)[0].rpartition('-')
+        if base == base_original and largura.isdigit():
+            try:
+                os.remove(os.path.join(pasta_destino, nome))
+            except FileNotFoundError:
+                pass
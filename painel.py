@@ -0,0 +1,66 @@
+# Painel do admin: contagens das inscrições e registro numerado das alterações, enviado por SSE
+import json
+import threading
+from collections import deque
+
+# Operações do registro de alterações
+INSCRITO = 'I'
+VALIDADO = 'V'
+EDITADO = 'M'
+EXCLUIDO = 'E'
+
+
+def montar_estatisticas(contagens, por_dia):
+    """`contagens` é {(tipo_ingresso, validado): quantidade} e `por_dia`
+    {'AAAA-MM-DD': quantidade}, com as datas de inscrição em UTC."""
+    por_tipo = {}
+    for (tipo, validado), quantidade in contagens.items():
+        item = por_tipo.setdefault(tipo or '', {'validados': 0, 'pendentes': 0})
+        item['validados' if validado else 'pendentes'] += quantidade
+    validados = sum(item['validados'] for item in por_tipo.values())
+    pendentes = sum(item['pendentes'] for item in por_tipo.values())
+    return {
+        'total': validados + pendentes,
+        'validados': validados,
+        'pendentes': pendentes,
+        'por_tipo': dict(sorted(por_tipo.items())),
+        'por_dia': sorted([dia, quantidade] for dia, quantidade in por_dia.items()),
+    }
+
+
+def evento_sse(nome, dados, seq=None):
+    """Uma mensagem do stream text/event-stream; o `id` é o seq, que o
+    navegador devolve no cabeçalho Last-Event-ID ao reconectar."""
+    linhas = [f"id: {seq}"] if seq is not None else []
+    linhas += [f"event: {nome}", f"data: {json.dumps(dados, default=str)}"]
+    return '\n'.join(linhas) + '\n\n'
+
+
+class AlteracoesMemoria:
+    """Registro de alterações do modo em memória (no banco é a tabela
+    AlteracaoPainel). Guarda só as últimas `limite`; quem ficou para trás
+    recebe as contagens completas de qualquer forma."""
+
+    def __init__(self, limite=10000):
+        self._condicao = threading.Condition()
+        self._seq = 0
+        self._itens = deque(maxlen=limite)
+
+    def registrar(self, operacao, ingresso_ids):
+        with self._condicao:
+            for ingresso_id in ingresso_ids:
+                self._seq += 1
+                self._itens.append((self._seq, operacao, ingresso_id))
+            self._condicao.notify_all()
+
+    def seq(self):
+        return self._seq
+
+    def desde(self, seq, limite):
+        with self._condicao:
+            return [item for item in self._itens if item[0] > seq][:limite]
+
+    def aguardar(self, seq, timeout):
+        """Espera uma alteração depois de `seq`, por até `timeout` segundos."""
+        with self._condicao:
+            self._condicao.wait_for(lambda: self._seq > seq, timeout)
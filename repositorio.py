@@ -0,0 +1,300 @@
+# Repositório das inscrições: SQLAlchemy ou em memória, com o mesmo contrato (tests/test_repositorio.py).
+# Gravações do SQL ficam na sessão até `confirmar()`.
+import threading
+import uuid
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import and_, delete, func, insert, or_, update
+
+from indice_inscritos import IndiceInscritos, ORDENS, email_completo
+
+CAMPOS = ('nome_completo', 'nome_secundario', 'telefone', 'email', 'tipo_ingresso', 'comprovante_pix', 'validado', 'criado_em')
+# Campos que o admin pode editar
+CAMPOS_EDITAVEIS = ('nome_completo', 'nome_secundario', 'telefone', 'email', 'tipo_ingresso')
+# Máximo de ids por cláusula IN
+LOTE_IN = 500
+
+
+def nova_inscricao(dados):
+    """Completa os campos gerados (id, validado, criado_em) de uma inscrição nova."""
+    inscricao = {campo: dados.get(campo) for campo in CAMPOS}
+    inscricao['id'] = dados.get('id') or str(uuid.uuid4())
+    inscricao['validado'] = bool(dados.get('validado', False))
+    inscricao['criado_em'] = dados.get('criado_em') or datetime.utcnow()
+    return inscricao
+
+
+def _fatias(ids, tamanho=LOTE_IN):
+    ids = iter(ids)
+    while fatia := list(islice(ids, tamanho)):
+        yield fatia
+
+
+class RepositorioSQL:
+
+    def __init__(self, db, modelo):
+        self.db = db
+        self.modelo = modelo
+        self._colunas = [modelo.id] + [getattr(modelo, campo) for campo in CAMPOS]
+
+    def _consulta(self, status=None, tipo=None, busca=None, **_):
+        m = self.modelo
+        consulta = self.db.session.query(*self._colunas)
+        if status is not None:
+            consulta = consulta.filter(m.validado == status)
+        if tipo:
+            consulta = consulta.filter(m.tipo_ingresso == tipo)
+        if busca:
+            if email_completo(busca):
+                consulta = consulta.filter(func.lower(m.email) == busca.lower())
+            else:
+                padrao = '%' + busca.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                consulta = consulta.filter(or_(
+                    m.nome_completo.ilike(padrao, escape='\\'),
+                    m.nome_secundario.ilike(padrao, escape='\\'),
+                    m.email.ilike(padrao, escape='\\'),
+                    m.telefone.ilike(padrao, escape='\\'),
+                ))
+        return consulta
+
+    def _ordenar(self, consulta, ordem):
+        campo, decrescente = ORDENS[ordem]
+        coluna = getattr(self.modelo, campo)
+        if decrescente:
+            return consulta.order_by(coluna.desc(), self.modelo.id.desc())
+        return consulta.order_by(coluna.asc(), self.modelo.id.asc())
+
+    # --- Leitura ---
+
+    def obter(self, ids):
+        resultado = {}
+        for fatia in _fatias(ids):
+            for linha in self.db.session.query(*self._colunas).filter(self.modelo.id.in_(fatia)):
+                resultado[linha.id] = linha._asdict()
+        return {i: resultado[i] for i in ids if i in resultado}
+
+    def obter_um(self, ingresso_id):
+        return self.obter([ingresso_id]).get(ingresso_id)
+
+    def total(self):
+        return self.db.session.query(func.count(self.modelo.id)).scalar()
+
+    def contar(self, filtros):
+        return self._consulta(**filtros).order_by(None).count()
+
+    def estatisticas(self):
+        """({(tipo, validado): quantidade}, {'AAAA-MM-DD': quantidade}), com
+        COUNT/GROUP BY no banco."""
+        m = self.modelo
+        sessao = self.db.session
+        contagens = {}
+        for tipo, validado, quantidade in sessao.query(m.tipo_ingresso, m.validado, func.count()).group_by(m.tipo_ingresso, m.validado):
+            chave = (tipo, bool(validado))
+            contagens[chave] = contagens.get(chave, 0) + quantidade
+        dia = func.date(m.criado_em)
+        # O SQLite devolve a data como texto e o PostgreSQL como date
+        por_dia = {str(d): quantidade for d, quantidade in sessao.query(dia, func.count()).group_by(dia)}
+        return contagens, por_dia
+
+    def listar(self, filtros, apos=None, limite=50):
+        """Retorna ({id: inscrição} da página, chave (valor, id) do último item
+        se houver próxima página, ou None)."""
+        campo, decrescente = ORDENS[filtros['ordem']]
+        coluna = getattr(self.modelo, campo)
+        consulta = self._consulta(**filtros)
+        if apos is not None:
+            valor, apos_id = apos
+            if decrescente:
+                consulta = consulta.filter(or_(coluna < valor, and_(coluna == valor, self.modelo.id < apos_id)))
+            else:
+                consulta = consulta.filter(or_(coluna > valor, and_(coluna == valor, self.modelo.id > apos_id)))
+        linhas = [l._asdict() for l in self._ordenar(consulta, filtros['ordem']).limit(limite + 1)]
+        pagina = {l['id']: l for l in linhas[:limite]}
+        ultimo = (linhas[limite - 1][campo], linhas[limite - 1]['id']) if len(linhas) > limite else None
+        return pagina, ultimo
+
+    def iterar_lotes(self, filtros, lote=1000):
+        """Todas as inscrições filtradas, em listas de até `lote`, lidas de um
+        cursor no servidor (yield_per) sem carregar a tabela inteira."""
+        consulta = self._ordenar(self._consulta(**filtros), filtros['ordem']).yield_per(lote)
+        atual = []
+        for linha in consulta:
+            atual.append(linha._asdict())
+            if len(atual) == lote:
+                yield atual
+                atual = []
+        if atual:
+            yield atual
+
+    def validados(self):
+        m = self.modelo
+        return dict(self.db.session.query(m.id, m.nome_completo).filter(m.validado == True))
+
+    def mesmo_comprovante(self, comprovantes):
+        """{comprovante: [(id, nome), ...]} de todas as inscrições que usam cada comprovante."""
+        m = self.modelo
+        usos = {}
+        for fatia in _fatias(list(set(comprovantes))):
+            consulta = (self.db.session.query(m.comprovante_pix, m.id, m.nome_completo)
+                        .filter(m.comprovante_pix.in_(fatia)).order_by(m.criado_em))
+            for comprovante, ingresso_id, nome in consulta:
+                usos.setdefault(comprovante, []).append((ingresso_id, nome))
+        return usos
+
+    # --- Escrita ---
+
+    def adicionar(self, inscricoes):
+        linhas = [nova_inscricao(dados) for dados in inscricoes]
+        if linhas:
+            # INSERT em lote (executemany), sem montar um objeto por linha
+            self.db.session.execute(insert(self.modelo), linhas)
+        return [l['id'] for l in linhas]
+
+    def atualizar(self, alteracoes):
+        """`alteracoes` é {id: {campo: valor}}; retorna os ids encontrados."""
+        existentes = set(self.obter(list(alteracoes)))
+        linhas = [{'id': i, **{c: v for c, v in campos.items() if c in CAMPOS_EDITAVEIS}}
+                  for i, campos in alteracoes.items() if i in existentes]
+        if linhas:
+            # UPDATE em lote pela chave primária
+            self.db.session.execute(update(self.modelo), linhas)
+        return [i for i in alteracoes if i in existentes]
+
+    def validar(self, ids):
+        """Valida as inscrições pendentes entre `ids`; retorna {id: inscrição}
+        só das que foram validadas agora, na ordem de `ids`."""
+        m = self.modelo
+        ids = list(dict.fromkeys(ids))
+        validadas = set()
+        for fatia in _fatias(ids):
+            # A condição no próprio UPDATE: de duas validações simultâneas, só uma muda a linha
+            resultado = self.db.session.execute(
+                update(m).where(m.id.in_(fatia), m.validado == False).values(validado=True).returning(m.id)
+                .execution_options(synchronize_session=False))
+            validadas.update(resultado.scalars())
+        return self.obter([i for i in ids if i in validadas])
+
+    def excluir(self, ids):
+        existentes = list(self.obter(ids))
+        for fatia in _fatias(existentes):
+            self.db.session.execute(delete(self.modelo).where(self.modelo.id.in_(fatia))
+                                    .execution_options(synchronize_session=False))
+        return existentes
+
+    def confirmar(self):
+        self.db.session.commit()
+
+    def descartar(self):
+        self.db.session.rollback()
+
+
+class RepositorioMemoria:
+    """Inscrições num dict do processo, com os índices de IndiceInscritos
+    para filtros, busca e paginação. As inscrições saem como cópias."""
+
+    def __init__(self):
+        self._inscricoes = {}
+        self._indice = IndiceInscritos()
+        # Reentrante: listar lê as inscrições com a trava já tomada
+        self._lock = threading.RLock()
+
+    # --- Leitura ---
+    # Toda leitura toma a trava: a fila de inscrições grava de outra thread
+
+    def obter(self, ids):
+        with self._lock:
+            return {i: dict(self._inscricoes[i]) for i in ids if i in self._inscricoes}
+
+    def obter_um(self, ingresso_id):
+        return self.obter([ingresso_id]).get(ingresso_id)
+
+    def total(self):
+        with self._lock:
+            return len(self._inscricoes)
+
+    def contar(self, filtros):
+        with self._lock:
+            return self._indice.contar(filtros['status'], filtros['tipo'], filtros['busca'])
+
+    def estatisticas(self):
+        with self._lock:
+            return self._indice.estatisticas()
+
+    def listar(self, filtros, apos=None, limite=50):
+        with self._lock:
+            ids = self._indice.buscar(filtros['status'], filtros['tipo'], filtros['busca'], filtros['ordem'], apos, limite + 1)
+            ultimo = self._indice.chave(ids[limite - 1], filtros['ordem']) if len(ids) > limite else None
+            return self.obter(ids[:limite]), ultimo
+
+    def iterar_lotes(self, filtros, lote=1000):
+        # Percorre o índice por cursor: inscrições novas ou excluídas durante a
+        # leitura não fazem a iteração repetir nem pular itens
+        apos = None
+        while True:
+            pagina, apos = self.listar(filtros, apos, lote)
+            if pagina:
+                yield list(pagina.values())
+            if apos is None:
+                return
+
+    def validados(self):
+        with self._lock:
+            return {i: d['nome_completo'] for i, d in self._inscricoes.items() if d['validado']}
+
+    def mesmo_comprovante(self, comprovantes):
+        usos = {}
+        with self._lock:
+            for comprovante in set(comprovantes):
+                ids = sorted(self._indice.mesmo_comprovante(comprovante), key=lambda i: self._inscricoes[i]['criado_em'])
+                usos[comprovante] = [(i, self._inscricoes[i]['nome_completo']) for i in ids]
+        return usos
+
+    # --- Escrita ---
+
+    def adicionar(self, inscricoes):
+        linhas = [nova_inscricao(dados) for dados in inscricoes]
+        with self._lock:
+            for linha in linhas:
+                self._inscricoes[linha['id']] = linha
+                self._indice.atualizar(linha['id'], linha)
+        return [l['id'] for l in linhas]
+
+    def atualizar(self, alteracoes):
+        atualizados = []
+        with self._lock:
+            for ingresso_id, campos in alteracoes.items():
+                inscricao = self._inscricoes.get(ingresso_id)
+                if inscricao is None:
+                    continue
+                inscricao.update({c: v for c, v in campos.items() if c in CAMPOS_EDITAVEIS})
+                self._indice.atualizar(ingresso_id, inscricao)
+                atualizados.append(ingresso_id)
+        return atualizados
+
+    def validar(self, ids):
+        validadas = {}
+        with self._lock:
+            for ingresso_id in ids:
+                inscricao = self._inscricoes.get(ingresso_id)
+                if inscricao is None or inscricao['validado'] or ingresso_id in validadas:
+                    continue
+                inscricao['validado'] = True
+                self._indice.atualizar(ingresso_id, inscricao)
+                validadas[ingresso_id] = dict(inscricao)
+        return validadas
+
+    def excluir(self, ids):
+        excluidos = []
+        with self._lock:
+            for ingresso_id in ids:
+                if self._inscricoes.pop(ingresso_id, None) is not None:
+                    self._indice.remover(ingresso_id)
+                    excluidos.append(ingresso_id)
+        return excluidos
+
+    def confirmar(self):
+        pass
+
+    def descartar(self):
+        pass
@@ -0,0 +1,49 @@
+# Banco SQLite local (sem DATABASE_URL), em modo WAL para ser compartilhado pelos workers
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (desenvolvimento local)
+    fcntl = None
+
+# Quanto tempo (ms) uma gravação espera outra terminar antes de desistir
+BUSY_TIMEOUT_MS = 30000
+
+
+def url_sqlite(caminho):
+    caminho = os.path.abspath(caminho)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    return f"sqlite:///{caminho}"
+
+
+def _pragmas(conexao_dbapi, _):
+    cursor = conexao_dbapi.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    # Com WAL, NORMAL só pode perder a última transação numa queda de energia,
+    # nunca corromper o banco; evita um fsync por commit
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    cursor.close()
+
+
+def configurar_wal(engine):
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _pragmas)
+
+
+@contextmanager
+def trava_inicializacao(caminho):
+    """Só um worker por vez cria as tabelas e migra o esquema; os outros
+    esperam e encontram tudo pronto."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho + '.init.lock', 'w') as trava:
+        if fcntl:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(trava, fcntl.LOCK_UN)
@@ -0,0 +1,63 @@
+# Os testes sobem o app com um SQLite temporário (o padrão sem DATABASE_URL),
+# a partir de uma pasta temporária, como os benchmarks.
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA = tempfile.mkdtemp(prefix='testes_evento_')
+
+os.chdir(PASTA)
+os.environ.pop('DATABASE_URL', None)
+os.environ.pop('EVENTO_MEMORIA', None)
+os.environ.pop('SMTP_HOST', None)
+os.environ['SQLITE_PATH'] = os.path.join(PASTA, 'dados', 'evento.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(PASTA, 'arquivos_enviados')
+sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture(scope='session')
+def evento():
+    import evento
+    evento.inicializar_banco()
+    evento.create_app()
+    return evento
+
+
+@pytest.fixture
+def cliente(evento):
+    return evento.app.test_client()
+
+
+@pytest.fixture
+def admin(cliente):
+    with cliente.session_transaction() as sessao:
+        sessao['logged_in'] = True
+    return cliente
+
+
+@pytest.fixture
+def inscrever(evento):
+    """Grava uma inscrição direto no repositório e retorna o id."""
+    def inscrever(validado=False, **campos):
+        dados = {
+            'id': str(uuid.uuid4()),
+            'nome_completo': 'Participante Teste',
+            'nome_secundario': None,
+            'telefone': '71 999990000',
+            'email': f"{uuid.uuid4().hex[:8]}@example.com",
+            'tipo_ingresso': 'Individual',
+            'comprovante_pix': 'pix.png',
+            'validado': validado,
+            'criado_em': datetime.utcnow(),
+            **campos,
+        }
+        with evento.app.app_context():
+            ingresso_id = evento.repositorio.adicionar([dados])[0]
+            evento.repositorio.confirmar()
+        return ingresso_id
+    return inscrever
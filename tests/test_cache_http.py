@@ -0,0 +1,65 @@
+import os
+
+
+def _condicional(cliente, url, **cabecalhos):
+    return cliente.get(url, headers=cabecalhos)
+
+
+def _conferir_validadores(cliente, url):
+    primeira = cliente.get(url)
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag']
+
+    repetida = _condicional(cliente, url, **{'If-None-Match': etag})
+    assert repetida.status_code == 304
+    assert repetida.data == b''
+
+    diferente = _condicional(cliente, url, **{'If-None-Match': '"outra-versao"'})
+    assert diferente.status_code == 200
+    assert diferente.data == primeira.data
+    return primeira
+
+
+def test_pagina_inicial_responde_304(cliente):
+    _conferir_validadores(cliente, '/')
+
+
+def test_estatico_responde_304(evento, cliente):
+    pasta = os.path.join(evento.app.static_folder, 'banners')
+    arquivo = sorted(os.listdir(pasta))[0]
+    with evento.app.test_request_context():
+        url = evento.url_for('static', filename=f"banners/{arquivo}")
+    primeira = _conferir_validadores(cliente, url)
+    assert 'immutable' in primeira.headers['Cache-Control']
+
+    modificado = primeira.headers['Last-Modified']
+    assert _condicional(cliente, url, **{'If-Modified-Since': modificado}).status_code == 304
+    antigo = _condicional(cliente, url, **{'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'})
+    assert antigo.status_code == 200 and antigo.data == primeira.data
+
+
+def test_ingresso_responde_304(admin, inscrever):
+    ingresso_id = inscrever(validado=True)
+    url = f"/ingresso/ingresso_{ingresso_id}.pdf"
+    primeira = _conferir_validadores(admin, url)
+    assert primeira.mimetype == 'application/pdf'
+    assert _condicional(admin, url, **{'If-Modified-Since': primeira.headers['Last-Modified']}).status_code == 304
+
+
+def test_estatico_pre_comprimido_responde_304(evento, cliente, tmp_path, monkeypatch):
+    from cache_http import pre_comprimir_pasta
+    monkeypatch.setattr(evento.app, 'static_folder', str(tmp_path))
+    (tmp_path / 'estilo.css').write_text('body { color: #123456; }\n' * 100)
+    pre_comprimir_pasta(str(tmp_path))
+
+    simples = cliente.get('/estatico/estilo.css', headers={'Accept-Encoding': 'identity'})
+    comprimida = cliente.get('/estatico/estilo.css', headers={'Accept-Encoding': 'gzip'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in comprimida.headers['Vary']
+    # Cada representação tem a sua ETag
+    assert comprimida.headers['ETag'] == simples.headers['ETag'][:-1] + '-gzip"'
+
+    repetida = cliente.get('/estatico/estilo.css', headers={'Accept-Encoding': 'gzip', 'If-None-Match': comprimida.headers['ETag']})
+    assert repetida.status_code == 304 and repetida.data == b''
+    trocada = cliente.get('/estatico/estilo.css', headers={'Accept-Encoding': 'identity', 'If-None-Match': comprimida.headers['ETag']})
+    assert trocada.status_code == 200 and 'Content-Encoding' not in trocada.headers
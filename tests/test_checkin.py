@@ -0,0 +1,119 @@
+import threading
+
+from checkin import ADMITIDO, EXCLUIDO, VALIDADO, assinar, payload_qr
+
+
+def _ler(cliente, evento, ingresso_id):
+    return cliente.post('/checkin', json={'qr': payload_qr(ingresso_id, evento.app.secret_key)})
+
+
+def test_entrada_registrada_uma_vez(evento, admin, inscrever):
+    ingresso_id = inscrever(validado=True)
+    primeira = _ler(admin, evento, ingresso_id)
+    assert primeira.status_code == 200 and primeira.json['status'] == 'admitido'
+    repetida = _ler(admin, evento, ingresso_id)
+    assert repetida.status_code == 409 and repetida.json['admitido_em'] == primeira.json['admitido_em']
+
+
+def test_qr_sem_assinatura_recusado_por_padrao(evento, admin, inscrever):
+    ingresso_id = inscrever(validado=True)
+    assert admin.post('/checkin', json={'qr': f"ingresso_id:{ingresso_id}"}).status_code == 403
+    assert admin.post('/checkin', json={'qr': payload_qr(ingresso_id, 'outra-chave')}).status_code == 403
+
+
+def test_pendente_nao_entra(evento, admin, inscrever):
+    assert _ler(admin, evento, inscrever()).status_code == 404
+
+
+def test_excluida_em_outro_worker_nao_entra(evento, admin, inscrever, monkeypatch):
+    monkeypatch.setitem(evento.app.config, 'CHECKIN_SINCRONIA', 0)
+    ingresso_id = inscrever(validado=True)
+    with evento.app.app_context():
+        evento.indice_checkin.aquecer(evento._carregar_indice_checkin)
+        evento.indice_checkin.adicionar(ingresso_id, 'Participante Teste')
+        # Exclusão feita por outro processo: chega a este só pelo AlteracaoCheckin
+        evento.repositorio.excluir([ingresso_id])
+        evento.registrar_alteracao_checkin(evento.EXCLUIDO, ingresso_id)
+        evento.repositorio.confirmar()
+        assert evento.indice_checkin.validado(ingresso_id)
+    assert _ler(admin, evento, ingresso_id).status_code == 404
+    assert evento.indice_checkin.validado(ingresso_id) is None
+    with evento.app.app_context():
+        assert not evento.admissoes([ingresso_id])
+
+
+def test_validada_em_outro_worker_entra(evento, admin, inscrever, monkeypatch):
+    # Antes da próxima sincronização o índice não tem o ingresso: a leitura confere no banco
+    monkeypatch.setitem(evento.app.config, 'CHECKIN_SINCRONIA', 3600)
+    ingresso_id = inscrever(validado=True)
+    with evento.app.app_context():
+        evento.indice_checkin.aquecer(evento._carregar_indice_checkin)
+        evento.indice_checkin.remover(ingresso_id)
+    resposta = _ler(admin, evento, ingresso_id)
+    assert resposta.status_code == 200 and resposta.json['nome'] == 'Participante Teste'
+
+
+def test_leituras_simultaneas_admitem_uma_vez(evento, inscrever):
+    ingresso_id = inscrever(validado=True)
+    evento.app.config['CHECKIN_TOKEN'] = 'token-teste'
+    status = []
+
+    def ler():
+        cliente = evento.app.test_client()
+        for _ in range(5):
+            resposta = cliente.post('/checkin', json={'qr': payload_qr(ingresso_id, evento.app.secret_key)},
+                                    headers={'X-Checkin-Token': 'token-teste'})
+            status.append(resposta.status_code)
+
+    try:
+        leitores = [threading.Thread(target=ler) for _ in range(8)]
+        for leitor in leitores:
+            leitor.start()
+        for leitor in leitores:
+            leitor.join()
+    finally:
+        evento.app.config['CHECKIN_TOKEN'] = None
+    assert status.count(200) == 1 and status.count(409) == len(status) - 1
+
+
+def test_delta_reenvia_alteracao_que_terminou_depois(evento, admin):
+    # No Postgres uma transação pode reservar um seq menor e terminar depois de outra
+    with evento.app.app_context():
+        topo = evento.db.session.query(evento.func.max(evento.AlteracaoCheckin.seq)).scalar() or 0
+        evento.db.session.add(evento.AlteracaoCheckin(seq=topo + 5, operacao=evento.ADMITIDO, ingresso_id='rapida'))
+        evento.db.session.commit()
+    delta = admin.get(f'/checkin/manifesto?desde={topo}').json
+    assert delta['seq'] == topo + 5
+    assert [a[2] for a in delta['alteracoes'] if a[0] > topo] == ['rapida']
+
+    with evento.app.app_context():
+        evento.db.session.add(evento.AlteracaoCheckin(seq=topo + 3, operacao=evento.ADMITIDO, ingresso_id='atrasada'))
+        evento.db.session.commit()
+    seguinte = admin.get(f"/checkin/manifesto?desde={delta['seq']}").json
+    assert seguinte['seq'] == topo + 5
+    vistas = {(a[0], a[2]) for a in delta['alteracoes']}
+    assert [a[2] for a in seguinte['alteracoes'] if (a[0], a[2]) not in vistas] == ['atrasada']
+
+
+def test_manifesto_e_delta(evento, admin, inscrever):
+    manifesto = admin.get('/checkin/manifesto').json
+    assinatura = manifesto.pop('assinatura')
+    assert assinatura == assinar(manifesto, evento.chave_manifesto())
+
+    validada = inscrever()
+    excluida = inscrever(validado=True)
+    assert admin.get(f'/validar_ingresso/{validada}').status_code == 302
+    assert admin.post(f'/admin/excluir_ingresso/{excluida}').status_code == 302
+    assert _ler(admin, evento, validada).status_code == 200
+
+    delta = admin.get(f"/checkin/manifesto?desde={manifesto['seq']}").json
+    assinatura = delta.pop('assinatura')
+    assert assinatura == assinar(delta, evento.chave_manifesto())
+    assert not delta['mais'] and delta['seq'] > manifesto['seq']
+    novas = [(a[1], a[2]) for a in delta['alteracoes'] if a[0] > manifesto['seq']]
+    assert novas == [(VALIDADO, validada), (EXCLUIDO, excluida), (ADMITIDO, validada)]
+
+    # Sem novidades, o delta fica no mesmo seq
+    assert admin.get(f"/checkin/manifesto?desde={delta['seq']}").json['seq'] == delta['seq']
+    atual = admin.get('/checkin/manifesto').json
+    assert validada in atual['ids'] and validada in atual['admitidos'] and excluida not in atual['ids']
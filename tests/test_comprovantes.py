@@ -0,0 +1,69 @@
+import hashlib
+import os
+import io
+import time
+
+import pytest
+from PIL import Image
+
+
+@pytest.fixture
+def comprovante(cliente):
+    """Envia uma inscrição com um PNG novo e retorna o nome público do comprovante."""
+    arquivo = io.BytesIO()
+    Image.new('RGB', (600, 1200), (hashlib.sha256(str(id(arquivo)).encode()).digest()[0], 90, 160)).save(arquivo, 'PNG')
+    conteudo = arquivo.getvalue()
+    resposta = cliente.post('/registrar', content_type='multipart/form-data', data={
+        'nome': 'Fulano', 'telefone': '71999990000', 'email': 'fulano@example.com', 'tipo_ingresso': 'Individual',
+        'comprovante_pix': (io.BytesIO(conteudo), 'comprovante.png')})
+    assert resposta.status_code in (302, 303)
+    return f"{hashlib.sha256(conteudo).hexdigest()}.png"
+
+
+def test_comprovante_so_para_o_admin(cliente, comprovante):
+    assert cliente.get(f"/comprovante/{comprovante}").status_code == 401
+    assert cliente.get(f"/comprovante_miniatura/{comprovante}").status_code == 401
+    with cliente.session_transaction() as sessao:
+        sessao['logged_in'] = True
+    resposta = cliente.get(f"/comprovante/{comprovante}")
+    assert resposta.status_code == 200 and resposta.mimetype == 'image/png'
+
+
+def test_miniatura(admin, comprovante):
+    resposta = admin.get(f"/comprovante_miniatura/{comprovante}")
+    assert resposta.status_code == 200 and resposta.mimetype == 'image/webp'
+    largura, altura = Image.open(io.BytesIO(resposta.data)).size
+    assert largura <= 480 and altura <= 960
+
+
+@pytest.mark.parametrize('caminho', [
+    'pix/00/00/arquivo.png',
+    'ingressos/qualquer.pdf',
+    'qr/ingresso.png',
+    '..%2Fdados%2Fevento.db',
+    'lote_1.pdf',
+])
+def test_comprovante_recusa_outros_arquivos(admin, caminho):
+    assert admin.get(f"/comprovante/{caminho}").status_code == 404
+    assert admin.get(f"/comprovante_miniatura/{caminho}").status_code == 404
+
+
+def test_links_do_admin(evento, admin, comprovante):
+    # A inscrição é gravada em lote, logo depois da resposta
+    for _ in range(100):
+        with evento.app.app_context():
+            if evento.repositorio.mesmo_comprovante([f"pix/{comprovante[:2]}/{comprovante[2:4]}/{comprovante}"]):
+                break
+        time.sleep(0.05)
+    for pagina in ('/admin', '/admin/revisao'):
+        assert f"/comprovante/{comprovante}" in admin.get(pagina).get_data(as_text=True)
+
+
+def test_ingresso_nao_serve_outros_uploads(evento, admin):
+    # Comprovante do formato antigo, direto na pasta de uploads
+    with open(os.path.join(evento.app.config['UPLOAD_FOLDER'], 'legado.png'), 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+    anonimo = evento.app.test_client()
+    assert anonimo.get('/ingresso/legado.png').status_code == 404
+    assert admin.get('/ingresso/legado.png').status_code == 404
+    assert anonimo.get('/ingresso/lote_00000000-0000-0000-0000-000000000000.pdf').status_code == 404
@@ -0,0 +1,139 @@
+# Envio dos ingressos contra uma caixa SMTP local (socketserver da biblioteca
+# padrão), que guarda as mensagens recebidas e pode recusar as primeiras com 4xx.
+import email
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from email import policy
+
+import pytest
+
+import envio_email
+
+
+class AtendimentoSMTP(socketserver.StreamRequestHandler):
+    def responder(self, linha):
+        self.wfile.write(linha.encode() + b'\r\n')
+
+    def handle(self):
+        self.responder('220 caixa de teste')
+        while linha := self.rfile.readline():
+            comando = linha.decode().strip().upper()
+            if comando.startswith(('EHLO', 'HELO')):
+                self.responder('250 caixa')
+            elif comando.startswith(('MAIL', 'RSET', 'NOOP')):
+                self.responder('250 ok')
+            elif comando.startswith('RCPT'):
+                self.server.tentativas += 1
+                if self.server.recusas:
+                    self.server.recusas -= 1
+                    self.responder('451 tente mais tarde')
+                else:
+                    self.responder('250 ok')
+            elif comando == 'DATA':
+                self.responder('354 termine com .')
+                linhas = []
+                while (linha := self.rfile.readline()) not in (b'.\r\n', b''):
+                    linhas.append(linha[1:] if linha.startswith(b'..') else linha)
+                self.server.mensagens.append(email.message_from_bytes(b''.join(linhas), policy=policy.default))
+                self.responder('250 recebida')
+            elif comando == 'QUIT':
+                self.responder('221 tchau')
+                return
+            else:
+                self.responder('502 comando não implementado')
+
+
+class CaixaSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), AtendimentoSMTP)
+        self.mensagens = []
+        self.recusas = 0
+        self.tentativas = 0
+
+
+@pytest.fixture(scope='module')
+def servidor_smtp():
+    # Um só servidor: as threads de envio guardam a conexão (host e porta) por processo
+    servidor = CaixaSMTP()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def caixa(evento, servidor_smtp, monkeypatch):
+    monkeypatch.setitem(evento.app.config, 'SMTP_HOST', '127.0.0.1')
+    monkeypatch.setitem(evento.app.config, 'SMTP_PORT', servidor_smtp.server_address[1])
+    monkeypatch.setitem(evento.app.config, 'SMTP_SEGURANCA', 'nenhuma')
+    monkeypatch.setitem(evento.app.config, 'SMTP_USUARIO', None)
+    monkeypatch.setattr(evento.fila_emails, 'espera_base', 0.05)
+    servidor_smtp.mensagens.clear()
+    servidor_smtp.recusas = servidor_smtp.tentativas = 0
+    return servidor_smtp
+
+
+def aguardar_envio(evento, ingresso_id, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        with evento.app.app_context():
+            envio = evento.status_email_varios([ingresso_id]).get(ingresso_id)
+        if envio and envio['status'] in (envio_email.ENVIADO, envio_email.FALHOU):
+            return envio
+        time.sleep(0.05)
+    raise AssertionError(f"envio de {ingresso_id} não terminou")
+
+
+def test_validacao_envia_o_ingresso(evento, admin, inscrever, caixa):
+    ingresso_id = inscrever(email='maria@example.com', nome_completo='Maria Teste')
+    assert admin.get(f"/validar_ingresso/{ingresso_id}").status_code == 302
+
+    assert aguardar_envio(evento, ingresso_id) == {'status': envio_email.ENVIADO, 'tentativas': 1, 'erro': None}
+    [mensagem] = caixa.mensagens
+    assert mensagem['To'] == 'maria@example.com'
+    assert mensagem['Subject'].startswith('Seu ingresso - ')
+    assert 'Maria Teste' in mensagem.get_body(('plain',)).get_content()
+    [anexo] = mensagem.iter_attachments()
+    assert anexo.get_filename() == f"ingresso_{ingresso_id}.pdf"
+    assert anexo.get_content().startswith(b'%PDF')
+
+
+def test_recusa_temporaria_tenta_de_novo(evento, admin, inscrever, caixa):
+    caixa.recusas = 1
+    ingresso_id = inscrever()
+    admin.get(f"/validar_ingresso/{ingresso_id}")
+
+    envio = aguardar_envio(evento, ingresso_id)
+    assert envio['status'] == envio_email.ENVIADO and envio['tentativas'] == 2
+    assert caixa.tentativas == 2 and len(caixa.mensagens) == 1
+
+
+def test_envio_em_andamento_nao_volta_para_a_fila(evento, admin, inscrever, caixa):
+    ingresso_id = inscrever(validado=True)
+    with evento.app.app_context():
+        evento.db.session.add(evento.EnvioEmail(ingresso_id=ingresso_id, status=envio_email.ENVIANDO,
+                                                tentativas=1, atualizado_em=datetime.utcnow()))
+        evento.db.session.commit()
+
+    admin.post(f"/admin/enviar_email/{ingresso_id}")
+    with evento.app.app_context():
+        assert evento._marcar_email_na_fila([ingresso_id]) == []
+        assert evento.status_email_varios([ingresso_id])[ingresso_id]['status'] == envio_email.ENVIANDO
+    assert evento._emails_abandonados() == []
+
+
+def test_envio_abandonado_volta_para_a_fila(evento, inscrever):
+    ingresso_id = inscrever(validado=True)
+    with evento.app.app_context():
+        antigo = datetime.utcnow() - evento.TEMPO_MAXIMO_ENVIO - timedelta(minutes=1)
+        evento.db.session.add(evento.EnvioEmail(ingresso_id=ingresso_id, status=envio_email.ENVIANDO,
+                                                tentativas=1, atualizado_em=antigo))
+        evento.db.session.commit()
+
+    assert evento._emails_abandonados() == [(ingresso_id, 0)]
+    with evento.app.app_context():
+        assert evento.status_email_varios([ingresso_id])[ingresso_id]['status'] == envio_email.NA_FILA
@@ -0,0 +1,31 @@
+import time
+from datetime import datetime, timedelta
+
+from fila_render import FilaRender, NA_FILA, GERANDO
+
+
+def test_render_abandonado_volta_para_a_fila(evento, inscrever):
+    abandonado, recente = inscrever(validado=True), inscrever(validado=True)
+    with evento.app.app_context():
+        antigo = datetime.utcnow() - evento.TEMPO_MAXIMO_RENDER - timedelta(minutes=1)
+        evento.db.session.add_all([
+            evento.TrabalhoIngresso(ingresso_id=abandonado, status=GERANDO, atualizado_em=antigo),
+            evento.TrabalhoIngresso(ingresso_id=recente, status=GERANDO, atualizado_em=datetime.utcnow()),
+        ])
+        evento.db.session.commit()
+
+    assert evento._render_abandonados() == [abandonado]
+    with evento.app.app_context():
+        assert evento.status_pdf_varios([abandonado, recente]) == {abandonado: NA_FILA, recente: GERANDO}
+
+
+def test_fila_render_recupera_periodicamente():
+    reservados = []
+    recuperacoes = iter([[], ['abandonado']])
+    fila = FilaRender(None, lambda job_id: reservados.append(job_id), None,
+                      recuperar=lambda: next(recuperacoes, []), intervalo_recuperacao=0.01, workers=1)
+    fila.iniciar()
+    limite = time.monotonic() + 5
+    while not reservados and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert reservados == ['abandonado']
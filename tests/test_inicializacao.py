@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from conftest import RAIZ
+
+# Banco novo: sem o comando inicializar-banco o app recusa os pedidos (sem
+# criar tabelas) e a fábrica não sobe; depois do comando, tudo responde
+PRIMEIRO_PEDIDO = '''
+import evento
+cliente = evento.app.test_client()
+resposta = cliente.get('/')
+print(resposta.status_code, b'inicializar-banco' in resposta.data)
+try:
+    evento.create_app()
+except RuntimeError:
+    print('recusado')
+evento.inicializar_banco()
+print(cliente.get('/').status_code, cliente.get('/checkin/manifesto', headers={'X-Checkin-Token': 't'}).status_code)
+'''
+
+
+def test_banco_novo_exige_inicializar(tmp_path):
+    ambiente = {**os.environ, 'SQLITE_PATH': str(tmp_path / 'novo.db'), 'CHECKIN_TOKEN': 't',
+                'UPLOAD_FOLDER': str(tmp_path / 'arquivos_enviados'), 'PYTHONPATH': RAIZ}
+    saida = subprocess.run([sys.executable, '-c', PRIMEIRO_PEDIDO], cwd=tmp_path, env=ambiente,
+                           capture_output=True, text=True, timeout=120)
+    assert saida.returncode == 0, saida.stderr
+    assert saida.stdout.split() == ['503', 'True', 'recusado', '200', '200']
+
+
+def test_indice_checkin_com_banco_fora(evento, cliente, monkeypatch):
+    def banco_fora():
+        raise OperationalError('SELECT', {}, Exception('no such table: checkin'))
+    monkeypatch.setattr(evento, '_carregar_indice_checkin', banco_fora)
+    monkeypatch.setattr(evento.indice_checkin, '_pid', None)
+
+    assert cliente.get('/').status_code == 200
+    assert evento.indice_checkin._pid is None
+
+    monkeypatch.undo()
+    monkeypatch.setattr(evento.indice_checkin, '_pid', None)
+    cliente.get('/')
+    assert evento.indice_checkin._pid == os.getpid()
+
+
+def test_create_app_recusa_config_do_import(evento):
+    with pytest.raises(ValueError, match='UPLOAD_FOLDER'):
+        evento.create_app(UPLOAD_FOLDER='outra_pasta')
+    assert evento.app.config['UPLOAD_FOLDER'] != 'outra_pasta'
@@ -0,0 +1,84 @@
+import os
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from admissao import FilaInscricoes
+
+
+def nova_inscricao(**campos):
+    return {
+        'id': str(uuid.uuid4()),
+        'nome_completo': 'Participante Fila',
+        'nome_secundario': '',
+        'telefone': '71 999990000',
+        'email': f"{uuid.uuid4().hex[:8]}@example.com",
+        'tipo_ingresso': 'Individual',
+        'comprovante_pix': 'pix.png',
+        'criado_em': datetime.utcnow(),
+        **campos,
+    }
+
+
+def banco_travado(evento, monkeypatch, falhas):
+    """Faz os próximos `falhas` commits do repositório falharem como um SQLite travado."""
+    confirmar = evento.repositorio.confirmar
+    restantes = [falhas]
+
+    def confirmar_travado():
+        if restantes[0]:
+            restantes[0] -= 1
+            raise OperationalError('COMMIT', {}, Exception('database is locked'))
+        confirmar()
+    monkeypatch.setattr(evento.repositorio, 'confirmar', confirmar_travado)
+    monkeypatch.setattr(evento.time, 'sleep', lambda segundos: None)
+
+
+def test_banco_travado_tenta_de_novo(evento, monkeypatch):
+    banco_travado(evento, monkeypatch, 2)
+    lote = [nova_inscricao() for _ in range(3)]
+    assert evento._gravar_inscricoes(lote) == [i['id'] for i in lote]
+    with evento.app.app_context():
+        assert len(evento.repositorio.obter([i['id'] for i in lote])) == 3
+
+
+def test_banco_fora_fica_no_diario(evento, monkeypatch, caplog):
+    banco_travado(evento, monkeypatch, 1000)
+    inscricao = nova_inscricao()
+    assert evento._gravar_inscricoes([inscricao]) == []
+    assert inscricao['id'] in caplog.text and inscricao['email'] in caplog.text
+
+
+def test_diario_sobrevive_a_falha_do_lote(tmp_path):
+    gravadas = []
+    falhar = [True]
+
+    def gravar(lote):
+        if falhar[0]:
+            raise OperationalError('INSERT', {}, Exception('server closed the connection unexpectedly'))
+        gravadas.extend(lote)
+        return [i['id'] for i in lote]
+
+    fila = FilaInscricoes(gravar, diario=str(tmp_path), recuperar_apos=0)
+    inscricao = nova_inscricao()
+    fila.enfileirar(inscricao)
+    assert fila.aguardar(5)
+    # O lote falhou: a inscrição continua no diário, com tudo que é preciso para regravá-la
+    assert os.listdir(tmp_path) == [f"{inscricao['id']}.json"]
+
+    falhar[0] = False
+    assert fila.recuperar() == 1
+    assert fila.aguardar(5)
+    assert [i['email'] for i in gravadas] == [inscricao['email']]
+    assert os.listdir(tmp_path) == []
+
+
+def test_worker_que_caiu(tmp_path):
+    # Um worker escreveu no diário e caiu antes de gravar; outro worker recupera
+    FilaInscricoes(lambda lote: [], diario=str(tmp_path))._escrever_diario(nova_inscricao())
+    gravadas = []
+    fila = FilaInscricoes(lambda lote: gravadas.extend(lote) or [i['id'] for i in lote],
+                          diario=str(tmp_path), recuperar_apos=0)
+    fila.recuperar()
+    assert fila.aguardar(5) and len(gravadas) == 1 and os.listdir(tmp_path) == []
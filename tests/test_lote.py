@@ -0,0 +1,26 @@
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+def test_pdf_do_lote_so_para_o_admin(evento, admin, inscrever):
+    ids = [inscrever() for _ in range(3)]
+    resposta = admin.post('/admin/validar_lote', data={'ingresso_ids': ids, 'pdf_combinado': '1'})
+    [lote] = parse_qs(urlparse(resposta.headers['Location']).query)['lote']
+
+    for _ in range(600):
+        resposta = admin.get(f"/admin/lote/{lote}")
+        if resposta.status_code != 202:
+            break
+        time.sleep(0.05)
+    assert resposta.status_code == 200 and resposta.data.startswith(b'%PDF')
+
+    anonimo = evento.app.test_client()
+    assert anonimo.get(f"/admin/lote/{lote}").status_code == 401
+    # O caminho público dos ingressos não serve o lote nem para o admin
+    assert admin.get(f"/ingresso/{lote}").status_code == 404
+    assert anonimo.get(f"/ingresso/{lote}").status_code == 404
+
+
+def test_lote_so_nomes_de_lote(admin):
+    for nome in ('evento.db', 'legado.png', 'lote_1.pdf', '..%2Fdados%2Fevento.db'):
+        assert admin.get(f"/admin/lote/{nome}").status_code == 404
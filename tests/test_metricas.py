@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+from conftest import RAIZ
+from metricas import Registro
+
+# Um worker que mede três requisições, publica e espera ser encerrado
+WORKER = '''
+import sys
+from metricas import Registro
+registro = Registro(sys.argv[1])
+for segundos in (0.01, 0.2, 3):
+    registro.observar('http_requisicao_segundos', segundos, rota='pagina_inicial')
+registro.publicar()
+print('pronto', flush=True)
+sys.stdin.read()
+'''
+
+
+def total(registro):
+    return registro.coletar()[('http_requisicao_segundos', (('rota', 'pagina_inicial'),))]
+
+
+def test_contadores_nao_diminuem_quando_um_worker_sai(tmp_path):
+    pasta = str(tmp_path)
+    registro = Registro(pasta)
+    registro.observar('http_requisicao_segundos', 0.05, rota='pagina_inicial')
+
+    worker = subprocess.Popen([sys.executable, '-c', WORKER, pasta], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              text=True, env={**os.environ, 'PYTHONPATH': RAIZ})
+    assert worker.stdout.readline().strip() == 'pronto'
+    antes = total(registro)
+    assert antes[-1] == 4
+
+    worker.kill()
+    worker.wait()
+    depois = total(registro)
+    assert depois == antes
+    assert not os.path.exists(os.path.join(pasta, f"{worker.pid}.json"))
+
+    # A soma dos encerrados continua valendo nas próximas coletas e para um processo novo
+    registro.observar('http_requisicao_segundos', 0.05, rota='pagina_inicial')
+    assert total(registro)[-1] == 5
+    assert total(Registro(pasta))[-1] == 5
@@ -0,0 +1,98 @@
+import json
+import threading
+
+
+def abrir_stream(cliente):
+    resposta = cliente.get('/admin/painel/eventos', buffered=False)
+    primeira = next(resposta.response)
+    return resposta, primeira.decode() if isinstance(primeira, bytes) else primeira
+
+
+def test_painel_sem_login(cliente):
+    assert cliente.get('/admin/painel/eventos').status_code == 204
+
+
+def test_limite_de_streams(evento, admin, monkeypatch):
+    monkeypatch.setattr(evento, 'vagas_painel', threading.BoundedSemaphore(1))
+
+    aberto, inicio = abrir_stream(admin)
+    assert inicio == 'retry: 3000\n\n'
+
+    # Acima do limite: resposta vazia que manda o navegador voltar mais tarde
+    cheio = admin.get('/admin/painel/eventos')
+    assert cheio.status_code == 200 and cheio.mimetype == 'text/event-stream'
+    assert cheio.get_data(as_text=True) == f'retry: {evento.ESPERA_PAINEL_CHEIO}\n\n'
+
+    aberto.close()
+    de_novo, inicio = abrir_stream(admin)
+    assert inicio == 'retry: 3000\n\n'
+    de_novo.close()
+
+
+def test_stream_termina(evento, admin, monkeypatch):
+    monkeypatch.setattr(evento, 'vagas_painel', threading.BoundedSemaphore(1))
+    monkeypatch.setitem(evento.app.config, 'PAINEL_CONEXAO_MAX', 0)
+    resposta = admin.get('/admin/painel/eventos')
+    corpo = resposta.get_data(as_text=True)
+    resposta.close()
+    assert corpo.startswith('retry: 3000\n\n') and 'event: estatisticas' in corpo
+    # A vaga foi devolvida
+    assert evento.vagas_painel.acquire(blocking=False)
+    evento.vagas_painel.release()
+
+
+def test_stream_envia_alteracao_que_terminou_depois(evento, admin, monkeypatch):
+    monkeypatch.setattr(evento, 'vagas_painel', threading.BoundedSemaphore(1))
+    monkeypatch.setitem(evento.app.config, 'PAINEL_INTERVALO', 0.05)
+    monkeypatch.setitem(evento.app.config, 'PAINEL_CONEXAO_MAX', 5)
+
+    def gravar(seq, ingresso_id):
+        with evento.app.app_context():
+            evento.db.session.add(evento.AlteracaoPainel(seq=seq, operacao=evento.painel.VALIDADO, ingresso_id=ingresso_id))
+            evento.db.session.commit()
+
+    with evento.app.app_context():
+        topo = evento.seq_painel()
+    # No Postgres a transação com seq menor pode terminar depois da outra
+    gravar(topo + 5, 'rapida')
+    resposta = admin.get('/admin/painel/eventos', headers={'Last-Event-ID': str(topo)}, buffered=False)
+    recebidas, ids = [], []
+    for pedaco in resposta.response:
+        pedaco = pedaco.decode() if isinstance(pedaco, bytes) else pedaco
+        if 'event: alteracao' not in pedaco:
+            continue
+        dados = json.loads(pedaco.split('data: ')[1])
+        # A janela relida também traz as alterações de outros testes, abaixo de `topo`
+        if dados['seq'] <= topo:
+            continue
+        ids.append(int(pedaco.split('id: ')[1].split('\n')[0]))
+        recebidas.append(dados['inscricao']['id'])
+        if recebidas == ['rapida']:
+            gravar(topo + 3, 'atrasada')
+        else:
+            break
+    resposta.close()
+    assert recebidas == ['rapida', 'atrasada']
+    assert ids == [topo + 5, topo + 5]
+
+
+def test_stream_envia_alteracoes(evento, admin, inscrever, monkeypatch):
+    monkeypatch.setattr(evento, 'vagas_painel', threading.BoundedSemaphore(1))
+    monkeypatch.setitem(evento.app.config, 'PAINEL_CONEXAO_MAX', 0.3)
+    monkeypatch.setitem(evento.app.config, 'PAINEL_INTERVALO', 0.05)
+    inicio = admin.get('/admin/painel').json
+    ingresso_id = inscrever()
+    with evento.app.app_context():
+        evento.registrar_alteracoes_painel(evento.painel.INSCRITO, [ingresso_id])
+        evento.repositorio.confirmar()
+    assert admin.get(f'/validar_ingresso/{ingresso_id}').status_code == 302
+
+    resposta = admin.get('/admin/painel/eventos', headers={'Last-Event-ID': str(inicio['seq'])})
+    eventos = [m for m in resposta.get_data(as_text=True).split('\n\n') if 'event: alteracao' in m]
+    resposta.close()
+    dados = [json.loads(m.split('data: ')[1]) for m in eventos]
+    novas = [d for d in dados if d['seq'] > inicio['seq']]
+    assert [(d['operacao'], d['inscricao']['id']) for d in novas] == [(evento.painel.INSCRITO, ingresso_id),
+                                                                      (evento.painel.VALIDADO, ingresso_id)]
+    # A linha da tabela vem com a inscrição como está agora
+    assert novas[0]['inscricao']['nome_completo'] == 'Participante Teste' and novas[0]['inscricao']['validado']
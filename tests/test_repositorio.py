@@ -0,0 +1,160 @@
+# Contrato do repositório de inscrições: as duas implementações (SQLAlchemy
+# sobre o SQLite dos testes e em memória) precisam se comportar igual.
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+from repositorio import RepositorioMemoria
+
+
+def _inscricao(n, base=datetime(2026, 1, 1)):
+    return {
+        'nome_completo': f"Participante {n:06d}",
+        'nome_secundario': f"Acompanhante {n:06d}" if n % 2 else None,
+        'telefone': f"71 9{n:08d}",
+        'email': f"p{n}@example.com",
+        'tipo_ingresso': 'Casadinha' if n % 2 else 'Individual',
+        'comprovante_pix': f"pix/{n % 97:02d}.png",
+        'criado_em': base + timedelta(seconds=n),
+    }
+
+
+def _filtros(**kw):
+    return {'status': None, 'tipo': None, 'busca': None, 'ordem': 'recentes', **kw}
+
+
+def _percorrer(repo, filtros, limite):
+    ids, apos = [], None
+    while True:
+        pagina, apos = repo.listar(filtros, apos, limite)
+        ids.extend(pagina)
+        if apos is None:
+            return ids
+
+
+@pytest.fixture(params=['sql', 'memoria'])
+def repo(request, evento):
+    if request.param == 'memoria':
+        yield RepositorioMemoria()
+        return
+    with evento.app.app_context():
+        # O contrato conta tudo o que está na tabela: começa vazia
+        evento.db.session.execute(delete(evento.Inscricao))
+        evento.db.session.commit()
+        yield evento.repositorio
+        evento.db.session.rollback()
+
+
+@pytest.fixture
+def ids(repo):
+    ids = repo.adicionar([_inscricao(n) for n in range(10)])
+    repo.confirmar()
+    return ids
+
+
+def test_adicionar_e_obter(repo, ids):
+    assert len(set(ids)) == 10 and repo.total() == 10
+    # obter: mantém a ordem pedida e ignora ids desconhecidos
+    obtidas = repo.obter([ids[3], 'nao-existe', ids[1]])
+    assert list(obtidas) == [ids[3], ids[1]]
+    assert obtidas[ids[3]]['id'] == ids[3] and obtidas[ids[3]]['validado'] is False
+    assert repo.obter_um('nao-existe') is None
+
+
+@pytest.mark.parametrize('filtros, esperado', [
+    ({}, 10),
+    ({'tipo': 'Casadinha'}, 5),
+    ({'busca': 'p7@example.com'}, 1),
+    ({'busca': 'p1@example.com'}, 1),
+    ({'busca': '@example'}, 10),
+    ({'busca': 'p7@exa'}, 1),
+    ({'busca': 'acompanhante 00000'}, 5),
+    ({'busca': '71 900000003'}, 1),
+])
+def test_contar(repo, ids, filtros, esperado):
+    assert repo.contar(_filtros(**filtros)) == esperado
+
+
+def test_paginacao(repo, ids):
+    # Cada ordem percorre tudo, sem repetir, na ordem certa
+    assert _percorrer(repo, _filtros(), 3) == list(reversed(ids))
+    assert _percorrer(repo, _filtros(ordem='antigos'), 4) == ids
+    assert _percorrer(repo, _filtros(ordem='nome'), 10) == ids
+
+
+def test_validar_so_pendentes_uma_vez(repo, ids):
+    validadas = repo.validar([ids[0], ids[2], ids[0], 'nao-existe'])
+    repo.confirmar()
+    assert list(validadas) == [ids[0], ids[2]] and validadas[ids[0]]['validado'] is True
+    assert repo.validar([ids[0]]) == {}
+    assert repo.contar(_filtros(status=True)) == 2 and repo.contar(_filtros(status=False)) == 8
+    assert repo.validados() == {ids[0]: 'Participante 000000', ids[2]: 'Participante 000002'}
+
+    contagens, por_dia = repo.estatisticas()
+    assert {k: v for k, v in contagens.items() if v} == {
+        ('Individual', True): 2, ('Individual', False): 3, ('Casadinha', False): 5}
+    assert por_dia == {'2026-01-01': 10}
+
+
+def test_atualizar_so_campos_editaveis(repo, ids):
+    assert repo.atualizar({ids[4]: {'nome_completo': 'Zé Novo', 'validado': True}, 'nao-existe': {'email': 'x'}}) == [ids[4]]
+    repo.confirmar()
+    atualizada = repo.obter_um(ids[4])
+    assert atualizada['nome_completo'] == 'Zé Novo' and atualizada['validado'] is False
+    assert repo.contar(_filtros(busca='zé novo')) == 1
+
+
+def test_mesmo_comprovante(repo, ids):
+    repetida = repo.adicionar([{**_inscricao(100), 'comprovante_pix': 'pix/03.png'}])[0]
+    repo.confirmar()
+    usos = repo.mesmo_comprovante(['pix/03.png', 'pix/inexistente.png'])
+    assert [i for i, _ in usos['pix/03.png']] == [ids[3], repetida]
+    assert not usos.get('pix/inexistente.png')
+
+
+def test_excluir_e_iterar_lotes(repo, ids):
+    assert repo.excluir([ids[5], 'nao-existe']) == [ids[5]]
+    repo.confirmar()
+    assert repo.obter_um(ids[5]) is None and repo.total() == 9
+    assert ids[5] not in _percorrer(repo, _filtros(), 4)
+    assert sum(repo.estatisticas()[0].values()) == 9
+
+    lotes = list(repo.iterar_lotes(_filtros(ordem='antigos'), 4))
+    assert [len(l) for l in lotes] == [4, 4, 1]
+    assert [d['id'] for l in lotes for d in l] == [i for i in ids if i != ids[5]]
+
+
+def test_memoria_leituras_durante_gravacoes():
+    repo = RepositorioMemoria()
+    erros = []
+    parar = threading.Event()
+
+    def gravar():
+        n = 0
+        while not parar.is_set():
+            novos = repo.adicionar([_inscricao(n + k) for k in range(20)])
+            repo.excluir(novos[::2])
+            n += 20
+
+    def ler():
+        try:
+            for _ in range(300):
+                repo.contar(_filtros(busca='participante'))
+                repo.validados()
+                repo.mesmo_comprovante([f"pix/{k:02d}.png" for k in range(10)])
+                repo.total()
+        except Exception as erro:
+            erros.append(erro)
+
+    gravador = threading.Thread(target=gravar)
+    leitores = [threading.Thread(target=ler) for _ in range(3)]
+    gravador.start()
+    for leitor in leitores:
+        leitor.start()
+    for leitor in leitores:
+        leitor.join()
+    parar.set()
+    gravador.join()
+    assert not erros
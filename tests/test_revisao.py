@@ -0,0 +1,34 @@
+def _pendentes(evento):
+    with evento.app.app_context():
+        return evento.contar_inscricoes(evento.FILTROS_REVISAO)
+
+
+def test_aprovar_e_recusar(evento, admin, inscrever):
+    aprovada, recusada = inscrever(), inscrever()
+    antes = _pendentes(evento)
+
+    resposta = admin.post(f'/admin/revisao/{aprovada}/aprovar')
+    assert resposta.json == {'status': 'ok', 'pendentes': antes - 1}
+    resposta = admin.post(f'/admin/revisao/{recusada}/recusar')
+    assert resposta.json == {'status': 'ok', 'pendentes': antes - 2}
+    with evento.app.app_context():
+        assert evento.repositorio.obter_um(aprovada)['validado']
+        assert evento.repositorio.obter_um(recusada) is None
+
+
+def test_decisao_repetida_e_ignorada(evento, admin, inscrever):
+    # Outro admin já decidiu: a página só segue para a próxima
+    ingresso_id = inscrever()
+    assert admin.post(f'/admin/revisao/{ingresso_id}/aprovar').json['status'] == 'ok'
+    assert admin.post(f'/admin/revisao/{ingresso_id}/aprovar').json['status'] == 'ignorada'
+    assert admin.post(f'/admin/revisao/{ingresso_id}/recusar').json['status'] == 'ok'
+    assert admin.post(f'/admin/revisao/{ingresso_id}/recusar').json['status'] == 'ignorada'
+
+
+def test_revisao_exige_login_e_acao_conhecida(evento, admin, inscrever):
+    ingresso_id = inscrever()
+    anonimo = evento.app.test_client()
+    assert anonimo.post(f'/admin/revisao/{ingresso_id}/aprovar').status_code == 401
+    assert admin.post(f'/admin/revisao/{ingresso_id}/apagar').status_code == 404
+    with evento.app.app_context():
+        assert not evento.repositorio.obter_um(ingresso_id)['validado']
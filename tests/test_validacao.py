@@ -0,0 +1,33 @@
+import threading
+
+
+def test_validacoes_simultaneas_validam_uma_vez(evento, inscrever):
+    ingresso_id = inscrever()
+    status = []
+
+    def validar():
+        cliente = evento.app.test_client()
+        with cliente.session_transaction() as sessao:
+            sessao['logged_in'] = True
+        status.append(cliente.get(f"/validar_ingresso/{ingresso_id}").status_code)
+
+    admins = [threading.Thread(target=validar) for _ in range(8)]
+    for admin in admins:
+        admin.start()
+    for admin in admins:
+        admin.join()
+
+    assert status.count(302) == 1 and status.count(404) == 7
+    with evento.app.app_context():
+        # Um único registro no manifesto do check-in e no painel: a fila e o e-mail também só uma vez
+        assert evento.AlteracaoCheckin.query.filter_by(ingresso_id=ingresso_id).count() == 1
+        assert evento.AlteracaoPainel.query.filter_by(ingresso_id=ingresso_id, operacao='V').count() == 1
+
+
+def test_validar_lote_repetido(evento, admin, inscrever):
+    ids = [inscrever() for _ in range(3)]
+    admin.post('/admin/validar_lote', data={'ingresso_ids': ids + ids[:1]})
+    admin.post('/admin/validar_lote', data={'ingresso_ids': ids})
+    with evento.app.app_context():
+        assert all(i['validado'] for i in evento.repositorio.obter(ids).values())
+        assert evento.AlteracaoCheckin.query.filter(evento.AlteracaoCheckin.ingresso_id.in_(ids)).count() == 3